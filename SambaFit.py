@@ -1,11 +1,10 @@
-import requests
 import os
 from dotenv import load_dotenv
 from pathlib import Path
+from llm_client import post_chat_completion
 env_path = Path('.') / '.env'
 load_dotenv(dotenv_path=env_path)
 SAMBANOVA_API_KEY = os.environ["SAMBANOVA_API_KEY"]
-API_URL = 'https://api.sambanova.ai/v1/chat/completions'
 HEADERS = {
     "Authorization": f"Bearer {SAMBANOVA_API_KEY}",
     "Content-Type": "application/json"
@@ -49,7 +48,7 @@ def model1_tokenize_prompt(prompt, model='Meta-Llama-3.1-70B-Instruct'):
     }
 
     # Make the API request
-    llama_res = requests.post(API_URL, headers=HEADERS, json=data)
+    llama_res = post_chat_completion(data, "sambafit.tokenize_prompt", headers=HEADERS)
     res_json = llama_res.json()
 
     # Check if the response is successful
@@ -74,7 +73,8 @@ def model2_select_items(tokens, database, model='Meta-Llama-3.1-70B-Instruct'):
 
     Args:
         tokens (dict): Tokens extracted by Model 1 (weather, occasion, preferences).
-        database (dict): A dictionary where keys are item IDs and values are AI analysis strings.
+        database (list): Candidate items as {item_id: description} dicts, usually the
+            compact summaries pre-selected by OutfitRetriever.select_candidates.
         model (str): The Llama model to use for the task.
 
     Returns:
@@ -137,7 +137,7 @@ def model2_select_items(tokens, database, model='Meta-Llama-3.1-70B-Instruct'):
     }
 
     # Make the API request
-    llama_res = requests.post(API_URL, headers=HEADERS, json=data)
+    llama_res = post_chat_completion(data, "sambafit.select_items", headers=HEADERS)
     res_json = llama_res.json()
 
     # Check if the response is successful
@@ -5,6 +5,7 @@ import os
 import time
 import threading
 import asyncio
+import uuid
 from datetime import datetime, timedelta
 from pathlib import Path
 
@@ -36,6 +37,10 @@ from marketplace_tab import marketplace_tab
 from style_advisor_tab import style_advisor_tab
 from developer_assistant import developer_assistant
 from fashion_agent import fashion_agent
+from notification_scheduler import start_background_scheduler
+from metrics import REGISTRY, start_metrics_server
+from llm_client import LEDGER, current_caller, set_caller
+from wardrobe_service import get_service, verify_tenant_token
 
 
 # Load environment variables
@@ -164,17 +169,119 @@ def initialize_camera_state():
     inject_css()
 
 
+def metrics_panel():
+    """Debug panel: p50/p95 per instrumented stage, counters and exports"""
+    with st.expander("⏱️ Performance Metrics"):
+        rows = REGISTRY.span_table()
+        if rows:
+            st.dataframe(rows, hide_index=True, use_container_width=True)
+        else:
+            st.caption("No timings recorded yet.")
+        counters = REGISTRY.snapshot()["counters"]
+        for name, series in sorted(counters.items()):
+            st.caption(name + ": " + ", ".join(
+                f"{'/'.join(entry['labels'].values()) or 'total'}={entry['value']}" for entry in series
+            ))
+        col1, col2, col3 = st.columns(3)
+        col1.download_button("Prometheus", REGISTRY.to_prometheus(), file_name="metrics.prom")
+        col2.download_button("JSON", REGISTRY.to_json(), file_name="metrics.json")
+        if col3.button("Reset"):
+            REGISTRY.reset()
+            st.rerun()
+
+
+def llm_usage_panel():
+    """Debug panel: LLM tokens, latency and estimated cost per call site, and this session's budget"""
+    with st.expander("💸 LLM Usage"):
+        session, user = current_caller()
+        for scope, key in (("session", session), ("user", user)):
+            totals = LEDGER.spent(scope, key)
+            limits = LEDGER.budgets.get(scope) or {}
+            tokens = totals["prompt_tokens"] + totals["completion_tokens"]
+            line = f"This {scope}: {tokens:,} tokens, ${totals['cost_usd']:.4f} in {totals['calls']} calls"
+            if limits.get("tokens"):
+                line += f" (budget {limits['tokens']:,} tokens)"
+                st.progress(min(1.0, tokens / limits["tokens"]))
+            st.caption(line)
+            if LEDGER.over_budget(scope, key):
+                st.warning(f"LLM budget reached for this {scope}" + (" - AI features are paused" if LEDGER.budgets.get("hard_cap") else ""))
+        rows = LEDGER.table()
+        if rows:
+            st.dataframe(rows, hide_index=True, use_container_width=True)
+        else:
+            st.caption("No LLM calls recorded yet.")
+
+
+def login_configured():
+    try:
+        return "auth" in st.secrets
+    except Exception:
+        return False
+
+
+def authenticated_tenant():
+    """Tenant id of this session from Streamlit's login or a signed ?token= link; None if neither"""
+    if st.user.get("is_logged_in"):
+        return st.user.get("email") or st.user.get("sub")
+    token = st.query_params.get("token")
+    if token:
+        tenant_id = verify_tenant_token(token, os.getenv("VESTIQUE_TENANT_SECRET"))
+        if tenant_id:
+            st.session_state.tenant_id = tenant_id
+        else:
+            st.error("This wardrobe link is invalid or has expired.")
+    return st.session_state.get("tenant_id")
+
+
 def main():
     inject_css()
     initialize_email_settings()
     initialize_notification_state()
     initialize_camera_state()  # Add this line
-    initialize_database()
+    # Multi-user deployments keep one wardrobe per user under this directory (see wardrobe_service)
+    data_root = os.getenv("VESTIQUE_DATA_ROOT")
+    if not data_root:
+        initialize_database()
+    # LLM usage made during this run is accounted to the browser session and, once known, its tenant
+    if 'llm_session' not in st.session_state:
+        st.session_state.llm_session = uuid.uuid4().hex[:8]
+    set_caller(st.session_state.llm_session)
     st.title("VESTIQUE - Smart Wardrobe Assistant")
-    
-    feature_extractor = FeatureExtractor()
-    tracker = WardrobeTracker(feature_extractor)
+
+    if data_root:
+        # Trackers stay loaded between runs and share one extractor, so segmentation is set by the deployment
+        service = get_service(data_root, lambda: FeatureExtractor(
+            use_segmentation=os.getenv("VESTIQUE_SEGMENTATION", "0") == "1"))
+        # Never a bare user name from the URL or the sidebar: anyone could type another user's
+        tenant_id = authenticated_tenant()
+        if tenant_id is None:
+            st.info("Sign in, or open the wardrobe link you were sent, to see your wardrobe.")
+            if login_configured():
+                st.button("Sign in", on_click=st.login)
+            return
+        # User budgets follow the signed-in tenant, not the editable sidebar email
+        set_caller(st.session_state.llm_session, tenant_id)
+        with service.tenant(tenant_id) as tracker:
+            render_app(tracker, tracker.feature_extractor, shared_extractor=True)
+    else:
+        # A single-user deployment has no authenticated user, so the session is its own user scope
+        set_caller(st.session_state.llm_session, st.session_state.llm_session)
+        # The extractor's settings decide the feature version, so apply the sidebar toggle before the tracker loads
+        feature_extractor = FeatureExtractor(
+            use_segmentation=st.session_state.get("use_segmentation", os.getenv("VESTIQUE_SEGMENTATION", "0") == "1")
+        )
+        render_app(WardrobeTracker(feature_extractor), feature_extractor)
+
+
+def render_app(tracker, feature_extractor, shared_extractor=False):
+    """Sidebar and tabs for one wardrobe"""
     email_notifier = EmailNotifier()
+    # Run reminder emails in-process unless a separate notification_scheduler.py worker is used
+    if os.getenv("VESTIQUE_SCHEDULER", "0") == "1":
+        start_background_scheduler()
+    # Prometheus scrape endpoint (/metrics, /metrics.json) alongside the app
+    if os.getenv("VESTIQUE_METRICS_PORT"):
+        start_metrics_server(os.environ["VESTIQUE_METRICS_PORT"])
     if 'style_advisor' not in st.session_state:
         st.session_state.style_advisor = StyleAdvisor(SAMBANOVA_API_KEY)
     # Initialize dev mode in session state if not exists
@@ -196,6 +303,22 @@ def main():
         
         debug_mode = st.checkbox("Debug Mode")
         st.session_state['debug_mode'] = debug_mode
+        if debug_mode:
+            metrics_panel()
+            llm_usage_panel()
+
+        job = tracker.reembedding
+        # Switching again mid-run would leave the running job embedding for the previous setting
+        reembedding = job is not None and job.status["running"]
+        st.checkbox(
+            "Garment Segmentation",
+            value=feature_extractor.use_segmentation,
+            key="use_segmentation",
+            disabled=shared_extractor or reembedding,
+            help="Mask the background before matching (slower, fewer false matches)"
+        )
+        if reembedding:
+            st.caption(f"🔄 Updating features: {job.status['done']}/{job.status['total']}")
         
         # Developer Mode toggle
         st.divider()
@@ -274,7 +397,7 @@ def main():
             notifications_tab(tracker, email_notifier)
 
         with tab5:
-            preferences_tab()
+            preferences_tab(tracker)
 
         with tab6:
             marketplace_tab(tracker, email_notifier)
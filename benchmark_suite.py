@@ -0,0 +1,382 @@
+"""
+benchmark_suite.py
+
+Timing suites over synthetic wardrobes (see synthetic_wardrobe.py) for
+regression tracking. Each suite times one hot path timeit-style (repeated
+calls, garbage collection off) and reports min/median/mean/p95 in
+milliseconds. Results are written to benchmark_results/ and can be compared
+against an earlier run; a suite whose median slowed by more than the tolerance
+is reported as a regression and the run exits non-zero.
+
+Tracker suites run WardrobeTracker in a scratch directory with a
+ReplayExtractor, which returns the features a synthetic capture carries, so
+they time matching, storage and rendering rather than the CNN. The CNN is
+timed on its own by the extract_features suite (skipped without torch).
+
+Usage:
+    python benchmark_suite.py --sizes 1000 10000
+    python benchmark_suite.py --sizes 1000 --suites process_image save_database --compare benchmark_results/baseline.json
+"""
+
+import argparse
+import base64
+import gc
+import json
+import logging
+import os
+import platform
+import subprocess
+import tempfile
+import time
+from contextlib import contextmanager
+from datetime import datetime
+from io import BytesIO
+from pathlib import Path
+
+import numpy as np
+from PIL import Image
+
+from email_templates import default_suggestion
+from feature_schema import extractor_version
+from synthetic_wardrobe import generate_wardrobe, write_wardrobe, WardrobeGenerator, FEATURE_WEIGHTS, INFO_KEY
+
+REPO_DIR = Path(__file__).resolve().parent
+RESULTS_DIR = REPO_DIR / "benchmark_results"
+REGRESSION_TOLERANCE = 0.10
+
+# Prompts tokenised as model1_tokenize_prompt would, for the retrieval suite
+RETRIEVAL_TOKENS = [
+    {"weather": "cold", "occasion": "work", "additional_preferences": "navy, no hoodies"},
+    {"weather": "hot", "occasion": "weekend", "additional_preferences": "something that goes with beige shorts"},
+    {"weather": "rainy", "occasion": "date night", "additional_preferences": "black"},
+    {"weather": "mild", "occasion": "gym", "additional_preferences": ""},
+]
+STYLE_QUERIES = [
+    "How to style a casual navy hoodie? Include specific outfit combinations.",
+    "What colors complement burgundy in fashion? Color wheel and color theory recommendations.",
+]
+
+
+def measure(fn, repeat=5, number=1, setup=None):
+    """
+    Time fn like timeit: `repeat` samples of `number` calls each, with setup() run
+    untimed before every sample. Returns per-call statistics in milliseconds.
+    """
+    samples = []
+    gc_enabled = gc.isenabled()
+    try:
+        for _ in range(repeat):
+            if setup is not None:
+                setup()
+            gc.disable()
+            start = time.perf_counter()
+            for _ in range(number):
+                fn()
+            samples.append((time.perf_counter() - start) / number * 1000)
+            if gc_enabled:
+                gc.enable()
+    finally:
+        if gc_enabled:
+            gc.enable()
+    arr = np.array(samples)
+    return {
+        "repeat": repeat,
+        "number": number,
+        "min_ms": round(float(arr.min()), 3),
+        "median_ms": round(float(np.median(arr)), 3),
+        "mean_ms": round(float(arr.mean()), 3),
+        "p95_ms": round(float(np.percentile(arr, 95)), 3),
+    }
+
+
+@contextmanager
+def working_directory(path):
+    previous = os.getcwd()
+    os.chdir(path)
+    try:
+        yield
+    finally:
+        os.chdir(previous)
+
+
+class ReplayExtractor:
+    """FeatureExtractor stand-in for tracker suites: replays the features attached to synthetic captures"""
+
+    use_segmentation = False
+
+    def __init__(self):
+        self.feature_weights = list(FEATURE_WEIGHTS)
+
+    @property
+    def version(self):
+        return extractor_version(self.use_segmentation)
+
+    def extract_features(self, image, is_full_outfit=False):
+        return image.info.get(INFO_KEY)
+
+    def calculate_similarity(self, features1, features2):
+        if features1 is None or features2 is None or len(features1) != len(features2):
+            return 0.0
+        features1, features2 = np.asarray(features1), np.asarray(features2)
+        return float(features1 @ features2 / (np.linalg.norm(features1) * np.linalg.norm(features2) + 1e-7))
+
+    def calculate_similarity_multi_view(self, features, reference_features_list):
+        return max((self.calculate_similarity(features, r) for r in reference_features_list), default=0.0)
+
+
+def offline_styling(attributes_list):
+    """Styling suggestions for listing copy without an LLM call"""
+    return [default_suggestion(attributes) for attributes in attributes_list]
+
+
+class Bench:
+    """One synthetic wardrobe and a scratch directory trackers are opened in"""
+
+    def __init__(self, size, workdir, seed=0, views=(1, 3), image_side=256, feature_storage="list", repeat=5):
+        self.size = size
+        self.workdir = Path(workdir)
+        self.seed = seed
+        self.repeat = repeat
+        self.feature_storage = feature_storage
+        start = time.perf_counter()
+        self.database, self.generator = generate_wardrobe(size, seed=seed, image_side=image_side, views=views)
+        self.generate_seconds = round(time.perf_counter() - start, 2)
+
+    def tracker(self):
+        """A WardrobeTracker over a fresh copy of the wardrobe (suites may modify it)"""
+        from wardrobe_tracker import WardrobeTracker
+        for pattern in ("clothing_database.json", "wear_events.jsonl", "features_full*", "feature_pca*.npz",
+                        "listing_content.jsonl"):
+            for path in self.workdir.glob(pattern):
+                path.unlink(missing_ok=True)
+        with open(self.workdir / "matcher_config.json", "w") as f:
+            json.dump({"feature_storage": self.feature_storage}, f)
+        write_wardrobe(self.database, self.workdir / "clothing_database.json")
+        with working_directory(self.workdir):
+            # Listing copy from offline defaults: suites time the tracker, not the LLM
+            tracker = WardrobeTracker(ReplayExtractor(), styling_fn=offline_styling)
+            if self.feature_storage != "list":
+                # Rewrite in the compact format so load/save time what a converted wardrobe costs
+                tracker.save_database()
+        return tracker
+
+    def captures(self, count, novel_fraction=0.2):
+        """Re-captures of random stored items (not listings) mixed with unseen items"""
+        rng = np.random.default_rng(self.seed + 1)
+        items = self.database["items"]
+        captures = []
+        for _ in range(count):
+            if rng.random() < novel_fraction or not items:
+                captures.append(self.generator.capture())
+            else:
+                captures.append(self.generator.capture(items[int(rng.integers(len(items)))]))
+        return captures
+
+
+def suite_extract_features(bench):
+    try:
+        from feature_extractor import FeatureExtractor
+    except ImportError as e:
+        return {"skipped": f"feature extractor unavailable: {e}"}
+    extractor = FeatureExtractor()
+    images = iter([WardrobeGenerator(bench.seed, image_side=1024).capture() for _ in range(bench.repeat + 1)])
+    extractor.extract_features(next(images))   # warm-up (model load, first allocation)
+    current = {}
+    return measure(lambda: extractor.extract_features(current["image"]), bench.repeat,
+                   setup=lambda: current.update(image=next(images)))
+
+
+def _process_captures(bench, captures):
+    tracker = bench.tracker()
+    pending = iter(captures)
+    current, decisions = {}, []
+    with working_directory(bench.workdir):
+        tracker.process_image(next(pending))     # warm-up builds the match and hash indexes
+        result = measure(lambda: decisions.append(tracker.process_image(current["image"])[0]),
+                         len(captures) - 1, setup=lambda: current.update(image=next(pending)))
+    result["decisions"] = {d: decisions.count(d) for d in set(decisions)}
+    return result
+
+
+def suite_process_image(bench):
+    return _process_captures(bench, bench.captures(max(bench.repeat, 10) + 1))
+
+
+def suite_process_image_duplicate(bench):
+    """The camera re-submitting a stored photo: resolved by perceptual hash"""
+    items = bench.database["items"][:max(bench.repeat, 10) + 1]
+    captures = []
+    for item in items:
+        capture = Image.open(BytesIO(base64.b64decode(item["image"])))
+        capture.info[INFO_KEY] = np.array(item["features"])
+        captures.append(capture)
+    return _process_captures(bench, captures)
+
+
+def suite_save_database(bench):
+    tracker = bench.tracker()
+    with working_directory(bench.workdir):
+        result = measure(tracker.save_database, bench.repeat)
+    result["file_mb"] = round((bench.workdir / "clothing_database.json").stat().st_size / 1e6, 2)
+    return result
+
+
+def suite_load_database(bench):
+    tracker = bench.tracker()
+    with working_directory(bench.workdir):
+        return measure(tracker.load_database, bench.repeat)
+
+
+def suite_move_to_listings(bench):
+    tracker = bench.tracker()
+    item_ids = iter([item["id"] for item in tracker.database["items"]])
+    current = {}
+    with working_directory(bench.workdir):
+        return measure(lambda: tracker.move_to_listings(current["id"], "items"), bench.repeat,
+                       setup=lambda: current.update(id=next(item_ids)))
+
+
+def suite_grid_rendering(bench):
+    """display_wardrobe_grid in Streamlit bare mode: the Python side of a render"""
+    tracker = bench.tracker()
+    with working_directory(bench.workdir):
+        return measure(tracker.display_wardrobe_grid, max(1, bench.repeat // 2))
+
+
+def suite_rag_retrieval(bench):
+    """Local wardrobe retrieval (OutfitRetriever with the colour index) for SambaFit prompts"""
+    from outfit_retrieval import OutfitRetriever
+    tracker = bench.tracker()
+    with working_directory(bench.workdir):
+        start = time.perf_counter()
+        color_index = tracker.color_index()
+        build_ms = (time.perf_counter() - start) * 1000
+    retriever = OutfitRetriever(color_index=color_index)
+    queries = iter(RETRIEVAL_TOKENS * bench.repeat)
+    current = {}
+    result = measure(lambda: retriever.select_candidates(tracker.database["items"], current["tokens"]),
+                     bench.repeat, setup=lambda: current.update(tokens=next(queries)))
+    result["color_index_build_ms"] = round(build_ms, 3)
+    return result
+
+
+def suite_style_guide_retrieval(bench):
+    """Similarity search over the style guide vector store (independent of wardrobe size)"""
+    try:
+        from style_advisor import StyleAdvisor
+    except ImportError as e:
+        return {"skipped": f"style advisor unavailable: {e}"}
+    with working_directory(REPO_DIR):
+        advisor = StyleAdvisor(os.getenv("SAMBANOVA_API_KEY", ""))
+    if advisor.vector_store is None:
+        return {"skipped": "no style guide vector store"}
+    queries = iter(STYLE_QUERIES * bench.repeat)
+    return measure(lambda: advisor.vector_store.similarity_search(next(queries), k=2), bench.repeat)
+
+
+SUITES = {
+    "extract_features": suite_extract_features,
+    "process_image": suite_process_image,
+    "process_image_duplicate": suite_process_image_duplicate,
+    "save_database": suite_save_database,
+    "load_database": suite_load_database,
+    "move_to_listings": suite_move_to_listings,
+    "grid_rendering": suite_grid_rendering,
+    "rag_retrieval": suite_rag_retrieval,
+    "style_guide_retrieval": suite_style_guide_retrieval,
+}
+
+
+def _git_commit():
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], cwd=REPO_DIR, capture_output=True,
+                              text=True, timeout=10).stdout.strip() or None
+    except (OSError, subprocess.SubprocessError):
+        return None
+
+
+def run_benchmarks(sizes=(1000,), suites=None, seed=0, repeat=5, views=(1, 3), feature_storage="list"):
+    """Run the suites on a synthetic wardrobe of every size; returns the results document"""
+    suites = suites or list(SUITES)
+    try:
+        from streamlit.logger import set_log_level
+        set_log_level("error")    # bare-mode warnings on every st call
+    except ImportError:
+        pass
+
+    report = {
+        "generated_at": datetime.now().isoformat(),
+        "git_commit": _git_commit(),
+        "python": platform.python_version(),
+        "machine": platform.platform(),
+        "config": {"seed": seed, "repeat": repeat, "views": list(views), "feature_storage": feature_storage},
+        "results": {},
+    }
+    for size in sizes:
+        with tempfile.TemporaryDirectory(prefix="vestique-bench-") as workdir:
+            bench = Bench(size, workdir, seed, views, feature_storage=feature_storage, repeat=repeat)
+            results = {"generate_seconds": bench.generate_seconds}
+            for name in suites:
+                logging.info(f"Benchmark {name} ({size} items)")
+                try:
+                    results[name] = SUITES[name](bench)
+                except Exception as e:
+                    logging.error(f"Benchmark {name} failed: {e}")
+                    results[name] = {"error": str(e)}
+            report["results"][str(size)] = results
+    return report
+
+
+def compare(report, baseline, tolerance=REGRESSION_TOLERANCE):
+    """
+    Median-time ratios of a report against a baseline for every suite and size in both.
+
+    Returns:
+        list: dicts with size, suite, baseline_ms, current_ms, ratio and status
+        ("regression", "improvement" or "same").
+    """
+    rows = []
+    for size, results in report["results"].items():
+        for suite, result in results.items():
+            before = baseline.get("results", {}).get(size, {}).get(suite)
+            if not isinstance(result, dict) or not isinstance(before, dict):
+                continue
+            if "median_ms" not in result or "median_ms" not in before:
+                continue
+            ratio = result["median_ms"] / max(before["median_ms"], 1e-6)
+            status = "regression" if ratio > 1 + tolerance else "improvement" if ratio < 1 - tolerance else "same"
+            rows.append({"size": size, "suite": suite, "baseline_ms": before["median_ms"],
+                         "current_ms": result["median_ms"], "ratio": round(ratio, 3), "status": status})
+    return rows
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--sizes", type=int, nargs="+", default=[1000], help="wardrobe sizes (items)")
+    parser.add_argument("--suites", nargs="+", choices=list(SUITES), default=None)
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--views", type=int, nargs=2, default=[1, 3], metavar=("MIN", "MAX"))
+    parser.add_argument("--feature-storage", choices=["list", "float16", "pca"], default="list")
+    parser.add_argument("--output", default=None, help="results file (default: benchmark_results/<timestamp>.json)")
+    parser.add_argument("--compare", default=None, help="earlier results file to check for regressions")
+    parser.add_argument("--tolerance", type=float, default=REGRESSION_TOLERANCE)
+    args = parser.parse_args()
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s - %(levelname)s - %(message)s")
+
+    results = run_benchmarks(args.sizes, args.suites, args.seed, args.repeat, tuple(args.views), args.feature_storage)
+    output = Path(args.output) if args.output else RESULTS_DIR / f"{datetime.now():%Y%m%d-%H%M%S}.json"
+    output.parent.mkdir(parents=True, exist_ok=True)
+    with open(output, "w") as f:
+        json.dump(results, f, indent=4)
+    print(json.dumps(results["results"], indent=4))
+    print(f"Wrote {output}")
+
+    if args.compare:
+        with open(args.compare) as f:
+            rows = compare(results, json.load(f), args.tolerance)
+        for row in rows:
+            print(f"{row['size']:>8} {row['suite']:<26} {row['baseline_ms']:>10.2f} -> {row['current_ms']:>10.2f} ms"
+                  f"  x{row['ratio']:<6} {row['status']}")
+        if any(row["status"] == "regression" for row in rows):
+            raise SystemExit(1)
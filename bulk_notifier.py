@@ -0,0 +1,104 @@
+"""
+bulk_notifier.py
+
+Bulk reminder pipeline for weekly digests. Per-recipient content is generated
+concurrently with bounded parallelism (content already previewed is reused),
+then messages are submitted to Brevo in chunks using messageVersions so one
+HTTP request carries many recipients.
+"""
+
+import logging
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import requests
+
+# Brevo accepts up to 1000 message versions per request
+BREVO_MAX_VERSIONS = 1000
+
+
+class BulkNotifier:
+    """Generates and sends digest emails for many recipients"""
+
+    def __init__(self, notifier, max_workers=8, chunk_size=BREVO_MAX_VERSIONS,
+                 subject="💃 Time to Refresh Your Wardrobe!"):
+        self.notifier = notifier
+        self.max_workers = max_workers
+        self.chunk_size = min(chunk_size, BREVO_MAX_VERSIONS)
+        self.subject = subject
+
+    def _content_for(self, job):
+        if job.get("content"):
+            return job["content"]
+        items_info = self.notifier.get_items_info(job["items"])
+        return self.notifier.request_personalized_content(items_info)
+
+    def generate(self, jobs):
+        """
+        Fill in job["content"] for every job concurrently.
+
+        Args:
+            jobs (list): dicts with "email", "items" and optionally a pre-generated "content".
+        """
+        with ThreadPoolExecutor(max_workers=self.max_workers) as executor:
+            contents = list(executor.map(self._content_for, jobs))
+        for job, content in zip(jobs, contents):
+            job["content"] = content
+        return jobs
+
+    def _send_chunk(self, chunk):
+        headers = {
+            "accept": "application/json",
+            "api-key": self.notifier.brevo_api_key,
+            "content-type": "application/json"
+        }
+        payload = {
+            "sender": {"name": "Vestique", "email": self.notifier.sender_email},
+            "subject": self.subject,
+            # Brevo only lets versions override textContent when a global one is present
+            "textContent": chunk[0]["content"],
+            "messageVersions": [
+                {"to": [{"email": job["email"]}], "textContent": job["content"]}
+                for job in chunk
+            ]
+        }
+        response = requests.post(self.notifier.url, headers=headers, json=payload, timeout=30)
+        return response.status_code == 201
+
+    def send(self, jobs):
+        """Submit generated jobs in chunks; returns the emails that were accepted"""
+        accepted = []
+        for start in range(0, len(jobs), self.chunk_size):
+            chunk = jobs[start:start + self.chunk_size]
+            try:
+                if self._send_chunk(chunk):
+                    accepted.extend(job["email"] for job in chunk)
+                else:
+                    logging.error(f"Brevo rejected batch of {len(chunk)} messages")
+            except Exception as e:
+                logging.error(f"Error sending batch of {len(chunk)} messages: {e}")
+        return accepted
+
+    def run(self, jobs):
+        """Generate and send all jobs; returns a throughput report"""
+        jobs = [job for job in jobs if job.get("email")]
+        start = time.perf_counter()
+        self.generate(jobs)
+        generated_at = time.perf_counter()
+        accepted = self.send(jobs)
+        finished = time.perf_counter()
+
+        generation_seconds = generated_at - start
+        send_seconds = finished - generated_at
+        report = {
+            "recipients": len(jobs),
+            "sent": len(accepted),
+            "failed": len(jobs) - len(accepted),
+            "batches": (len(jobs) + self.chunk_size - 1) // self.chunk_size,
+            "generation_seconds": round(generation_seconds, 3),
+            "send_seconds": round(send_seconds, 3),
+            "emails_per_second": round(len(accepted) / (finished - start), 2) if finished > start else 0.0,
+            "accepted": accepted,
+        }
+        logging.info(f"Bulk notification run: { {k: v for k, v in report.items() if k != 'accepted'} }")
+        return report
@@ -6,9 +6,9 @@ Allows users to capture and process new clothing items and outfits.
 """
 
 import streamlit as st
-from PIL import Image
 from datetime import datetime
 from wardrobe_tracker import WardrobeTracker
+from image_pipeline import load_image, INFO_KEY
 
 def capture_tab(mode: str, tracker: WardrobeTracker, debug_mode: bool):
     """
@@ -41,8 +41,11 @@ def capture_tab(mode: str, tracker: WardrobeTracker, debug_mode: bool):
     )
     if camera is not None:
         if st.session_state['current_image'] is None:
-            image = Image.open(camera)
+            # EXIF-rotated, RGB, bounded size: used for matching, storage and AI analysis
+            image = load_image(camera)
             st.session_state['current_image'] = image
+            if debug_mode:
+                st.write("Ingest:", image.info.get(INFO_KEY))
 
             # Process image
             status, item, similarity = tracker.process_image(
@@ -67,6 +70,13 @@ def capture_tab(mode: str, tracker: WardrobeTracker, debug_mode: bool):
                 if matched_image:
                     st.image(matched_image, caption="Matched Item", use_column_width=True)
             
+            if st.button("❌ Not this item"):
+                # Undo the wear, record the false match and offer to add the capture as new
+                tracker.reject_match()
+                st.session_state['image_status'] = "new"
+                st.session_state['image_item'] = None
+                st.rerun()
+
             if debug_mode:
                 st.write("Match details:", item)
                 
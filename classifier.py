@@ -5,27 +5,23 @@ import google.generativeai as genai
 from dotenv import load_dotenv
 import asyncio
 import aiohttp
-import requests
-import openai
-import base64
 import os
 from pathlib import Path
+from image_pipeline import to_data_url
+from metrics import timed
+from llm_client import create_chat_completion, openai_client, post_chat_completion
 # Set your Gemini API key
 
 #setting up SambaNova
 env_path = Path('.') / '.env'
 load_dotenv(dotenv_path=env_path)
 SAMBANOVA_API_KEY = os.environ["SAMBANOVA_API_KEY"]
-API_URL = 'https://api.sambanova.ai/v1/chat/completions'
 HEADERS = {
     "Authorization": f"Bearer {SAMBANOVA_API_KEY}",
     "Content-Type": "application/json"
 }
 
-client = openai.OpenAI(
-    api_key=SAMBANOVA_API_KEY,
-    base_url="https://api.sambanova.ai/v1",
-)
+client = openai_client(SAMBANOVA_API_KEY)
 
 # Initialize the Gemini API client
 
@@ -34,6 +30,7 @@ client = openai.OpenAI(
 # uploaded_file = st.file_uploader("Upload an image", type=["png", "jpg", "jpeg"])
 
 
+@timed("llm.json")
 def prompt_llama(message, model="Meta-Llama-3.1-8B-Instruct", stream=False):
     headers = {
         "Authorization": f"Bearer {SAMBANOVA_API_KEY}",
@@ -101,7 +98,7 @@ def prompt_llama(message, model="Meta-Llama-3.1-8B-Instruct", stream=False):
     }
 
     # Send the POST request asynchronously
-    llama_res = requests.post(API_URL, headers=headers, json=data)
+    llama_res = post_chat_completion(data, "classifier.describe_json", headers=headers)
     res_json = llama_res.json()
     print(res_json['choices'][0]['message']['content'])
     # Check if the request was successful
@@ -136,20 +133,15 @@ llama_analyze_prompt = '''You are a skilled fashion designer with extensive expe
 
 
 
-import base64
-from io import BytesIO
-
+@timed("llm.vision")
 def analyze_image_llama_vision(image):
-    # Convert the Pillow image to bytes
-    with BytesIO() as buffer:
-        image.save(buffer, format="JPEG")  # Use JPEG for smaller size
-        image_bytes = buffer.getvalue()
-
-    # Encode the image bytes to Base64 with proper MIME type prefix
-    base64_str = f"data:image/jpeg;base64,{base64.b64encode(image_bytes).decode('utf-8')}"
+    # Downscaled JPEG as a Base64 data URL; the model does not need the full camera frame
+    base64_str = to_data_url(image)
 
     # Send the request to the model
-    response = client.chat.completions.create(
+    response = create_chat_completion(
+        client,
+        "classifier.vision",
         model='Llama-3.2-90B-Vision-Instruct',
         messages=[
             {
@@ -168,6 +160,7 @@ def analyze_image_llama_vision(image):
     return response.choices[0].message.content
 
 
+@timed("llm.classify_outfit")
 async def classify_outfit(image):
     # response_gem = await (analyze_image_gem(image))
     response_lam_analyze = analyze_image_llama_vision(image)
@@ -0,0 +1,182 @@
+"""
+color_index.py
+
+Colour index over the wardrobe's dominant-colour palettes. Palettes are kept in
+CIE Lab in one padded matrix so "similar colour" and "goes with this colour"
+queries are a few vectorised numpy operations, letting the Style Advisor and
+SambaFit pre-filter pieces locally instead of asking the LLM.
+"""
+
+import numpy as np
+
+from item_attributes import item_attributes
+
+MAX_COLORS = 5
+# Colours below this Lab chroma or lightness are treated as neutrals (black, white, grey, beige, navy)
+NEUTRAL_CHROMA = 18.0
+NEUTRAL_DARK_L = 20.0
+# Hue offsets (degrees) that read as harmonious: complementary, split complementary, analogous
+HARMONY_OFFSETS = {"complementary": [180], "split": [150, 210], "analogous": [30, -30]}
+HARMONY_WEIGHTS = {"complementary": 1.0, "split": 0.8, "analogous": 0.6}
+HUE_TOLERANCE = 30.0
+NEUTRAL_SCORE = 0.5
+
+COLOR_NAMES = {
+    "black": (20, 20, 20), "white": (245, 245, 245), "grey": (128, 128, 128), "gray": (128, 128, 128),
+    "red": (200, 30, 40), "maroon": (110, 20, 30), "burgundy": (120, 25, 45), "pink": (240, 150, 180),
+    "orange": (240, 130, 30), "yellow": (240, 210, 50), "mustard": (200, 160, 40), "beige": (220, 200, 170),
+    "brown": (120, 80, 45), "tan": (200, 160, 110), "khaki": (190, 175, 125), "olive": (110, 115, 50),
+    "green": (40, 140, 60), "teal": (20, 120, 120), "blue": (40, 80, 200), "navy": (25, 35, 80),
+    "denim": (70, 100, 140), "purple": (110, 50, 150), "lavender": (180, 160, 220), "cream": (250, 240, 215),
+}
+
+
+def rgb_to_lab(rgb):
+    """sRGB (0-255, shape (..., 3)) to CIE Lab under D65"""
+    rgb = np.asarray(rgb, dtype=np.float64) / 255.0
+    linear = np.where(rgb > 0.04045, ((rgb + 0.055) / 1.055) ** 2.4, rgb / 12.92)
+    matrix = np.array([[0.4124, 0.3576, 0.1805],
+                       [0.2126, 0.7152, 0.0722],
+                       [0.0193, 0.1192, 0.9505]])
+    xyz = linear @ matrix.T / np.array([0.95047, 1.0, 1.08883])
+    f = np.where(xyz > 0.008856, np.cbrt(xyz), 7.787 * xyz + 16 / 116)
+    return np.stack([116 * f[..., 1] - 16, 500 * (f[..., 0] - f[..., 1]), 200 * (f[..., 1] - f[..., 2])], axis=-1)
+
+
+def palette_from_color_name(name):
+    """Single-colour palette for a colour word such as 'navy', or None if unknown"""
+    rgb = COLOR_NAMES.get(str(name).strip().lower())
+    return [[*rgb, 1.0]] if rgb else None
+
+
+def color_names_in(text):
+    """Colour words mentioned in free text, in order of appearance"""
+    words = str(text or "").lower().replace(",", " ").split()
+    return [w for w in words if w in COLOR_NAMES]
+
+
+def _pack(palette, max_colors=MAX_COLORS):
+    """Lab colours and normalised weights of a palette, padded to max_colors"""
+    lab = np.zeros((max_colors, 3))
+    weights = np.zeros(max_colors)
+    entries = [entry for entry in palette or [] if len(entry) >= 4][:max_colors]
+    if entries:
+        arr = np.asarray(entries, dtype=np.float64)
+        lab[:len(entries)] = rgb_to_lab(arr[:, :3])
+        weights[:len(entries)] = arr[:, 3] / max(arr[:, 3].sum(), 1e-7)
+    return lab, weights
+
+
+class ColorIndex:
+    """In-memory Lab palette matrix for colour similarity and harmony queries"""
+
+    def __init__(self, items, palette_fn=None, max_colors=MAX_COLORS):
+        """
+        Args:
+            items (list): Wardrobe items; palettes are read from item["color_palette"].
+            palette_fn (callable): Optional palette_fn(item) used for items without a stored
+                palette, e.g. WardrobeTracker.get_color_palette.
+        """
+        self.max_colors = max_colors
+        self.items = []
+        labs, weights = [], []
+        for item in items:
+            palette = item.get("color_palette")
+            if palette is None and palette_fn is not None:
+                palette = palette_fn(item)
+            if not palette:
+                continue
+            lab, weight = _pack(palette, max_colors)
+            self.items.append(item)
+            labs.append(lab)
+            weights.append(weight)
+
+        self.lab = np.array(labs).reshape(-1, max_colors, 3)
+        self.weights = np.array(weights).reshape(-1, max_colors)
+        self.ids = [item["id"] for item in self.items]
+        self.categories = [str(item_attributes(item)["category"]).lower() for item in self.items]
+
+        chroma = np.hypot(self.lab[..., 1], self.lab[..., 2])
+        self.hue = np.degrees(np.arctan2(self.lab[..., 2], self.lab[..., 1])) % 360
+        self.chromatic = (chroma >= NEUTRAL_CHROMA) & (self.lab[..., 0] >= NEUTRAL_DARK_L) & (self.weights > 0)
+
+    def __len__(self):
+        return len(self.items)
+
+    def _query_palette(self, query):
+        """Accept an item id, an item dict, a colour name or a palette"""
+        if isinstance(query, dict):
+            return query.get("color_palette")
+        if isinstance(query, str):
+            return palette_from_color_name(query)
+        if query in self.ids:
+            return self.items[self.ids.index(query)].get("color_palette")
+        return query
+
+    def _rank(self, scores, k, exclude_id=None, category=None, exclude_category=None):
+        order = np.argsort(scores)[::-1]
+        results = []
+        for i in order:
+            if self.ids[i] == exclude_id or scores[i] <= 0:
+                continue
+            if category and self.categories[i] != category.lower():
+                continue
+            if exclude_category and self.categories[i] == exclude_category.lower():
+                continue
+            results.append((self.items[i], round(float(scores[i]), 3)))
+            if len(results) >= k:
+                break
+        return results
+
+    def color_similarity(self, palette):
+        """
+        Similarity in [0, 1] of every indexed item to a palette: weighted average over the
+        query colours of the distance (CIE76 delta E) to the nearest colour in the item.
+        """
+        if not len(self) or not palette:
+            return np.zeros(len(self))
+        q_lab, q_weights = _pack(palette, self.max_colors)
+        used = q_weights > 0
+        q_lab, q_weights = q_lab[used], q_weights[used]
+
+        distances = np.linalg.norm(self.lab[:, None, :, :] - q_lab[None, :, None, :], axis=-1)
+        distances = np.where(self.weights[:, None, :] > 0, distances, np.inf)
+        nearest = distances.min(axis=2)
+        delta_e = (nearest * q_weights).sum(axis=1)
+        return np.clip(1.0 - delta_e / 100.0, 0.0, 1.0)
+
+    def harmony_scores(self, palette):
+        """How well every indexed item goes with the palette's main chromatic colour, in [0, 1]"""
+        if not len(self) or not palette:
+            return np.zeros(len(self))
+        q_lab, q_weights = _pack(palette, self.max_colors)
+        q_chroma = np.hypot(q_lab[:, 1], q_lab[:, 2])
+        chromatic = (q_chroma >= NEUTRAL_CHROMA) & (q_lab[:, 0] >= NEUTRAL_DARK_L) & (q_weights > 0)
+
+        # Item "neutrality": share of its palette that is achromatic
+        neutral_share = np.where(self.chromatic, 0.0, self.weights).sum(axis=1)
+        if not chromatic.any():
+            # A neutral piece goes with most things; prefer items with a clear colour
+            return NEUTRAL_SCORE + (1 - NEUTRAL_SCORE) * (1 - neutral_share)
+
+        main = np.argmax(np.where(chromatic, q_weights, -1))
+        q_hue = np.degrees(np.arctan2(q_lab[main, 2], q_lab[main, 1])) % 360
+
+        scores = np.zeros(self.hue.shape)
+        for relation, offsets in HARMONY_OFFSETS.items():
+            for offset in offsets:
+                diff = np.abs((self.hue - (q_hue + offset) + 180) % 360 - 180)
+                fit = np.clip(1 - diff / HUE_TOLERANCE, 0, 1) * HARMONY_WEIGHTS[relation]
+                scores = np.maximum(scores, fit)
+        chromatic_score = (np.where(self.chromatic, scores, 0) * self.weights).sum(axis=1)
+        return np.maximum(chromatic_score, NEUTRAL_SCORE * neutral_share)
+
+    def similar(self, query, k=5, category=None):
+        """Items whose palette is closest to the query (item id, item, colour name or palette)"""
+        exclude_id = query.get("id") if isinstance(query, dict) else (query if query in self.ids else None)
+        return self._rank(self.color_similarity(self._query_palette(query)), k, exclude_id, category)
+
+    def complementary(self, query, k=5, category=None, exclude_category=None):
+        """Items that go with the query colour; pass exclude_category to skip same-type pieces"""
+        exclude_id = query.get("id") if isinstance(query, dict) else (query if query in self.ids else None)
+        return self._rank(self.harmony_scores(self._query_palette(query)), k, exclude_id, category, exclude_category)
@@ -1,16 +1,17 @@
-import requests
 from dotenv import load_dotenv
 from pathlib import Path
 import os
+from metrics import timed, increment
+from llm_client import post_chat_completion
 env_path = Path('.') / '.env'
 load_dotenv(dotenv_path=env_path)
 SAMBANOVA_API_KEY = os.environ["SAMBANOVA_API_KEY"]
-API_URL = 'https://api.sambanova.ai/v1/chat/completions'
 HEADERS = {
     "Authorization": f"Bearer {SAMBANOVA_API_KEY}",
     "Content-Type": "application/json"
 }
 
+@timed("marketplace.decide_match")
 def decide_match(
     liked_characteristics, disliked_characteristics, item_characteristics, model='Meta-Llama-3.1-70B-Instruct'
 ):
@@ -65,15 +66,17 @@ def decide_match(
     }
 
     # API request
-    llama_res = requests.post(API_URL, headers=HEADERS, json=data)
+    llama_res = post_chat_completion(data, "marketplace.decide_match", headers=HEADERS)
     res_json = llama_res.json()
 
     # Validate and interpret the response
     if res_json and "choices" in res_json and res_json["choices"]:
         result = res_json["choices"][0]["message"]["content"].strip()
         if result == "True":
+            increment("marketplace_filter", result="match")
             return True
         elif result == "False":
+            increment("marketplace_filter", result="no_match")
             return False
         else:
             raise ValueError(f"Unexpected response from model: {result}")
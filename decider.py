@@ -1,16 +1,17 @@
 import os
 from dotenv import load_dotenv
 from pathlib import Path
-import requests
+from metrics import timed
+from llm_client import post_chat_completion
 env_path = Path('.') / '.env'
 load_dotenv(dotenv_path=env_path)
 SAMBANOVA_API_KEY = os.environ["SAMBANOVA_API_KEY"]
-API_URL = 'https://api.sambanova.ai/v1/chat/completions'
 HEADERS = {
     "Authorization": f"Bearer {SAMBANOVA_API_KEY}",
     "Content-Type": "application/json"
 }
 
+@timed("marketplace.decide_preference")
 def decide_preference(top_worn, least_worn, model='Meta-Llama-3.1-70B-Instruct'):
     data = {
         "stream": False,
@@ -47,7 +48,7 @@ def decide_preference(top_worn, least_worn, model='Meta-Llama-3.1-70B-Instruct')
             }
         ]
     }
-    llama_res = requests.post(API_URL, headers=HEADERS, json=data)
+    llama_res = post_chat_completion(data, "marketplace.decide_preference", headers=HEADERS)
     res_json = llama_res.json()
     # Check if the request was successful
     
@@ -1,14 +1,11 @@
 import os
 import streamlit as st
 import json
-from openai import OpenAI
+from llm_client import create_chat_completion, openai_client
 
 class DeveloperAssistant:
     def __init__(self):
-        self.client = OpenAI(
-            api_key=os.environ.get("SAMBANOVA_API_KEY"),
-            base_url="https://api.sambanova.ai/v1"
-        )
+        self.client = openai_client(os.environ.get("SAMBANOVA_API_KEY"))
         
     def get_file_content(self, file_path):
         """Read and return the contents of a file."""
@@ -21,7 +18,9 @@ class DeveloperAssistant:
     def get_completion(self, messages):
         """Get completion from the model."""
         try:
-            response = self.client.chat.completions.create(
+            response = create_chat_completion(
+                self.client,
+                "developer_assistant",
                 model="Meta-Llama-3.1-70B-Instruct",
                 messages=messages,
                 temperature=0.5,
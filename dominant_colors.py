@@ -0,0 +1,76 @@
+"""
+dominant_colors.py
+
+Dominant-colour extraction for wardrobe images. The image is downsampled and a
+random pixel subsample is clustered with MiniBatchKMeans, so a palette costs a
+few milliseconds instead of a full-resolution KMeans. Palettes are cached per
+image hash and stored on items as a compact "color_palette" attribute.
+"""
+
+import hashlib
+import threading
+from collections import OrderedDict
+
+import numpy as np
+from sklearn.cluster import MiniBatchKMeans
+
+MAX_SIDE = 128
+SAMPLE_SIZE = 4096
+N_COLORS = 5
+CACHE_SIZE = 256
+
+_palette_cache = OrderedDict()
+# Trackers of different tenants extract palettes concurrently
+_cache_lock = threading.Lock()
+
+
+def _downsample(image, max_side=MAX_SIDE):
+    small = image.convert("RGB")
+    small.thumbnail((max_side, max_side))
+    return np.asarray(small, dtype=np.uint8).reshape(-1, 3)
+
+
+def image_hash(pixels):
+    return hashlib.md5(pixels.tobytes()).hexdigest()
+
+
+def extract_palette(image, n_colors=N_COLORS, max_side=MAX_SIDE, sample_size=SAMPLE_SIZE, seed=0):
+    """
+    Dominant colours of a PIL image.
+
+    Returns:
+        list: [[r, g, b, weight], ...] sorted by weight (share of sampled pixels), descending.
+    """
+    pixels = _downsample(image, max_side)
+    key = (image_hash(pixels), n_colors)
+    with _cache_lock:
+        if key in _palette_cache:
+            _palette_cache.move_to_end(key)
+            # Callers store palettes on items; never hand out the cached lists themselves
+            return [list(entry) for entry in _palette_cache[key]]
+
+    rng = np.random.default_rng(seed)
+    if len(pixels) > sample_size:
+        pixels = pixels[rng.choice(len(pixels), sample_size, replace=False)]
+
+    n_clusters = min(n_colors, len(np.unique(pixels, axis=0)))
+    kmeans = MiniBatchKMeans(n_clusters=n_clusters, n_init=3, batch_size=1024, random_state=seed)
+    labels = kmeans.fit_predict(pixels.astype(np.float32))
+    weights = np.bincount(labels, minlength=n_clusters) / len(labels)
+
+    order = np.argsort(weights)[::-1]
+    palette = [
+        [*(int(round(c)) for c in kmeans.cluster_centers_[i]), round(float(weights[i]), 3)]
+        for i in order
+    ]
+
+    with _cache_lock:
+        _palette_cache[key] = [list(entry) for entry in palette]
+        if len(_palette_cache) > CACHE_SIZE:
+            _palette_cache.popitem(last=False)
+    return palette
+
+
+def palette_hex(palette):
+    """['#rrggbb', ...] for display"""
+    return ["#{:02x}{:02x}{:02x}".format(*entry[:3]) for entry in palette]
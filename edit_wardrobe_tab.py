@@ -103,12 +103,7 @@ def edit_wardrobe_tab(tracker: WardrobeTracker):
                     handle_update(tracker, item, new_wear_count, new_last_worn)
                 
                 if delete_clicked:
-                    collection = item['collection']
-                    tracker.database[collection] = [
-                        x for x in tracker.database[collection] 
-                        if x['id'] != item['id']
-                    ]
-                    tracker.save_database()
+                    tracker.delete_item(item['id'], item['collection'])
                     st.success("🗑️ Item deleted!")
                     time.sleep(0.5)
                     st.rerun()
@@ -0,0 +1,175 @@
+"""
+email_templates.py
+
+Local templates for reminder emails and marketplace listings. Structure
+(greeting, per-item lines, sign-off, listing title/features) is rendered from
+item data; only the short styling suggestion per item comes from the LLM, and
+those slots are requested in one batch and cached by item attributes.
+"""
+
+import hashlib
+import json
+import logging
+import threading
+from pathlib import Path
+
+from item_attributes import item_attributes
+
+SLOT_CACHE_PATH = Path("slot_cache.json")
+
+# Offline styling suggestions, keyed by words found in the item type
+DEFAULT_SUGGESTIONS = {
+    "shirt": "Tuck it into dark jeans with clean sneakers for an easy smart-casual look.",
+    "t-shirt": "Layer it under an open overshirt or denim jacket with chinos.",
+    "hoodie": "Pair it with joggers and white trainers, or layer it under a long coat.",
+    "jacket": "Throw it over a plain tee and slim trousers to sharpen a casual outfit.",
+    "blazer": "Wear it over a crew-neck knit with dark denim for relaxed tailoring.",
+    "pants": "Match them with a crisp shirt or a fine-knit sweater and loafers.",
+    "jeans": "Roll the hem slightly and pair with a tucked tee and boots.",
+    "shorts": "Keep it light with a linen shirt and minimal sneakers.",
+    "dress": "Add a denim jacket and ankle boots to take it from day to evening.",
+    "skirt": "Balance it with a tucked knit top and simple flats.",
+    "shoes": "Let them anchor a neutral outfit so they stand out.",
+    "hat": "Use it to finish a simple outfit of neutral basics.",
+    "outfit": "Swap one piece for a contrasting colour to give it a fresh twist.",
+}
+GENERIC_SUGGESTION = "Pair it with neutral basics and one standout accessory."
+
+GREETING = "Hi there! 👋"
+INTRO = "A few pieces in your wardrobe haven't seen daylight in a while - here's how to bring them back:"
+SIGN_OFF = "Pick one this week and give it a spin! 💃\n\n- Vestique"
+
+
+def slot_key(attributes):
+    """Cache key for a styling slot: items with the same look share a suggestion"""
+    fields = [attributes.get(k) for k in ("type", "primary_color", "material", "style", "fit")]
+    normalized = "|".join(str(f).strip().lower() for f in fields)
+    return hashlib.sha1(normalized.encode()).hexdigest()
+
+
+def default_suggestion(attributes):
+    item_type = str(attributes.get("type") or attributes.get("category") or "").lower()
+    # Longest keyword first so "t-shirt" wins over "shirt"
+    for keyword in sorted(DEFAULT_SUGGESTIONS, key=len, reverse=True):
+        if keyword in item_type:
+            return DEFAULT_SUGGESTIONS[keyword]
+    return GENERIC_SUGGESTION
+
+
+class SlotCache:
+    """Thread-safe styling-suggestion cache persisted as JSON"""
+
+    def __init__(self, path=SLOT_CACHE_PATH):
+        self.path = Path(path)
+        self.lock = threading.Lock()
+        self.entries = {}
+        if self.path.exists():
+            try:
+                with open(self.path) as f:
+                    self.entries = json.load(f)
+            except (json.JSONDecodeError, OSError) as e:
+                logging.error(f"Error loading slot cache: {e}")
+
+    def get(self, key):
+        with self.lock:
+            return self.entries.get(key)
+
+    def update(self, values):
+        with self.lock:
+            self.entries.update(values)
+            try:
+                with open(self.path, "w") as f:
+                    json.dump(self.entries, f)
+            except OSError as e:
+                logging.error(f"Error saving slot cache: {e}")
+
+
+slot_cache = SlotCache()
+
+
+def fill_styling_slots(attributes_list, request_fn=None, cache=None, refresh=False, report=None):
+    """
+    Styling suggestion per item, taken from the cache where possible.
+
+    Args:
+        attributes_list (list): item_attributes() dicts.
+        request_fn (callable): request_fn(list of attribute dicts) -> list of suggestions
+            (falsy entries for ones it could not generate), one batched request for all
+            uncached items; None means offline defaults.
+        cache (SlotCache): defaults to the shared module cache.
+        refresh (bool): request new suggestions even for cached items (and cache them).
+        report (dict): if given, filled with "requested" and "defaulted" slot counts so
+            callers can tell the user when requested slots fell back to defaults, and
+            "defaulted_items", the indices of the items given a default that way.
+    """
+    cache = cache or slot_cache
+    keys = [slot_key(a) for a in attributes_list]
+    suggestions = [None if refresh else cache.get(k) for k in keys]
+
+    missing = {}
+    for key, attributes, suggestion in zip(keys, attributes_list, suggestions):
+        if suggestion is None and key not in missing:
+            missing[key] = attributes
+
+    generated = {}
+    if missing and request_fn is not None:
+        try:
+            results = request_fn(list(missing.values()))
+            if isinstance(results, list) and len(results) == len(missing):
+                generated = {k: str(s).strip() for k, s in zip(missing, results) if s}
+                cache.update(generated)
+            else:
+                logging.warning("Styling slot response did not match the request; using defaults")
+        except Exception as e:
+            logging.error(f"Error generating styling slots: {e}")
+
+    if report is not None and request_fn is not None:
+        report["requested"] = len(missing)
+        report["defaulted"] = len(missing) - len(generated)
+        report["defaulted_items"] = [i for i, (key, suggestion) in enumerate(zip(keys, suggestions))
+                                     if suggestion is None and key not in generated]
+    return [
+        suggestion or generated.get(key) or default_suggestion(attributes)
+        for key, attributes, suggestion in zip(keys, attributes_list, suggestions)
+    ]
+
+
+def render_reminder_email(items_info, suggestions):
+    """Reminder email body from get_items_info() entries and one suggestion per item"""
+    lines = [GREETING, "", INTRO, ""]
+    for info, suggestion in zip(items_info, suggestions):
+        days = info["days_since"]
+        lines.append(f"👕 {info['name']} ({info['type']}) - unworn for {days} day{'s' if days != 1 else ''}")
+        lines.append(f"   💡 {suggestion}")
+        lines.append("")
+    lines.append(SIGN_OFF)
+    return "\n".join(lines)
+
+
+def render_listing(item, suggestion):
+    """Marketplace listing markdown for an item and its styling suggestion"""
+    attributes = item_attributes(item)
+
+    def known(value):
+        return value and str(value).lower() not in ("unknown", "not specified", "none")
+
+    title_parts = [attributes.get("brand"), attributes.get("primary_color"), attributes.get("type")]
+    title = " ".join(str(p).title() for p in title_parts if known(p)) or item.get("name", item.get("type", "Item"))
+
+    features = []
+    if known(attributes.get("material")):
+        features.append(f"🧵 Material: {attributes['material']}")
+    if attributes.get("secondary_colors"):
+        features.append(f"🎨 Details: {', '.join(attributes['secondary_colors'])}")
+    fit_style = " ".join(str(p) for p in (attributes.get("fit"), attributes.get("style")) if known(p))
+    if fit_style:
+        features.append(f"📐 Fit & style: {fit_style}")
+    if known(attributes.get("season")):
+        features.append(f"🗓️ Season: {attributes['season']}")
+    condition = attributes.get("condition") if known(attributes.get("condition")) else "Pre-loved"
+    features.append(f"✨ Condition: {condition} (worn {item.get('wear_count', 0)} times)")
+
+    lines = [f"### 🏷️ {title}", ""]
+    lines += [f"- {feature}" for feature in features]
+    lines += ["", f"**Styling idea:** {suggestion}"]
+    return "\n".join(lines)
@@ -1,15 +1,16 @@
 import streamlit as st
 from decide_match import *
 from SambaFit import *
+from outfit_retrieval import OutfitRetriever
+from token_extractor import TokenExtractor
+
+# Rule-based extraction handles common prompts locally; the LLM is only the fallback
+token_extractor = TokenExtractor(llm_fallback=model1_tokenize_prompt)
 def fashion_agent(tracker):
     st.title("🤖 SambaFit")
     
     st.markdown("Welcome to SambaFit! Ask me to create an outfit for the day!")
 
-    model_data = []
-    for item in tracker.database['items']:
-        model_data.append({item['id']: item['ai_analysis']})
-
     # Chat history
     if "messages" not in st.session_state:
         st.session_state["messages"] = []
@@ -41,7 +42,7 @@ def fashion_agent(tracker):
 
             # Generate a response (placeholder for now)
             # Replace with API call to SambaFit AI when integrated
-            response = generate_response(user_input, model_data)
+            response = generate_response(user_input, tracker.database['items'], color_index=tracker.color_index())
             images_res = []
             for item in response:
                 # Grab the key
@@ -56,6 +57,12 @@ def fashion_agent(tracker):
 
             # Display success message
             st.success("Response successfully updated with suggested outfits!")
+            if st.session_state.get('debug_mode', False) and "sambafit_prompt_stats" in st.session_state:
+                stats = st.session_state["sambafit_prompt_stats"]
+                st.caption(
+                    f"Pre-selected {stats['candidates']} of {stats['wardrobe_items']} items; "
+                    f"prompt ~{stats['prompt_tokens_before']} -> ~{stats['prompt_tokens_after']} tokens"
+                )
 
             # Clear the input box
             st.session_state["unique_user_input"] = ""
@@ -75,10 +82,16 @@ def get_base_64_by_id(tracker, id):
             return item['image']
     return None
 
-def generate_response(user_input, data):
-    print("data: ",data)
-    model1_res = model1_tokenize_prompt(user_input)
-    print("tokens: ", model1_res)
-    overall_res = model2_select_items(model1_res, data)
+def generate_response(user_input, items, top_k_per_type=3, color_index=None):
+    model1_res, source, _ = token_extractor.extract(user_input)
+    print(f"tokens ({source}): ", model1_res)
+
+    # Only send the best local matches per clothing type to the 70B model
+    retriever = OutfitRetriever(top_k_per_type=top_k_per_type, color_index=color_index)
+    candidates, stats = retriever.select_candidates(items, model1_res)
+    st.session_state["sambafit_prompt_stats"] = stats
+    print("candidates: ", candidates)
+
+    overall_res = model2_select_items(model1_res, candidates)
     print("overall: ",overall_res)
     return overall_res
\ No newline at end of file
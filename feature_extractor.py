@@ -6,51 +6,75 @@ from sklearn.metrics.pairwise import cosine_similarity
 from torchvision.models import efficientnet_b0
 from torchvision.transforms import functional as TF
 from torchvision import transforms
+from garment_segmentation import segment_garment, isolate_garment
+from feature_schema import extractor_version
+from metrics import span, timed
 
 class FeatureExtractor:
-    def __init__(self):
+    def __init__(self, use_segmentation=False):
         # Use EfficientNet-B0 for faster inference
         self.model = efficientnet_b0(pretrained=True)
         self.model.eval()
         
-        # Pre-define transform pipeline
+        # Pre-define transform pipeline (resize the PIL image before building the tensor)
         self.transform = transforms.Compose([
-            transforms.ToTensor(),
             transforms.Resize((224, 224)),
+            transforms.ToTensor(),
             transforms.Normalize(mean=[0.485, 0.456, 0.406], 
                               std=[0.229, 0.224, 0.225])
         ])
         
+        # Histograms are normalised, so they are computed on a small copy of the image
+        self.histogram_max_side = 256
         self.similarity_threshold = 0.84
+        # CNN vs colour weights used when combining features
+        self.feature_weights = [0.7, 0.3]
+        # Mask the garment (GrabCut) before extraction so the background weighs less
+        self.use_segmentation = use_segmentation
         self.device = torch.device('cuda' if torch.cuda.is_available() else 'cpu')
         self.model = self.model.to(self.device)
 
+    @property
+    def version(self):
+        """Feature version tag stored with every vector this extractor produces"""
+        return extractor_version(self.use_segmentation)
+
+    def extract_feature_parts(self, image, use_segmentation=None):
+        """CNN and colour features before weighting: (global_features, color_features)"""
+        if use_segmentation is None:
+            use_segmentation = self.use_segmentation
+        image = image.convert("RGB")
+        img_np = np.array(image)
+
+        mask = None
+        if use_segmentation:
+            with span("features.segmentation"):
+                mask = segment_garment(img_np)
+        cnn_input = isolate_garment(image, mask) if mask is not None else image
+
+        # 1. Original (or garment-only) image features
+        with span("features.cnn"):
+            original_features = self._extract_global_features(cnn_input)
+
+        # 2. Color features over garment pixels
+        with span("features.color"):
+            color_features = self._extract_color_features(img_np, mask)
+        return original_features, color_features
+
+    def combine_features(self, parts, weights=None):
+        """Weighted concatenation of extract_feature_parts() output"""
+        weights = weights or self.feature_weights
+        features_list = [(f, w) for f, w in zip(parts, weights) if f is not None]
+        if not features_list:
+            return None
+        return np.concatenate([f * w for f, w in features_list])
+
+    @timed("features.extract")
     def extract_features(self, image, is_full_outfit=False):
         """Enhanced feature extraction with multiple perspectives"""
         try:
-            img_np = np.array(image)
-            features_list = []
-
-            # 1. Original image features
-            original_features = self._extract_global_features(image)
-            if original_features is not None:
-                features_list.append(original_features)
-
-            # 2. Color features
-            color_features = self._extract_color_features(img_np)
-            if color_features is not None:
-                features_list.append(color_features)
-
-            if not features_list:
-                return None
-
-            # Combine features with weights
-            weights = [0.7, 0.3]  # Prioritize CNN features
-            combined_features = np.concatenate([
-                f * w for f, w in zip(features_list, weights[:len(features_list)])
-            ])
-            
-            return combined_features
+            # Prioritize CNN features
+            return self.combine_features(self.extract_feature_parts(image))
 
         except Exception as e:
             print(f"Error in feature extraction: {e}")
@@ -86,21 +110,29 @@ class FeatureExtractor:
         except Exception:
             return None
 
-    def _extract_color_features(self, img_np):
-        """Extract simplified color features"""
+    def _extract_color_features(self, img_np, mask=None):
+        """Extract simplified color features, optionally over masked (garment) pixels only"""
         try:
             features = []
+
+            height, width = img_np.shape[:2]
+            scale = self.histogram_max_side / max(height, width)
+            if scale < 1:
+                size = (max(1, int(width * scale)), max(1, int(height * scale)))
+                img_np = cv2.resize(img_np, size, interpolation=cv2.INTER_AREA)
+                if mask is not None:
+                    mask = cv2.resize(mask, size, interpolation=cv2.INTER_NEAREST)
             
             # RGB histogram with fewer bins
             for channel in range(3):
-                hist = cv2.calcHist([img_np], [channel], None, [32], [0, 256])
+                hist = cv2.calcHist([img_np], [channel], mask, [32], [0, 256])
                 hist = cv2.normalize(hist, hist).flatten()
                 features.extend(hist)
             
             # Add HSV histogram for better color representation
             hsv = cv2.cvtColor(img_np, cv2.COLOR_RGB2HSV)
             for channel in range(3):
-                hist = cv2.calcHist([hsv], [channel], None, [32], [0, 256])
+                hist = cv2.calcHist([hsv], [channel], mask, [32], [0, 256])
                 hist = cv2.normalize(hist, hist).flatten()
                 features.extend(hist)
             
@@ -112,10 +144,10 @@ class FeatureExtractor:
         """Optimized similarity calculation"""
         if features1 is None or features2 is None:
             return 0.0
-            
-        min_length = min(len(features1), len(features2))
-        features1 = features1[:min_length]
-        features2 = features2[:min_length]
+
+        # Vectors of different layouts are not comparable (see feature_schema)
+        if len(features1) != len(features2):
+            return 0.0
         
         # Simple normalization
         features1 = features1 / (np.linalg.norm(features1) + 1e-7)
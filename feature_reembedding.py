@@ -0,0 +1,214 @@
+"""
+feature_reembedding.py
+
+Background re-embedding of stored feature vectors. Views whose feature version
+differs from the current extractor's are re-extracted from their stored images
+in small batches on a worker thread. Results are appended to a sidecar file
+next to the database and merged by WardrobeTracker when it next loads, so the
+job never writes the database the UI is editing and captures are not blocked.
+At most MAX_RUNNING_JOBS databases re-embed at once, since every job shares
+the process's CPU (and, in wardrobe_service, its one extractor).
+"""
+
+import base64
+import hashlib
+import json
+import logging
+import threading
+import time
+from io import BytesIO
+from pathlib import Path
+
+from PIL import Image
+
+from feature_schema import item_views
+
+UPGRADES_FILENAME = "feature_upgrades.jsonl"
+COLLECTIONS = ("items", "outfits", "listings")
+# Jobs re-embedding at once across every database in the process; the rest wait their turn
+MAX_RUNNING_JOBS = 2
+
+_upgrades_lock = threading.Lock()
+_running_slots = threading.BoundedSemaphore(MAX_RUNNING_JOBS)
+
+
+def upgrades_path(db_path):
+    return Path(db_path).with_name(UPGRADES_FILENAME)
+
+
+def image_digest(image_b64):
+    return hashlib.sha1(image_b64.encode()).hexdigest()
+
+
+def _view_image(item, view):
+    images = item.get("reference_images") or [item.get("image")]
+    return images[view] if view < len(images) else None
+
+
+def find_stale_views(database, version):
+    """Views whose stored vector is not of `version` and that have an image to re-embed from"""
+    stale = []
+    for collection in COLLECTIONS:
+        for item in database.get(collection, []):
+            _, versions = item_views(item)
+            for view, view_version in enumerate(versions):
+                image_b64 = _view_image(item, view)
+                if view_version != version and image_b64:
+                    stale.append({"collection": collection, "item_id": item["id"], "view": view,
+                                  "image_digest": image_digest(image_b64), "image": image_b64})
+    return stale
+
+
+def merge_reembedded_features(database, db_path):
+    """
+    Apply pending re-embedded vectors to a loaded database in place.
+
+    An upgrade is only applied if the view still holds the image it was computed
+    from. Returns the number of views updated; the caller saves the database.
+    """
+    path = upgrades_path(db_path)
+    with _upgrades_lock:
+        if not path.exists():
+            return 0
+        try:
+            with open(path) as f:
+                upgrades = [json.loads(line) for line in f if line.strip()]
+            path.unlink()
+        except (OSError, json.JSONDecodeError) as e:
+            logging.error(f"Error reading feature upgrades: {e}")
+            return 0
+
+    items = {(c, item["id"]): item for c in COLLECTIONS for item in database.get(c, [])}
+    merged = 0
+    for upgrade in upgrades:
+        item = items.get((upgrade["collection"], upgrade["item_id"]))
+        if item is None:
+            continue
+        view = upgrade["view"]
+        image_b64 = _view_image(item, view)
+        if not image_b64 or image_digest(image_b64) != upgrade["image_digest"]:
+            continue
+
+        if item.get("reference_features"):
+            item["feature_versions"] = item_views(item)[1]
+            item["reference_features"][view] = upgrade["features"]
+            item["feature_versions"][view] = upgrade["version"]
+        if view == 0:
+            item["features"] = upgrade["features"]
+            item["feature_version"] = upgrade["version"]
+        merged += 1
+    return merged
+
+
+class ReembeddingJob:
+    """Re-extracts stale feature vectors from stored images on a daemon thread (at most MAX_RUNNING_JOBS at once)"""
+
+    def __init__(self, db_path, feature_extractor, batch_size=8, pause_seconds=0.5, skip_digests=None):
+        self.db_path = Path(db_path)
+        self.feature_extractor = feature_extractor
+        self.batch_size = batch_size
+        # Sleep between batches so captures get the CPU
+        self.pause_seconds = pause_seconds
+        self.status = {"running": False, "total": 0, "done": 0, "failed": 0, "version": None}
+        # Images that could not be re-embedded are not retried by later jobs for the same version
+        self.failed_digests = set(skip_digests or ())
+        self._thread = None
+        self._cancelled = threading.Event()
+
+    def _append(self, upgrades):
+        with _upgrades_lock:
+            with open(upgrades_path(self.db_path), "a") as f:
+                for upgrade in upgrades:
+                    f.write(json.dumps(upgrade) + "\n")
+
+    def run(self):
+        """Re-embed every stale view once; returns the final status"""
+        version = self.feature_extractor.version
+        # Settings are fixed for the whole run so every vector matches the recorded version
+        use_segmentation = self.feature_extractor.use_segmentation
+        with open(self.db_path) as f:
+            database = json.load(f)
+        stale = [v for v in find_stale_views(database, version) if v["image_digest"] not in self.failed_digests]
+        self.status.update(running=True, total=len(stale), done=0, failed=0, version=version)
+
+        for start in range(0, len(stale), self.batch_size):
+            if self._cancelled.is_set():
+                break
+            batch = []
+            for view in stale[start:start + self.batch_size]:
+                try:
+                    image = Image.open(BytesIO(base64.b64decode(view.pop("image"))))
+                    features = self.feature_extractor.combine_features(
+                        self.feature_extractor.extract_feature_parts(image, use_segmentation=use_segmentation)
+                    )
+                except Exception as e:
+                    logging.error(f"Re-embedding {view['collection']}:{view['item_id']} failed: {e}")
+                    features = None
+                if features is None:
+                    self.status["failed"] += 1
+                    self.failed_digests.add(view["image_digest"])
+                    continue
+                batch.append({**view, "version": version, "features": features.tolist()})
+            if batch:
+                self._append(batch)
+            self.status["done"] += len(batch)
+            time.sleep(self.pause_seconds)
+
+        self.status["running"] = False
+        logging.info(f"Re-embedding finished: {self.status}")
+        return self.status
+
+    def start(self):
+        if self._thread is None or not self._thread.is_alive():
+            self.status["running"] = True
+            self._thread = threading.Thread(target=self._safe_run, name="feature-reembedding", daemon=True)
+            self._thread.start()
+        return self
+
+    def cancel(self):
+        """Stop after the current batch; views not yet re-embedded are left to the next job"""
+        self._cancelled.set()
+
+    def _safe_run(self):
+        try:
+            with _running_slots:
+                if not self._cancelled.is_set():
+                    self.run()
+        except Exception as e:
+            logging.error(f"Re-embedding job error: {e}")
+        finally:
+            self.status["running"] = False
+
+
+_jobs = {}
+_jobs_lock = threading.Lock()
+
+
+def start_reembedding(db_path, feature_extractor, stale_digests=(), **kwargs):
+    """
+    Start (or return the running) re-embedding job for a database, one per process.
+    No new job is started when every stale view already failed for this version.
+    """
+    key = str(Path(db_path).resolve())
+    with _jobs_lock:
+        job = _jobs.get(key)
+        if job is not None and (job.status["running"] or not stale_digests):
+            return job
+        skip = set()
+        if job is not None and job.status["version"] == feature_extractor.version:
+            skip = job.failed_digests
+            if set(stale_digests) <= skip:
+                return job
+        if stale_digests:
+            job = ReembeddingJob(db_path, feature_extractor, skip_digests=skip, **kwargs)
+            _jobs[key] = job.start()
+        return job
+
+
+def stop_reembedding(db_path):
+    """Cancel and drop a database's job once its tracker is unloaded; returns True if there was one"""
+    with _jobs_lock:
+        job = _jobs.pop(str(Path(db_path).resolve()), None)
+    if job is not None:
+        job.cancel()
+    return job is not None
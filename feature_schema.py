@@ -0,0 +1,49 @@
+"""
+feature_schema.py
+
+Versions of stored feature vectors. Every reference view is tagged with the
+version of the extractor that produced it, so the matcher only compares
+vectors of the same version and the re-embedding job can find stale ones.
+Bump FEATURE_VERSION whenever the backbone, histogram layout or anything else
+that changes the meaning of a vector changes.
+"""
+
+# EfficientNet-B0 pooled features (1280) + RGB/HSV histograms (6 x 32 bins).
+# v2: images are resized before ToTensor and histograms come from a 256 px copy
+# (image_pipeline), which shifts the values; v1 vectors are re-embedded.
+FEATURE_VERSION = "v2-effnet_b0-1280-hist-192"
+# Vectors stored before versioning came from the v1 pipeline
+LEGACY_VERSION = "v1-effnet_b0-1280-hist-192"
+FEATURE_LENGTH = 1280 + 192
+SEGMENTED_SUFFIX = "+seg"
+UNKNOWN_VERSION = "unknown"
+
+
+def extractor_version(use_segmentation=False):
+    """Version tag for vectors produced with the current extractor settings"""
+    return FEATURE_VERSION + (SEGMENTED_SUFFIX if use_segmentation else "")
+
+
+def infer_version(vector):
+    """Version of an untagged vector stored before versioning existed"""
+    return LEGACY_VERSION if len(vector) == FEATURE_LENGTH else UNKNOWN_VERSION
+
+
+def item_views(item):
+    """
+    Reference feature vectors of an item with their versions.
+
+    Returns:
+        tuple: (views, versions) as parallel lists; items without reference views
+        fall back to their single "features" vector.
+    """
+    if item.get("reference_features"):
+        views = item["reference_features"]
+        tags = item.get("feature_versions") or []
+    elif item.get("features"):
+        views = [item["features"]]
+        tags = [item["feature_version"]] if item.get("feature_version") else []
+    else:
+        return [], []
+    versions = [tags[i] if i < len(tags) else infer_version(view) for i, view in enumerate(views)]
+    return views, versions
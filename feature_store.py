@@ -0,0 +1,436 @@
+"""
+feature_store.py
+
+Compact storage for feature vectors. Instead of 1,472-element float lists in
+the JSON database, vectors can be stored as base64 float16 ("float16") or as
+float16 PCA codes trained on the wardrobe ("pca"). The full-precision float32
+vectors can be kept in a side file keyed by the digest of their compact
+encoding, so loads stay exact and a database whose PCA basis is lost can still
+be read back. This saves disk and load time; the tracker still holds float
+lists in memory, and only the match index's first pass is compact.
+
+A PCA basis is fitted once the wardrobe has MIN_PCA_SAMPLES vectors (float16
+until then) and refitted when it has grown REFIT_GROWTH times past the fit
+set. Each basis is saved under its codec id, which the database records.
+
+Usage:
+    python feature_store.py clothing_database.json --mode pca   # report savings and match agreement
+"""
+
+import argparse
+import base64
+import hashlib
+import json
+import logging
+import os
+import threading
+from pathlib import Path
+
+import numpy as np
+
+from feature_schema import item_views
+
+MODES = ("list", "float16", "pca")
+PCA_COMPONENTS = 128
+# Fewer vectors than this give a basis that only spans the first few items
+MIN_PCA_SAMPLES = PCA_COMPONENTS * 2
+REFIT_GROWTH = 2
+COLLECTIONS = ("items", "outfits", "listings")
+ENCODED_PREFIX = "b64:"
+
+
+class FeatureStorageError(Exception):
+    """Stored feature codes cannot be decoded (basis missing and no exact copy in the side file)"""
+
+
+class Float16Codec:
+    """Vectors as float16; the first-pass space is the vector itself"""
+
+    mode = "float16"
+    codec_id = "float16"
+
+    def encode(self, vector):
+        return np.asarray(vector, dtype=np.float16).tobytes()
+
+    def decode(self, data):
+        return np.frombuffer(data, dtype=np.float16).astype(np.float32)
+
+    def project(self, matrix):
+        return np.asarray(matrix, dtype=np.float32)
+
+    def accepts(self, vector):
+        return True
+
+
+class PCACodec:
+    """Vectors as float16 codes of a PCA basis fitted on the wardrobe"""
+
+    mode = "pca"
+
+    def __init__(self, mean=None, components=None, n_fit=0):
+        self.mean = mean
+        self.components = components      # (n_components, dim)
+        self.n_fit = n_fit                # vectors the basis was fitted on (0: unknown)
+
+    @classmethod
+    def fit(cls, matrix, n_components=PCA_COMPONENTS):
+        matrix = np.asarray(matrix, dtype=np.float32)
+        mean = matrix.mean(axis=0)
+        n_components = min(n_components, *matrix.shape)
+        _, _, vt = np.linalg.svd(matrix - mean, full_matrices=False)
+        return cls(mean, vt[:n_components].astype(np.float32), len(matrix))
+
+    @classmethod
+    def load(cls, path):
+        data = np.load(path)
+        return cls(data["mean"], data["components"], int(data["n_fit"]) if "n_fit" in data else 0)
+
+    def save(self, path):
+        with open(path, "wb") as f:
+            np.savez(f, mean=self.mean, components=self.components, n_fit=self.n_fit)
+
+    @property
+    def codec_id(self):
+        """Identifies the basis, so codes are never decoded with a different one"""
+        return "pca-" + hashlib.sha1(self.mean.tobytes() + self.components.tobytes()).hexdigest()[:12]
+
+    def accepts(self, vector):
+        return len(vector) == len(self.mean)
+
+    def encode(self, vector):
+        codes = (np.asarray(vector, dtype=np.float32) - self.mean) @ self.components.T
+        return codes.astype(np.float16).tobytes()
+
+    def decode(self, data):
+        codes = np.frombuffer(data, dtype=np.float16).astype(np.float32)
+        return codes @ self.components + self.mean
+
+    def project(self, matrix):
+        """
+        First-pass space: coordinates in an orthonormal basis of the mean and the
+        components, so dot products (and cosines) of reconstructed vectors are kept.
+        """
+        if not hasattr(self, "_basis"):
+            self._basis = np.linalg.qr(np.vstack([self.mean, self.components]).T)[0].T.astype(np.float32)
+        return np.asarray(matrix, dtype=np.float32) @ self._basis.T
+
+
+class FullPrecisionStore:
+    """
+    Float32 side file: digest of a compact encoding -> exact vector. New vectors are
+    appended; compact() rewrites it without the vectors no longer in the database.
+    """
+
+    def __init__(self, path):
+        self.path = Path(path)
+        self.index_path = self.path.with_suffix(".index.json")
+        self.lock = threading.Lock()
+        self.data_path = self.path    # rewritten files get a new name, switched to by the index
+        self.index = {}               # digest -> (offset, length)
+        self.pending = {}
+        if self.index_path.exists():
+            try:
+                with open(self.index_path) as f:
+                    index = json.load(f)
+                if "vectors" in index:
+                    self.data_path = self.path.with_name(index["data"])
+                    index = index["vectors"]
+                self.index = {k: tuple(v) for k, v in index.items()}
+            except (json.JSONDecodeError, OSError) as e:
+                logging.error(f"Error loading feature index: {e}")
+
+    def __contains__(self, digest):
+        return digest in self.index or digest in self.pending
+
+    def put(self, digest, vector):
+        if digest not in self:
+            self.pending[digest] = np.asarray(vector, dtype=np.float32)
+
+    def get(self, digest):
+        if digest in self.pending:
+            return self.pending[digest]
+        if digest not in self.index:
+            return None
+        offset, length = self.index[digest]
+        return np.fromfile(self.data_path, dtype=np.float32, count=length, offset=offset)
+
+    def flush(self):
+        with self.lock:
+            if not self.pending:
+                return
+            with open(self.data_path, "ab") as f:
+                for digest, vector in self.pending.items():
+                    offset = f.tell()
+                    f.write(vector.tobytes())
+                    self.index[digest] = (offset, len(vector))
+            self.pending = {}
+            self._write_index()
+
+    def compact(self, live, min_dead=0.25):
+        """
+        Rewrite the side file with only the digests in live, once at least min_dead of
+        its vectors are dead. The index is switched to the new file before the old one
+        is removed, so a crash leaves one consistent pair. Returns the vectors dropped.
+        """
+        with self.lock:
+            dead = len(self.index) - sum(1 for d in self.index if d in live)
+            if not dead or dead < min_dead * len(self.index):
+                return 0
+            old_path = self.data_path
+            new_path = self.path.with_name(f"{self.path.stem}.{os.urandom(4).hex()}{self.path.suffix}")
+            index = {}
+            with open(old_path, "rb") as src, open(new_path, "wb") as dst:
+                for key, (offset, length) in self.index.items():
+                    if key in live:
+                        src.seek(offset)
+                        index[key] = (dst.tell(), length)
+                        dst.write(src.read(length * 4))
+            self.index, self.data_path = index, new_path
+            self._write_index()
+            old_path.unlink(missing_ok=True)
+            return dead
+
+    def _write_index(self):
+        tmp = self.index_path.with_suffix(".tmp")
+        with open(tmp, "w") as f:
+            json.dump({"data": self.data_path.name, "vectors": self.index}, f)
+        os.replace(tmp, self.index_path)
+
+
+class EncodingCache:
+    """Compact encodings written by the last save, keyed by vector object, so unchanged vectors are not re-encoded"""
+
+    def __init__(self):
+        self.codec_id = None
+        self.entries = {}             # id(vector) -> (vector, encoded, digest)
+
+    def digests(self):
+        return {entry[2] for entry in self.entries.values()}
+
+
+def digest(data):
+    return hashlib.sha1(data).hexdigest()
+
+
+def _encode(vector, codec, full_store, cache=None, used=None):
+    if isinstance(vector, str) or not codec.accepts(vector):
+        return vector
+    # Vectors are replaced, never edited in place, so the same list object has the same encoding
+    cached = cache.entries.get(id(vector)) if cache is not None else None
+    if cached is not None and cached[0] is vector:
+        _, encoded, data_digest = cached
+    else:
+        data = codec.encode(vector)
+        data_digest = digest(data)
+        encoded = ENCODED_PREFIX + base64.b64encode(data).decode()
+    if full_store is not None:
+        full_store.put(data_digest, vector)
+    if used is not None:
+        used[id(vector)] = (vector, encoded, data_digest)
+    return encoded
+
+
+def _decode(value, codec, full_store, used=None):
+    if not isinstance(value, str) or not value.startswith(ENCODED_PREFIX):
+        return value
+    data = base64.b64decode(value[len(ENCODED_PREFIX):])
+    data_digest = digest(data)
+    exact = full_store.get(data_digest) if full_store is not None else None
+    if exact is None and codec is None:
+        raise FeatureStorageError("Feature codes need a PCA basis that is missing, and have no exact copy")
+    vector = (exact if exact is not None else codec.decode(data)).tolist()
+    if used is not None:
+        used[id(vector)] = (vector, value, data_digest)
+    return vector
+
+
+def compact_database(database, codec, full_store=None, cache=None):
+    """
+    JSON-ready copy of a database with every vector encoded by the codec.
+    Full-precision vectors are queued in full_store (call flush() after writing).
+    With a cache, only vectors changed since the last call are encoded again.
+    """
+    if cache is not None and cache.codec_id != codec.codec_id:
+        cache.codec_id, cache.entries = codec.codec_id, {}
+    used = {} if cache is not None else None
+    compact = dict(database)
+    for collection in COLLECTIONS:
+        items = []
+        for item in database.get(collection, []):
+            item = dict(item)
+            views, versions = item_views(item)
+            if item.get("reference_features"):
+                # Tag views now; encoded vectors no longer reveal their length
+                item["feature_versions"] = versions
+                item["reference_features"] = [_encode(v, codec, full_store, cache, used)
+                                              for v in item["reference_features"]]
+            if item.get("features") is not None:
+                item.setdefault("feature_version", versions[0] if versions else None)
+                item["features"] = _encode(item["features"], codec, full_store, cache, used)
+            items.append(item)
+        compact[collection] = items
+    compact["feature_storage"] = {"mode": codec.mode, "codec_id": codec.codec_id}
+    if cache is not None:
+        cache.entries = used
+    return compact
+
+
+def expand_database(database, codec, full_store=None, cache=None):
+    """
+    Decode compact vectors in place (exact where the side file has them). If codec is
+    None or not the one the codes were written with, every vector must come from the
+    side file, else FeatureStorageError. A cache is seeded with the stored encodings.
+    """
+    stored_id = database.get("feature_storage", {}).get("codec_id")
+    if codec is not None and stored_id and stored_id != codec.codec_id:
+        codec = None
+    if codec is None:
+        logging.warning(f"Feature codec {stored_id} unavailable; reading exact vectors from the side file")
+    used = {} if cache is not None else None
+    for collection in COLLECTIONS:
+        for item in database.get(collection, []):
+            if item.get("reference_features"):
+                item["reference_features"] = [_decode(v, codec, full_store, used) for v in item["reference_features"]]
+            if item.get("features") is not None:
+                item["features"] = _decode(item["features"], codec, full_store, used)
+    database.pop("feature_storage", None)
+    if cache is not None:
+        cache.codec_id, cache.entries = stored_id, used
+    return database
+
+
+def all_vectors(database):
+    vectors = []
+    for collection in COLLECTIONS:
+        for item in database.get(collection, []):
+            vectors.extend(item_views(item)[0])
+    return vectors
+
+
+def _fit_vectors(database):
+    """Decoded vectors of the most common length (the ones a PCA basis is fitted on)"""
+    vectors = [v for v in all_vectors(database or {}) if not isinstance(v, str)]
+    lengths = [len(v) for v in vectors]
+    if not lengths:
+        return []
+    common = max(set(lengths), key=lengths.count)
+    return [v for v in vectors if len(v) == common]
+
+
+def basis_path(pca_path, codec_id):
+    """File of one PCA basis, next to pca_path and named by its codec id"""
+    pca_path = Path(pca_path)
+    return pca_path.with_name(f"{pca_path.stem}.{codec_id}{pca_path.suffix}")
+
+
+def load_codec(storage, pca_path=None):
+    """Codec a database was written with, from its "feature_storage" record (None if the basis is missing)"""
+    mode, codec_id = storage.get("mode"), storage.get("codec_id")
+    if mode == "float16":
+        return Float16Codec()
+    if mode == "pca" and pca_path:
+        # Bases saved before they were named by id live in pca_path itself
+        for path in (basis_path(pca_path, codec_id), Path(pca_path)):
+            if path.exists():
+                codec = PCACodec.load(path)
+                if codec.codec_id == codec_id:
+                    return codec
+    return None
+
+
+def make_codec(mode, database=None, pca_path=None, current=None):
+    """
+    Codec to write a database with. PCA is fitted once there are MIN_PCA_SAMPLES
+    vectors (float16 until then) and refitted when they grow REFIT_GROWTH times past
+    the current basis's fit set; each new basis is saved next to pca_path.
+    """
+    if mode == "float16":
+        return current if isinstance(current, Float16Codec) else Float16Codec()
+    if mode != "pca":
+        return None
+    vectors = _fit_vectors(database)
+    # A basis from too few vectors (or saved before fit sizes were recorded) is replaced
+    if isinstance(current, PCACodec) and current.n_fit >= MIN_PCA_SAMPLES \
+            and (not vectors or current.accepts(vectors[0])) and len(vectors) < REFIT_GROWTH * current.n_fit:
+        return current
+    if len(vectors) < MIN_PCA_SAMPLES:
+        logging.info(f"{len(vectors)} vectors are too few to fit PCA; using float16 storage")
+        return current if isinstance(current, Float16Codec) else Float16Codec()
+    codec = PCACodec.fit(np.array(vectors, dtype=np.float32))
+    logging.info(f"Fitted PCA basis {codec.codec_id} on {len(vectors)} vectors")
+    if pca_path:
+        codec.save(basis_path(pca_path, codec.codec_id))
+    return codec
+
+
+def remove_unused_bases(pca_path, codec_id):
+    """Delete saved PCA bases other than codec_id (after the database is written with it)"""
+    pca_path = Path(pca_path)
+    for path in [pca_path, *pca_path.parent.glob(f"{pca_path.stem}.*{pca_path.suffix}")]:
+        if path.exists() and path != basis_path(pca_path, codec_id):
+            path.unlink(missing_ok=True)
+
+
+def storage_report(database, mode="float16", top_k=5):
+    """
+    Disk and match-index first-pass memory savings of a storage mode, and how often the compact
+    first pass (+ exact re-rank of its top_k) picks the same best view as exact search.
+    """
+    codec = make_codec(mode, database)
+    vectors = [v for v in all_vectors(database) if not isinstance(v, str)]
+    lengths = [len(v) for v in vectors]
+    if not vectors or codec is None:
+        return {"mode": mode, "views": 0}
+    common = max(set(lengths), key=lengths.count)
+    exact = np.array([v for v in vectors if len(v) == common], dtype=np.float32)
+
+    list_bytes = len(json.dumps(database))
+    compact_bytes = len(json.dumps(compact_database(database, codec)))
+
+    decoded = np.array([codec.decode(codec.encode(v)) for v in exact])
+    first_pass = codec.project(decoded)
+
+    def normalized(m):
+        return m / np.maximum(np.linalg.norm(m, axis=1, keepdims=True), 1e-7)
+
+    exact_n, first_n = normalized(exact), normalized(first_pass)
+    # Leave-one-out: each stored view queries the rest with a slightly perturbed copy of itself
+    rng = np.random.default_rng(0)
+    queries = exact + rng.normal(scale=0.05 * exact.std(), size=exact.shape).astype(np.float32)
+    agree_first = agree_rerank = 0
+    for i, query in enumerate(queries):
+        exact_scores = exact_n @ (query / max(np.linalg.norm(query), 1e-7))
+        q_first = codec.project(query[None, :])[0]
+        first_scores = first_n @ (q_first / max(np.linalg.norm(q_first), 1e-7))
+        exact_scores[i] = first_scores[i] = -np.inf
+        best_exact = int(np.argmax(exact_scores))
+        top = np.argsort(first_scores)[::-1][:top_k]
+        agree_first += int(top[0] == best_exact)
+        agree_rerank += int(top[np.argmax(exact_scores[top])] == best_exact)
+
+    return {
+        "mode": codec.mode,
+        "views": len(exact),
+        "json_bytes_list": list_bytes,
+        "json_bytes_compact": compact_bytes,
+        "disk_saving": round(1 - compact_bytes / max(list_bytes, 1), 3),
+        "first_pass_bytes_float32": int(exact.nbytes),
+        "first_pass_bytes_compact": int(first_pass.astype(np.float32).nbytes),
+        "top1_agreement_first_pass": round(agree_first / len(exact), 4),
+        "top1_agreement_reranked": round(agree_rerank / len(exact), 4),
+    }
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("database", nargs="?", default="clothing_database.json")
+    parser.add_argument("--mode", choices=MODES[1:], default="float16")
+    parser.add_argument("--top-k", type=int, default=5)
+    args = parser.parse_args()
+    with open(args.database) as f:
+        db = json.load(f)
+    if db.get("feature_storage"):
+        directory = Path(args.database).with_name
+        db = expand_database(db, load_codec(db["feature_storage"], directory("feature_pca.npz")),
+                             FullPrecisionStore(directory("features_full.bin")))
+    print(json.dumps(storage_report(db, args.mode, args.top_k), indent=4))
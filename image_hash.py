@@ -0,0 +1,209 @@
+"""
+image_hash.py
+
+Perceptual hashes of reference views for an exact-duplicate short-circuit.
+Every view gets a 64-bit difference hash (dHash) when it is stored, and a
+multi-index hash table over Hamming distance finds a stored view that is
+near-identical to a capture (the same photo re-submitted by the camera, or
+re-uploaded) before any CNN features are extracted. dHash is greyscale, so a
+hit is only accepted when a coarse grid of Lab colours ("view_colors", stored
+with each hash) also agrees with the stored view (a navy and a black tee of
+the same cut hash alike). Captures and stored JPEGs go through the same
+full decode and reduction, so backfilled hashes agree with ingested ones.
+"""
+
+import base64
+import logging
+from io import BytesIO
+
+import numpy as np
+from PIL import Image
+
+from color_index import rgb_to_lab
+from metrics import increment
+
+HASH_SIZE = 8
+HASH_BITS = HASH_SIZE * HASH_SIZE
+# Near-identical: JPEG re-encoding and resizing move a dHash by a few bits at most
+DEFAULT_MAX_DISTANCE = 4
+# Hashes of flat frames (covered lens, blank wall) are nearly all 0s or 1s and would match each other
+MIN_SET_BITS = 8
+COLOR_GRID = 4
+# Mean Lab distance per grid cell: JPEG re-encoding or resizing moves it by under 1,
+# a navy tee photographed like a black one by ~19 (background cells included)
+MAX_COLOR_DISTANCE = 6.0
+
+
+def _reduced(image, size):
+    """Integer box reduction to no less than size on the short side; converting and resizing a full frame is the slow part"""
+    if image.mode not in ("L", "RGB"):
+        image = image.convert("RGB")
+    factor = min(image.width, image.height) // size
+    return image.reduce(factor) if factor > 1 else image
+
+
+def dhash(image, hash_size=HASH_SIZE):
+    """64-bit difference hash of a PIL image as a 16-character hex string"""
+    image = _reduced(image, 8 * hash_size)
+    pixels = list(image.convert("L").resize((hash_size + 1, hash_size), Image.BILINEAR).getdata())
+    bits = 0
+    for row in range(hash_size):
+        for col in range(hash_size):
+            left = pixels[row * (hash_size + 1) + col]
+            right = pixels[row * (hash_size + 1) + col + 1]
+            bits = (bits << 1) | (left > right)
+    return f"{bits:0{hash_size * hash_size // 4}x}"
+
+
+def color_signature(image, grid=COLOR_GRID):
+    """Mean Lab colour of each cell of a grid x grid split of a PIL image, as [[L, a, b], ...]"""
+    cells = np.asarray(_reduced(image, 8 * grid).convert("RGB").resize((grid, grid), Image.BOX))
+    return np.round(rgb_to_lab(cells.reshape(-1, 3)), 1).tolist()
+
+
+def fingerprint(image):
+    """(dHash, colour signature) of a view, from one reduction of the image"""
+    image = _reduced(image, 8 * HASH_SIZE)
+    return dhash(image), color_signature(image)
+
+
+def fingerprint_base64_image(image_b64):
+    """fingerprint() of a stored base64 JPEG, fully decoded like a capture (a reduced-size draft decode hashes differently)"""
+    return fingerprint(Image.open(BytesIO(base64.b64decode(image_b64))))
+
+
+def color_distance(a, b):
+    return float(np.linalg.norm(np.asarray(a) - np.asarray(b), axis=1).mean())
+
+
+def hamming(a, b):
+    return bin(int(a, 16) ^ int(b, 16)).count("1")
+
+
+def informative(value):
+    """Whether a hash has enough structure to identify a photo"""
+    set_bits = bin(int(value, 16)).count("1")
+    return MIN_SET_BITS <= set_bits <= HASH_BITS - MIN_SET_BITS
+
+
+def item_hashes(item):
+    """
+    Hashes and colour signatures of an item's views (reference_images, or its single
+    image), computing and storing the missing ones. Returns (hashes, colors, computed)
+    where computed is the number of views that were fingerprinted.
+    """
+    images = item.get("reference_images") or ([item["image"]] if item.get("image") else [])
+    hashes = list(item.get("view_hashes") or [])[:len(images)]
+    colors = list(item.get("view_colors") or [])[:len(images)]
+    computed = 0
+    for view in range(min(len(hashes), len(colors)), len(images)):
+        try:
+            value, signature = fingerprint_base64_image(images[view])
+        except Exception as e:
+            logging.error(f"Could not hash view of item {item.get('id')}: {e}")
+            value, signature = None, None
+        # Hashes taken from the capture at ingest are kept
+        if view == len(hashes):
+            hashes.append(value)
+        if view == len(colors):
+            colors.append(signature)
+        computed += 1
+    if computed:
+        item["view_hashes"], item["view_colors"] = hashes, colors
+    return hashes, colors, computed
+
+
+class MultiIndexHash:
+    """
+    Multi-index hashing over Hamming distance: each hash is split into
+    max_distance + 1 bit chunks, and any stored hash within max_distance agrees
+    with the query exactly on at least one chunk (pigeonhole), so a lookup is a
+    few dict probes plus a check of the candidates they return.
+    """
+
+    def __init__(self, max_distance=DEFAULT_MAX_DISTANCE, bits=HASH_BITS):
+        self.max_distance = max_distance
+        chunks = max_distance + 1
+        bounds = [round(i * bits / chunks) for i in range(chunks + 1)]
+        self.masks = [(shift, (1 << (end - shift)) - 1) for shift, end in zip(bounds, bounds[1:])]
+        self.tables = [{} for _ in self.masks]
+        self.size = 0
+
+    def _keys(self, value):
+        return [(value >> shift) & mask for shift, mask in self.masks]
+
+    def add(self, value, payload):
+        value = int(value, 16)
+        for table, key in zip(self.tables, self._keys(value)):
+            table.setdefault(key, []).append((value, payload))
+        self.size += 1
+
+    def search(self, value):
+        """(distance, payload) for every stored hash within max_distance, nearest first"""
+        value = int(value, 16)
+        found, seen = [], set()
+        for table, key in zip(self.tables, self._keys(value)):
+            for stored, payload in table.get(key, ()):
+                # A hash matching the query on several chunks is listed in several tables
+                if (stored, id(payload)) in seen:
+                    continue
+                seen.add((stored, id(payload)))
+                distance = bin(stored ^ value).count("1")
+                if distance <= self.max_distance:
+                    found.append((distance, payload))
+        return sorted(found, key=lambda entry: entry[0])
+
+
+class HashIndex:
+    """Perceptual hashes of every reference view in a tracker database"""
+
+    def __init__(self, database, max_distance=DEFAULT_MAX_DISTANCE, max_color_distance=MAX_COLOR_DISTANCE):
+        """
+        Args:
+            database (dict): Tracker database; items missing "view_hashes" get them computed.
+            max_distance (int): Largest Hamming distance treated as the same photo.
+            max_color_distance (float): Largest colour signature distance of a hash hit (None: no check).
+        """
+        self.max_distance = max_distance
+        self.max_color_distance = max_color_distance
+        self.tables = {c: MultiIndexHash(max_distance) for c in ("items", "outfits", "listings")}
+        self.computed = 0        # views fingerprinted while building (the database should be saved)
+        for collection, table in self.tables.items():
+            for item in database.get(collection, []):
+                hashes, colors, computed = item_hashes(item)
+                self.computed += computed
+                for value, signature in zip(hashes, colors):
+                    if value and informative(value):
+                        table.add(value, (item, signature))
+
+    def search(self, value, is_outfit=False, colors=None):
+        """
+        Nearest stored view within max_distance whose colour signature also agrees
+        with colors (when given), in the same result shape as MatchIndex.search plus
+        "hash_distance"; None when nothing is close enough.
+        """
+        if not informative(value):
+            return None
+        hits = []
+        for collection in (("outfits",) if is_outfit else ("items", "listings")):
+            hits.extend((distance, collection, payload) for distance, payload in self.tables[collection].search(value))
+        for distance, collection, (item, stored) in sorted(hits, key=lambda hit: hit[0]):
+            if colors is not None and self.max_color_distance is not None:
+                if stored is None or color_distance(colors, stored) > self.max_color_distance:
+                    increment("hash_color_rejects")
+                    continue
+            return self._result(distance, collection, item)
+        return None
+
+    @staticmethod
+    def _result(distance, collection, item):
+        return {
+            "category": None,
+            "collection": collection,
+            "item": item,
+            "similarity": 1 - distance / HASH_BITS,
+            "searched": 0,
+            "threshold": None,
+            "matched": True,
+            "hash_distance": distance,
+        }
@@ -0,0 +1,127 @@
+"""
+image_pipeline.py
+
+Single image-normalisation stage for captured photos. Every capture is decoded
+at reduced size where the codec allows it, rotated according to its EXIF
+orientation, converted to RGB, optionally cropped to the garment and bounded
+to MAX_SIDE pixels. The normalised image is what feature extraction,
+histograms, storage and LLM upload all consume.
+
+Usage:
+    python image_pipeline.py photo1.jpg photo2.jpg   # report latency and size savings
+"""
+
+import base64
+import sys
+import time
+from io import BytesIO
+
+from PIL import Image, ImageOps
+
+# Longest side kept for storage and feature extraction
+MAX_SIDE = 1024
+# Longest side sent to the vision LLM
+LLM_MAX_SIDE = 768
+JPEG_QUALITY = 85
+LLM_JPEG_QUALITY = 80
+
+INFO_KEY = "vestique_ingest"
+
+
+def normalize_image(image, max_side=MAX_SIDE, crop_box=None):
+    """
+    Normalise a PIL image: EXIF orientation, RGB, optional crop, bounded longest side.
+
+    Args:
+        image (PIL.Image): Decoded capture.
+        max_side (int): Longest side of the result.
+        crop_box (tuple): Optional (left, top, right, bottom) garment box in the
+            oriented image's coordinates.
+
+    Returns:
+        PIL.Image: Normalised RGB image.
+    """
+    image = ImageOps.exif_transpose(image)
+    if image.mode != "RGB":
+        image = image.convert("RGB")
+    if crop_box is not None:
+        image = image.crop(crop_box)
+    if max(image.size) > max_side:
+        image = image.copy()
+        image.thumbnail((max_side, max_side), Image.LANCZOS)
+    return image
+
+
+def load_image(source, max_side=MAX_SIDE, crop_box=None):
+    """
+    Open an uploaded file, camera buffer, path or bytes and normalise it.
+
+    JPEG captures are decoded at a reduced scale (draft mode) when they are much
+    larger than max_side. The ingest report (sizes, seconds) is attached as
+    image.info["vestique_ingest"].
+    """
+    start = time.perf_counter()
+    if isinstance(source, bytes):
+        source = BytesIO(source)
+    image = Image.open(source)
+    original_size = image.size
+    if image.format == "JPEG":
+        # Decode at 1/2, 1/4 or 1/8 scale while staying at or above max_side
+        image.draft("RGB", (max_side, max_side))
+    image = normalize_image(image, max_side, crop_box)
+    image.info[INFO_KEY] = {
+        "original_size": original_size,
+        "normalized_size": image.size,
+        "seconds": round(time.perf_counter() - start, 4),
+    }
+    return image
+
+
+def encode_jpeg(image, quality=JPEG_QUALITY, max_side=None):
+    """JPEG bytes of an image, optionally downscaled to max_side first"""
+    if max_side and max(image.size) > max_side:
+        image = image.copy()
+        image.thumbnail((max_side, max_side), Image.LANCZOS)
+    if image.mode != "RGB":
+        image = image.convert("RGB")
+    with BytesIO() as buffer:
+        image.save(buffer, format="JPEG", quality=quality, optimize=True)
+        return buffer.getvalue()
+
+
+def to_data_url(image, max_side=LLM_MAX_SIDE, quality=LLM_JPEG_QUALITY):
+    """Base64 data URL of a downscaled JPEG, for vision-model uploads"""
+    image_bytes = encode_jpeg(image, quality, max_side)
+    return f"data:image/jpeg;base64,{base64.b64encode(image_bytes).decode('utf-8')}"
+
+
+def measure(path):
+    """Compare the old ingest path (full-resolution decode + upload) with the pipeline"""
+    start = time.perf_counter()
+    original = Image.open(path).convert("RGB")
+    original_upload = encode_jpeg(original, quality=75)
+    original_seconds = time.perf_counter() - start
+
+    start = time.perf_counter()
+    normalized = load_image(path)
+    upload = encode_jpeg(normalized, LLM_JPEG_QUALITY, LLM_MAX_SIDE)
+    pipeline_seconds = time.perf_counter() - start
+
+    return {
+        "file": str(path),
+        "original_size": original.size,
+        "normalized_size": normalized.size,
+        "decode_encode_seconds_before": round(original_seconds, 4),
+        "decode_encode_seconds_after": round(pipeline_seconds, 4),
+        "upload_bytes_before": len(original_upload),
+        "upload_bytes_after": len(upload),
+        "upload_reduction": round(1 - len(upload) / max(len(original_upload), 1), 3),
+    }
+
+
+if __name__ == "__main__":
+    if len(sys.argv) < 2:
+        print(__doc__)
+        sys.exit(1)
+    for path in sys.argv[1:]:
+        print(measure(path))
@@ -0,0 +1,82 @@
+"""
+item_attributes.py
+
+Helpers for reading the structured attributes stored in an item's ai_analysis.
+The analysis is the JSON produced by classifier.prompt_llama, usually wrapped in
+a ```json markdown block, so every consumer needs the same tolerant parsing.
+"""
+
+import json
+
+
+def parse_ai_analysis(ai_analysis):
+    """Return the ai_analysis of an item as a dict ({} if it cannot be parsed)"""
+    if isinstance(ai_analysis, dict):
+        return ai_analysis
+    if not isinstance(ai_analysis, str) or not ai_analysis.strip():
+        return {}
+
+    text = ai_analysis
+    if '```json' in text:
+        text = text.split('```json', 1)[1].split('```', 1)[0]
+
+    # Fall back to the outermost braces when the model added prose around the JSON
+    start, end = text.find('{'), text.rfind('}')
+    if start == -1 or end <= start:
+        return {}
+    try:
+        data = json.loads(text[start:end + 1])
+        return data if isinstance(data, dict) else {}
+    except json.JSONDecodeError:
+        return {}
+
+
+def _as_list(value):
+    if value is None:
+        return []
+    if isinstance(value, list):
+        return [str(v) for v in value if v]
+    if isinstance(value, dict):
+        return [f"{k}: {v}" for k, v in value.items() if v]
+    return [str(value)]
+
+
+def item_attributes(item):
+    """Flatten an item and its ai_analysis into the fields used for ranking and templates"""
+    analysis = parse_ai_analysis(item.get('ai_analysis'))
+    color = analysis.get('color') or item.get('color') or {}
+    if not isinstance(color, dict):
+        color = {'primary': str(color)}
+    style = analysis.get('fit_and_style') or {}
+    if not isinstance(style, dict):
+        style = {'style': str(style)}
+
+    return {
+        'id': item.get('id'),
+        'name': item.get('name', item.get('type', 'Item')),
+        'type': str(analysis.get('type') or item.get('type', 'Unknown')).strip(),
+        'category': item.get('type', 'Unknown'),
+        'material': analysis.get('material') or item.get('material'),
+        'primary_color': color.get('primary'),
+        'secondary_colors': _as_list(color.get('secondary')),
+        'fit': style.get('fit'),
+        'style': style.get('style'),
+        'season': analysis.get('season'),
+        'use_case': _as_list(analysis.get('use_case')),
+        'brand': analysis.get('brand') or item.get('brand'),
+        'condition': analysis.get('condition') or item.get('condition'),
+    }
+
+
+def compact_summary(attributes):
+    """One-line description of an item, a fraction of the size of the raw analysis"""
+    colors = ", ".join(filter(None, [attributes.get('primary_color')] + attributes.get('secondary_colors', [])))
+    parts = [
+        attributes.get('type'),
+        colors,
+        attributes.get('material'),
+        " ".join(filter(None, [attributes.get('fit'), attributes.get('style')])),
+        attributes.get('season'),
+        ", ".join(attributes.get('use_case', [])),
+    ]
+    return " | ".join(str(p) for p in parts if p and str(p).lower() != 'unknown')
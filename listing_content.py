@@ -0,0 +1,213 @@
+"""
+listing_content.py
+
+Marketplace copy stored with each listing. Content is generated once, when
+items are moved to listings, on a background thread (one batched LLM call for
+the styling ideas of everything listed together). Results are appended to a
+sidecar file next to the database and merged by WardrobeTracker when it next
+loads, as feature_reembedding does, so neither the listing sweep nor the
+marketplace page waits on the LLM. Only an explicit "Refresh Listing"
+regenerates stored content.
+
+Each listing keeps "listing_content": {"text", "version", "revision",
+"generated_at"}. Content of an older LISTING_CONTENT_VERSION (the template
+changed) is queued again; until content arrives the page renders the listing
+offline from cached or default styling ideas, with no LLM call. Copy whose
+styling idea fell back to the default is not stored, so the listing is queued
+again by the next sweep or load.
+"""
+
+import json
+import logging
+import threading
+from datetime import datetime
+from pathlib import Path
+from queue import Empty, Queue
+
+from email_templates import fill_styling_slots, render_listing
+from item_attributes import item_attributes
+
+# Bump when render_listing's layout changes so stored copy is regenerated
+LISTING_CONTENT_VERSION = 1
+CONTENT_FILENAME = "listing_content.jsonl"
+
+_content_lock = threading.Lock()
+
+
+def content_path(db_path):
+    return Path(db_path).with_name(CONTENT_FILENAME)
+
+
+def stored_content(listing):
+    """The listing's stored copy if it is of the current version, else None"""
+    content = listing.get("listing_content")
+    if isinstance(content, dict) and content.get("version") == LISTING_CONTENT_VERSION and content.get("text"):
+        return content["text"]
+    return None
+
+
+def listing_text(listing):
+    """Copy to show for a listing: stored, or rendered offline from cached/default styling ideas"""
+    text = stored_content(listing)
+    if text is None:
+        suggestion = fill_styling_slots([item_attributes(listing)])[0]
+        text = render_listing(listing, suggestion)
+    return text
+
+
+def content_record(text, revision=1):
+    return {"text": text, "version": LISTING_CONTENT_VERSION, "revision": revision,
+            "generated_at": datetime.now().isoformat()}
+
+
+def generate_contents(listings, request_fn):
+    """
+    Content records for several listings with one batched styling request for the
+    uncached ones; None for a listing whose styling idea fell back to the default
+    """
+    report = {}
+    suggestions = fill_styling_slots([item_attributes(listing) for listing in listings], request_fn, report=report)
+    defaulted = set(report.get("defaulted_items", []))
+    return [None if i in defaulted else content_record(render_listing(listing, suggestion))
+            for i, (listing, suggestion) in enumerate(zip(listings, suggestions))]
+
+
+def needs_content(listing):
+    return stored_content(listing) is None
+
+
+def merge_listing_content(database, db_path):
+    """
+    Apply content generated in the background to a loaded database in place.
+
+    Content is only applied to the listing it was generated for (same id and
+    date_listed) and never over a newer revision. Returns the number of
+    listings updated; the caller saves the database.
+    """
+    path = content_path(db_path)
+    with _content_lock:
+        if not path.exists():
+            return 0
+        try:
+            with open(path) as f:
+                records = [json.loads(line) for line in f if line.strip()]
+            path.unlink()
+        except (OSError, json.JSONDecodeError) as e:
+            logging.error(f"Error reading listing content: {e}")
+            return 0
+
+    listings = {listing["id"]: listing for listing in database.get("listings", [])}
+    merged = 0
+    for record in records:
+        listing = listings.get(record["item_id"])
+        if listing is None or listing.get("date_listed") != record["date_listed"]:
+            continue
+        current = listing.get("listing_content") or {}
+        if stored_content(listing) is not None and current.get("revision", 0) >= record["content"]["revision"]:
+            continue
+        listing["listing_content"] = record["content"]
+        merged += 1
+    return merged
+
+
+def default_request_fn():
+    from wardrobe_notifier import EmailNotifier
+    return EmailNotifier().request_styling_suggestions
+
+
+class ListingContentJob:
+    """Generates listing copy for queued listings on a daemon thread that exits once the queue is empty"""
+
+    def __init__(self, db_path, request_fn=None):
+        self.db_path = Path(db_path)
+        self.request_fn = request_fn
+        self.queue = Queue()
+        # (id, date_listed) already queued in this process; merged content is not regenerated
+        self.seen = set()
+        self.status = {"queued": 0, "done": 0, "failed": 0}
+        self._thread = None
+        # Guards _thread so a batch queued while the worker is exiting starts a new one
+        self._thread_lock = threading.Lock()
+
+    def enqueue(self, listings):
+        """Queue listings without current content; returns how many were added"""
+        batch = []
+        for listing in listings:
+            key = (listing["id"], listing.get("date_listed"))
+            if key in self.seen or not needs_content(listing):
+                continue
+            self.seen.add(key)
+            batch.append({k: v for k, v in listing.items()
+                          if k not in ("reference_images", "reference_features", "features", "image")})
+        if batch:
+            self.status["queued"] += len(batch)
+            self.queue.put(batch)
+            self.start()
+        return len(batch)
+
+    def _append(self, records):
+        with _content_lock:
+            with open(content_path(self.db_path), "a") as f:
+                for record in records:
+                    f.write(json.dumps(record) + "\n")
+
+    def _requeue(self, listings):
+        """Let listings whose content was not stored be queued again by a later enqueue"""
+        for listing in listings:
+            self.seen.discard((listing["id"], listing.get("date_listed")))
+        self.status["failed"] += len(listings)
+
+    def _run(self):
+        while True:
+            with self._thread_lock:
+                try:
+                    batch = self.queue.get_nowait()
+                except Empty:
+                    self._thread = None
+                    return
+            try:
+                request_fn = self.request_fn or default_request_fn()
+                contents = generate_contents(batch, request_fn)
+                records = [{"item_id": listing["id"], "date_listed": listing.get("date_listed"), "content": content}
+                           for listing, content in zip(batch, contents) if content is not None]
+                if records:
+                    self._append(records)
+                self.status["done"] += len(records)
+                # Default copy is never stored as final; the page renders these offline meanwhile
+                self._requeue([listing for listing, content in zip(batch, contents) if content is None])
+            except Exception as e:
+                logging.error(f"Listing content generation failed: {e}")
+                self._requeue(batch)
+            finally:
+                self.queue.task_done()
+
+    def start(self):
+        with self._thread_lock:
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._run, name="listing-content", daemon=True)
+                self._thread.start()
+        return self
+
+
+_jobs = {}
+_jobs_lock = threading.Lock()
+
+
+def queue_listing_content(db_path, listings, request_fn=None):
+    """Queue background content generation for listings (one job per database per process)"""
+    key = str(Path(db_path).resolve())
+    with _jobs_lock:
+        job = _jobs.get(key)
+        if job is None:
+            job = _jobs[key] = ListingContentJob(db_path, request_fn)
+    job.enqueue(listings)
+    return job
+
+
+def forget_listing_content(db_path):
+    """
+    Drop a database's job once its tracker is unloaded; batches already queued
+    still finish. Returns True if there was one.
+    """
+    with _jobs_lock:
+        return _jobs.pop(str(Path(db_path).resolve()), None) is not None
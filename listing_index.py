@@ -0,0 +1,83 @@
+"""
+listing_index.py
+
+Time-ordered index of when wardrobe items become eligible for the marketplace.
+Instead of scanning every item on each render of the "Your Listings" tab, the
+tracker keeps a min-heap keyed by due date and the sweep only pops the items
+that crossed the idle threshold since the previous run.
+"""
+
+import heapq
+from datetime import datetime, timedelta
+
+LISTING_THRESHOLD_DAYS = 8
+
+
+def due_timestamp(last_worn_ts, threshold_days=LISTING_THRESHOLD_DAYS):
+    """Midnight of the day an item worn at last_worn_ts reaches threshold_days idle days"""
+    due_day = datetime.fromtimestamp(last_worn_ts).date() + timedelta(days=threshold_days)
+    return datetime.combine(due_day, datetime.min.time()).timestamp()
+
+
+class ListingIndex:
+    """
+    Min-heap of [due_timestamp, collection, item_id] entries.
+
+    Entries are never updated in place: a wear pushes a fresh entry and the old
+    one is discarded lazily when it reaches the top and no longer matches the
+    item's current statistics. self.data is persisted in the database under
+    "listing_index".
+    """
+
+    def __init__(self, stats, data=None, threshold_days=LISTING_THRESHOLD_DAYS, collections=("items",)):
+        self.stats = stats
+        self.collections = collections
+        self.threshold_days = threshold_days
+        self.data = data if data is not None else {}
+        if self.data.get("threshold_days") != threshold_days or "heap" not in self.data:
+            self.data["threshold_days"] = threshold_days
+            self.data["heap"] = self._build()
+            self.data["last_sweep"] = None
+
+    def _build(self):
+        heap = [
+            [due_timestamp(entry["last_worn"], self.threshold_days), entry["collection"], entry["id"]]
+            for entry in self.stats.data["items"].values()
+            if entry["collection"] in self.collections and not entry["listed"] and entry["last_worn"] is not None
+        ]
+        heapq.heapify(heap)
+        return heap
+
+    def _current_due(self, collection, item_id):
+        entry = self.stats.get(collection, item_id)
+        if entry is None or entry["listed"] or entry["last_worn"] is None:
+            return None
+        return due_timestamp(entry["last_worn"], self.threshold_days)
+
+    def schedule(self, collection, item_id):
+        """(Re)schedule an item after it was added, worn, edited or returned from the marketplace"""
+        if collection not in self.collections:
+            return
+        due = self._current_due(collection, item_id)
+        if due is not None:
+            heapq.heappush(self.data["heap"], [due, collection, item_id])
+
+    def next_due(self):
+        """Timestamp of the earliest pending entry (may be stale), or None"""
+        return self.data["heap"][0][0] if self.data["heap"] else None
+
+    def pop_due(self, now=None):
+        """Remove and return (collection, item_id) for every item that is due at `now`"""
+        now_ts = (now or datetime.now()).timestamp()
+        heap = self.data["heap"]
+        due_items = []
+        seen = set()
+        while heap and heap[0][0] <= now_ts:
+            due, collection, item_id = heapq.heappop(heap)
+            # Stale entry: the item was worn/edited/listed since it was pushed
+            if self._current_due(collection, item_id) != due or (collection, item_id) in seen:
+                continue
+            seen.add((collection, item_id))
+            due_items.append((collection, item_id))
+        self.data["last_sweep"] = now_ts
+        return due_items
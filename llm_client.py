@@ -0,0 +1,356 @@
+"""
+llm_client.py
+
+The shared layer every SambaNova (OpenAI-compatible) call goes through.
+SAMBANOVA_BASE_URL points the AI paths at another server, such as the local
+stand-in in mock_services.py, so they can be load-tested without live
+services or real spend.
+
+Each call is accounted to its call site: prompt and completion tokens (from
+the response's usage, estimated when it has none), latency, model and an
+estimated cost. Totals are kept per call site, per session and per user, and
+optional budgets (llm_budgets.json) warn, or with "hard_cap" refuse further
+calls, once a session or user has spent its allowance.
+
+Concurrent identical requests (same endpoint, credentials and payload, e.g.
+several sessions opening the marketplace for the same listing) are coalesced:
+one call goes out and every caller gets its response.
+
+Usage:
+    python mock_services.py --port 8025 --latency 1.5 --jitter 0.5 --error-rate 0.02
+    SAMBANOVA_BASE_URL=http://localhost:8025/v1 BREVO_API_URL=http://localhost:8025/v3/smtp/email streamlit run app.py
+
+    response = post_chat_completion(payload, "marketplace.decide_match", headers=HEADERS)
+    set_caller(session_id, tenant_id)    # once per Streamlit run
+"""
+
+import contextvars
+import hashlib
+import json
+import logging
+import os
+import threading
+import time
+from datetime import datetime
+from pathlib import Path
+
+import requests
+
+from metrics import increment, observe
+
+DEFAULT_BASE_URL = "https://api.sambanova.ai/v1"
+LLM_BUDGETS_PATH = Path("llm_budgets.json")
+
+# USD per million (prompt, completion) tokens; unknown models use DEFAULT_PRICE
+MODEL_PRICES = {
+    "Meta-Llama-3.1-8B-Instruct": (0.10, 0.20),
+    "Meta-Llama-3.1-70B-Instruct": (0.60, 1.20),
+    "Llama-3.2-90B-Vision-Instruct": (0.80, 1.60),
+}
+DEFAULT_PRICE = (0.60, 1.20)
+# Rough prompt cost of one image when the response carries no usage
+IMAGE_TOKENS = 576
+
+# (session, user) of the code making LLM calls; Streamlit runs each session in its own thread
+_caller = contextvars.ContextVar("llm_caller", default=("process", "system"))
+
+
+def base_url():
+    """OpenAI-compatible API root, e.g. https://api.sambanova.ai/v1"""
+    return os.getenv("SAMBANOVA_BASE_URL", DEFAULT_BASE_URL).rstrip("/")
+
+
+def chat_completions_url():
+    return f"{base_url()}/chat/completions"
+
+
+def openai_client(api_key=None):
+    """OpenAI SDK client bound to the configured base URL"""
+    import openai
+    return openai.OpenAI(api_key=api_key or os.getenv("SAMBANOVA_API_KEY"), base_url=base_url())
+
+
+def set_caller(session, user=None):
+    """Attribute LLM calls made from this thread (and tasks it schedules) to a session and user"""
+    _caller.set((str(session), str(user or "anonymous")))
+
+
+def current_caller():
+    return _caller.get()
+
+
+def estimate_tokens(text):
+    """Approximate token count (about four characters per token)"""
+    return max(1, len(text) // 4) if text else 0
+
+
+def estimate_prompt_tokens(messages):
+    tokens = 0
+    for message in messages or []:
+        content = message.get("content") or ""
+        if isinstance(content, str):
+            tokens += estimate_tokens(content)
+            continue
+        for part in content:
+            if part.get("type") == "image_url":
+                tokens += IMAGE_TOKENS
+            else:
+                tokens += estimate_tokens(part.get("text", ""))
+    return tokens
+
+
+def call_cost(model, prompt_tokens, completion_tokens):
+    prompt_price, completion_price = MODEL_PRICES.get(model, DEFAULT_PRICE)
+    return (prompt_tokens * prompt_price + completion_tokens * completion_price) / 1e6
+
+
+def load_budgets(path=LLM_BUDGETS_PATH):
+    """
+    Budgets from llm_budgets.json, or {}:
+        {"session": {"tokens": 200000, "cost_usd": 0.5},
+         "user": {"tokens": 2000000, "cost_usd": 5.0},
+         "hard_cap": false}
+    """
+    path = Path(path)
+    if not path.exists():
+        return {}
+    try:
+        with open(path) as f:
+            return json.load(f)
+    except (json.JSONDecodeError, OSError) as e:
+        logging.error(f"Error loading LLM budgets: {e}")
+        return {}
+
+
+class BudgetExceeded(Exception):
+    """A hard-capped session or user budget is spent"""
+
+
+def _totals():
+    return {"calls": 0, "coalesced": 0, "errors": 0, "prompt_tokens": 0, "completion_tokens": 0, "cost_usd": 0.0,
+            "latency_s": 0.0}
+
+
+class UsageLedger:
+    """Token, latency and cost totals per call site, session and user, checked against budgets"""
+
+    def __init__(self, budgets=None, log_path=None):
+        """
+        Args:
+            budgets (dict): See load_budgets; {} disables budget checks.
+            log_path (str): Optional JSONL file receiving one record per call.
+        """
+        self.budgets = budgets or {}
+        self.log_path = Path(log_path) if log_path else None
+        self.lock = threading.Lock()
+        self.scopes = {"call_site": {}, "session": {}, "user": {}}
+        self.warned = set()
+
+    def record(self, call_site, model, prompt_tokens, completion_tokens, latency, error=False, estimated=False):
+        session, user = current_caller()
+        cost = call_cost(model, prompt_tokens, completion_tokens)
+        with self.lock:
+            for scope, key in (("call_site", call_site), ("session", session), ("user", user)):
+                totals = self.scopes[scope].setdefault(key, _totals())
+                totals["calls"] += 1
+                totals["errors"] += int(error)
+                totals["prompt_tokens"] += prompt_tokens
+                totals["completion_tokens"] += completion_tokens
+                totals["cost_usd"] += cost
+                totals["latency_s"] += latency
+            if self.log_path:
+                record = {"time": datetime.now().isoformat(), "call_site": call_site, "model": model,
+                          "session": session, "user": user, "prompt_tokens": prompt_tokens,
+                          "completion_tokens": completion_tokens, "cost_usd": round(cost, 6),
+                          "latency_s": round(latency, 3), "error": error, "estimated": estimated}
+                with open(self.log_path, "a") as f:
+                    f.write(json.dumps(record) + "\n")
+        increment("llm_calls", call_site=call_site, model=model, status="error" if error else "ok")
+        increment("llm_tokens", prompt_tokens, call_site=call_site, kind="prompt")
+        increment("llm_tokens", completion_tokens, call_site=call_site, kind="completion")
+        observe("llm_latency_seconds", latency, call_site=call_site)
+
+    def record_coalesced(self, call_site):
+        """A call answered by another caller's identical in-flight request, at no cost"""
+        session, user = current_caller()
+        with self.lock:
+            for scope, key in (("call_site", call_site), ("session", session), ("user", user)):
+                self.scopes[scope].setdefault(key, _totals())["coalesced"] += 1
+        increment("llm_coalesced", call_site=call_site)
+
+    def spent(self, scope, key):
+        with self.lock:
+            return dict(self.scopes[scope].get(key) or _totals())
+
+    def over_budget(self, scope, key):
+        """Description of the first limit a session or user has reached, or None"""
+        limits = self.budgets.get(scope) or {}
+        totals = self.spent(scope, key)
+        tokens = totals["prompt_tokens"] + totals["completion_tokens"]
+        if limits.get("tokens") and tokens >= limits["tokens"]:
+            return f"{scope} {key} used {tokens} of {limits['tokens']} tokens"
+        if limits.get("cost_usd") and totals["cost_usd"] >= limits["cost_usd"]:
+            return f"{scope} {key} spent ${totals['cost_usd']:.4f} of ${limits['cost_usd']:.2f}"
+        return None
+
+    def check(self, call_site):
+        """Before a call: raise BudgetExceeded under a hard cap, otherwise warn once per session/user"""
+        if not self.budgets:
+            return
+        session, user = current_caller()
+        for scope, key in (("session", session), ("user", user)):
+            reason = self.over_budget(scope, key)
+            if reason is None:
+                continue
+            if self.budgets.get("hard_cap"):
+                increment("llm_budget_blocked", scope=scope, call_site=call_site)
+                raise BudgetExceeded(f"LLM budget exhausted: {reason}")
+            if (scope, key) not in self.warned:
+                self.warned.add((scope, key))
+                increment("llm_budget_exceeded", scope=scope)
+                logging.warning(f"LLM budget exceeded: {reason}")
+
+    def table(self, scope="call_site"):
+        """Rows of totals for one scope, most expensive first"""
+        with self.lock:
+            rows = [{scope: key, **totals,
+                     "avg_latency_s": round(totals["latency_s"] / totals["calls"], 3) if totals["calls"] else 0.0}
+                    for key, totals in self.scopes[scope].items()]
+        for row in rows:
+            row["cost_usd"] = round(row["cost_usd"], 6)
+            row["latency_s"] = round(row["latency_s"], 3)
+        return sorted(rows, key=lambda row: (row["cost_usd"], row["prompt_tokens"]), reverse=True)
+
+    def reset(self):
+        with self.lock:
+            for totals in self.scopes.values():
+                totals.clear()
+            self.warned.clear()
+
+
+LEDGER = UsageLedger(load_budgets(), os.getenv("LLM_USAGE_LOG"))
+
+
+class _Flight:
+    def __init__(self):
+        self.done = threading.Event()
+        self.result = None
+        self.error = None
+
+
+class SingleFlight:
+    """Concurrent calls with the same key share one execution and its result (or exception)"""
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.flights = {}
+
+    def do(self, key, fn):
+        """Returns (result, shared); shared is True when another caller's call produced it"""
+        with self.lock:
+            flight = self.flights.get(key)
+            leader = flight is None
+            if leader:
+                flight = self.flights[key] = _Flight()
+        if not leader:
+            flight.done.wait()
+            if flight.error is not None:
+                raise flight.error
+            return flight.result, True
+        try:
+            flight.result = fn()
+        except BaseException as e:
+            flight.error = e
+            raise
+        finally:
+            with self.lock:
+                del self.flights[key]
+            flight.done.set()
+        return flight.result, False
+
+
+FLIGHTS = SingleFlight()
+
+
+def request_key(*parts):
+    """Hash identifying a request: endpoint, credentials and payload (sorted JSON)"""
+    data = json.dumps(parts, sort_keys=True, default=str).encode()
+    return hashlib.sha256(data).hexdigest()
+
+
+def post_chat_completion(payload, call_site, headers=None, timeout=None):
+    """
+    POST a chat completion request to the configured endpoint, accounting it to call_site.
+    An identical request already in flight is joined instead of sent again (except streams).
+
+    Returns:
+        requests.Response: Callers check status_code and parse the body as before.
+    """
+    LEDGER.check(call_site)
+    if headers is None:
+        headers = {"Authorization": f"Bearer {os.getenv('SAMBANOVA_API_KEY')}", "Content-Type": "application/json"}
+    if payload.get("stream"):
+        return _post_chat_completion(payload, call_site, headers, timeout)
+    key = request_key(chat_completions_url(), headers.get("Authorization"), payload)
+    response, shared = FLIGHTS.do(key, lambda: _post_chat_completion(payload, call_site, headers, timeout))
+    if shared:
+        LEDGER.record_coalesced(call_site)
+    return response
+
+
+def _post_chat_completion(payload, call_site, headers, timeout):
+    model = payload.get("model", "unknown")
+    start = time.perf_counter()
+    try:
+        response = requests.post(chat_completions_url(), headers=headers, json=payload, timeout=timeout)
+    except requests.RequestException:
+        LEDGER.record(call_site, model, 0, 0, time.perf_counter() - start, error=True)
+        raise
+    latency = time.perf_counter() - start
+
+    usage, content = None, ""
+    if response.status_code == 200:
+        try:
+            body = response.json()
+            usage = body.get("usage")
+            content = body["choices"][0]["message"]["content"] or ""
+        except (ValueError, KeyError, IndexError, TypeError):
+            pass
+    if usage:
+        LEDGER.record(call_site, model, usage.get("prompt_tokens", 0), usage.get("completion_tokens", 0), latency)
+    else:
+        error = response.status_code != 200
+        LEDGER.record(call_site, model, 0 if error else estimate_prompt_tokens(payload.get("messages")),
+                      estimate_tokens(content), latency, error=error, estimated=not error)
+    return response
+
+
+def create_chat_completion(client, call_site, **kwargs):
+    """client.chat.completions.create(**kwargs) through the OpenAI SDK, accounted to call_site and coalesced"""
+    LEDGER.check(call_site)
+    if kwargs.get("stream"):
+        return _create_chat_completion(client, call_site, kwargs)
+    key = request_key(str(client.base_url), client.api_key, kwargs)
+    response, shared = FLIGHTS.do(key, lambda: _create_chat_completion(client, call_site, kwargs))
+    if shared:
+        LEDGER.record_coalesced(call_site)
+    return response
+
+
+def _create_chat_completion(client, call_site, kwargs):
+    model = kwargs.get("model", "unknown")
+    start = time.perf_counter()
+    try:
+        response = client.chat.completions.create(**kwargs)
+    except Exception:
+        LEDGER.record(call_site, model, 0, 0, time.perf_counter() - start, error=True)
+        raise
+    latency = time.perf_counter() - start
+    usage = getattr(response, "usage", None)
+    if usage is not None:
+        LEDGER.record(call_site, model, usage.prompt_tokens or 0, usage.completion_tokens or 0, latency)
+    else:
+        content = response.choices[0].message.content or ""
+        LEDGER.record(call_site, model, estimate_prompt_tokens(kwargs.get("messages")), estimate_tokens(content),
+                      latency, estimated=True)
+    return response
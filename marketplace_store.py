@@ -0,0 +1,363 @@
+"""
+marketplace_store.py
+
+The single store of marketplace listings, shared by every wardrobe. Listings
+live in an SQLite database with indexed columns (type, brand, condition,
+date_listed, price) so the marketplace tab runs filtered, paginated queries
+instead of re-reading a JSON file and filtering in Python. Images are kept as
+the stored JPEG bytes and features as float32 blobs; metadata (AI analysis,
+listing copy, palette) is a JSON payload.
+
+Each WardrobeTracker publishes its listings here under its owner id
+(sync_owner), and claiming a listing is one transaction that marks it
+claimed and hands over its image bytes, features and metadata without
+decoding or re-encoding anything. The old market_place_database.json is
+imported once, under the "marketplace" owner.
+
+Usage:
+    store = get_store()
+    listings, total = store.query(type="Jacket", order_by="price", limit=20, offset=40)
+    claimed = store.claim(listing_id, claimant="local")
+"""
+
+import base64
+import hashlib
+import json
+import logging
+import sqlite3
+import threading
+from datetime import datetime
+from pathlib import Path
+
+import numpy as np
+
+from item_attributes import item_attributes
+
+MARKETPLACE_DB_PATH = Path("marketplace.db")
+LEGACY_JSON_PATH = Path("market_place_database.json")
+LEGACY_OWNER = "marketplace"
+
+# Stored as columns/blobs rather than in the JSON payload
+HEAVY_FIELDS = ("image", "reference_images", "reference_features", "features", "feature_versions")
+ORDER_COLUMNS = ("date_listed", "price", "type", "brand", "condition", "name")
+FILTER_COLUMNS = ("type", "brand", "condition")
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS listings (
+    listing_id INTEGER PRIMARY KEY AUTOINCREMENT,
+    owner TEXT NOT NULL,
+    item_id INTEGER,
+    status TEXT NOT NULL DEFAULT 'active',
+    type TEXT,
+    brand TEXT,
+    condition TEXT,
+    date_listed TEXT,
+    price REAL,
+    name TEXT,
+    signature TEXT,
+    payload TEXT NOT NULL,
+    image BLOB,
+    features BLOB,
+    feature_version TEXT,
+    claimed_by TEXT,
+    claimed_at TEXT
+);
+CREATE INDEX IF NOT EXISTS listings_date ON listings(status, date_listed);
+CREATE INDEX IF NOT EXISTS listings_type ON listings(status, type, date_listed);
+CREATE INDEX IF NOT EXISTS listings_brand ON listings(status, brand, date_listed);
+CREATE INDEX IF NOT EXISTS listings_condition ON listings(status, condition, date_listed);
+CREATE INDEX IF NOT EXISTS listings_price ON listings(status, price);
+CREATE INDEX IF NOT EXISTS listings_owner ON listings(owner, item_id, status);
+CREATE UNIQUE INDEX IF NOT EXISTS listings_active_item ON listings(owner, item_id) WHERE status = 'active';
+CREATE TABLE IF NOT EXISTS meta (key TEXT PRIMARY KEY, value TEXT);
+"""
+
+
+def _known(value):
+    if value is None or str(value).strip().lower() in ("", "unknown", "not specified", "none"):
+        return None
+    return str(value).strip()
+
+
+def _price(value):
+    try:
+        return float(value) if value is not None else None
+    except (TypeError, ValueError):
+        return None
+
+
+def listing_payload(item):
+    """(payload JSON, signature) of a listing; the signature changes with its metadata or image"""
+    payload = {k: v for k, v in item.items() if k not in HEAVY_FIELDS}
+    # Only the primary view travels with a listing
+    payload["view_hashes"] = list(item.get("view_hashes") or [])[:1]
+    payload["view_colors"] = list(item.get("view_colors") or [])[:1]
+    payload_json = json.dumps(payload, sort_keys=True, default=str)
+    signature = hashlib.sha1(payload_json.encode() + (item.get("image") or "").encode()).hexdigest()
+    return payload_json, signature
+
+
+def listing_row(item):
+    """Column values for a wardrobe listing (or legacy marketplace item)"""
+    attributes = item_attributes(item)
+    payload_json, signature = listing_payload(item)
+    image_b64 = item.get("image") or ""
+    features = item.get("features")
+    return {
+        "item_id": item.get("id"),
+        "type": item.get("type"),
+        "brand": _known(attributes.get("brand")),
+        "condition": _known(attributes.get("condition")),
+        "date_listed": item.get("date_listed") or item.get("last_worn"),
+        "price": _price(item.get("price")),
+        "name": item.get("name", item.get("type")),
+        "signature": signature,
+        "payload": payload_json,
+        "image": base64.b64decode(image_b64) if image_b64 else None,
+        "features": np.asarray(features, dtype=np.float32).tobytes() if features else None,
+        "feature_version": item.get("feature_version"),
+    }
+
+
+class MarketplaceStore:
+    """SQLite-backed listings shared by all wardrobes; safe to use from several threads"""
+
+    def __init__(self, path=MARKETPLACE_DB_PATH, legacy_json=LEGACY_JSON_PATH):
+        self.path = Path(path)
+        self.lock = threading.RLock()
+        # Autocommit; multi-statement changes use explicit BEGIN IMMEDIATE transactions
+        self.conn = sqlite3.connect(self.path, check_same_thread=False, isolation_level=None, timeout=30)
+        self.conn.row_factory = sqlite3.Row
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.executescript(SCHEMA)
+        if legacy_json:
+            self.import_legacy(legacy_json)
+
+    def _insert(self, owner, row, status="active", ignore_conflicts=False):
+        """Insert a listing row; with ignore_conflicts, a row violating a constraint is skipped (returns False)"""
+        columns = ["owner", "status"] + list(row)
+        cursor = self.conn.execute(
+            f"INSERT {'OR IGNORE ' if ignore_conflicts else ''}INTO listings ({', '.join(columns)}) "
+            f"VALUES ({', '.join('?' * len(columns))})",
+            [owner, status] + list(row.values()),
+        )
+        return cursor.rowcount > 0
+
+    def _update(self, listing_id, row):
+        """Rewrite a listing's columns in place, keeping its listing_id"""
+        self.conn.execute(f"UPDATE listings SET {', '.join(f'{column} = ?' for column in row)} WHERE listing_id = ?",
+                          list(row.values()) + [listing_id])
+
+    def import_legacy(self, path):
+        """
+        Import market_place_database.json once (recorded in the meta table). Items
+        that cannot be read, or repeat an id already imported, are skipped and logged.
+        """
+        path = Path(path)
+        key = f"imported:{path.resolve()}"
+        with self.lock:
+            if not path.exists() or self.conn.execute("SELECT 1 FROM meta WHERE key = ?", (key,)).fetchone():
+                return 0
+            try:
+                with open(path) as f:
+                    items = json.load(f).get("items", [])
+            except (OSError, json.JSONDecodeError) as e:
+                logging.error(f"Error importing {path}: {e}")
+                return 0
+            imported, unreadable, duplicates = 0, 0, []
+            self.conn.execute("BEGIN IMMEDIATE")
+            try:
+                for item in items:
+                    try:
+                        row = listing_row(item)
+                    except (AttributeError, TypeError, ValueError) as e:
+                        logging.error(f"Skipping unreadable legacy listing {item!r:.80}: {e}")
+                        unreadable += 1
+                        continue
+                    if self._insert(LEGACY_OWNER, row, ignore_conflicts=True):
+                        imported += 1
+                    else:
+                        duplicates.append(row["item_id"])
+                self.conn.execute("INSERT INTO meta (key, value) VALUES (?, ?)", (key, datetime.now().isoformat()))
+                self.conn.execute("COMMIT")
+            except Exception:
+                self.conn.execute("ROLLBACK")
+                raise
+        if unreadable or duplicates:
+            logging.warning(f"Skipped {unreadable} unreadable legacy listings and {len(duplicates)} "
+                            f"with an id already imported: {duplicates[:20]}")
+        logging.info(f"Imported {imported} marketplace listings from {path}")
+        return imported
+
+    def sync_owner(self, owner, listings):
+        """
+        Make an owner's active listings match their wardrobe's listings: new ones
+        are published, changed ones updated in place (keeping their listing_id, so
+        a page opened before the change can still claim them), withdrawn ones
+        removed and unchanged ones left alone (compared by signature).
+
+        Returns:
+            list: ids of the owner's listed items that someone else has claimed;
+            the wardrobe should drop them.
+        """
+        with self.lock:
+            rows = self.conn.execute(
+                "SELECT listing_id, item_id, status, signature, date_listed FROM listings "
+                "WHERE owner = ? AND status IN ('active', 'claimed')", (owner,)
+            ).fetchall()
+            active = {row["item_id"]: row for row in rows if row["status"] == "active"}
+            claimed_keys = {(row["item_id"], row["date_listed"]) for row in rows if row["status"] == "claimed"}
+
+            claimed, inserts, updates, current = [], [], [], set()
+            for listing in listings:
+                item_id = listing.get("id")
+                if (item_id, listing.get("date_listed")) in claimed_keys:
+                    claimed.append(item_id)
+                    continue
+                current.add(item_id)
+                if item_id not in active:
+                    inserts.append(listing_row(listing))
+                elif active[item_id]["signature"] != listing_payload(listing)[1]:
+                    updates.append((active[item_id]["listing_id"], listing_row(listing)))
+            withdrawn = [row["listing_id"] for item_id, row in active.items() if item_id not in current]
+
+            if inserts or updates or withdrawn:
+                self.conn.execute("BEGIN IMMEDIATE")
+                try:
+                    for listing_id, row in updates:
+                        self._update(listing_id, row)
+                    for row in inserts:
+                        self._insert(owner, row)
+                    self.conn.executemany("DELETE FROM listings WHERE listing_id = ?", [(i,) for i in withdrawn])
+                    self.conn.execute("COMMIT")
+                except Exception:
+                    self.conn.execute("ROLLBACK")
+                    raise
+        return claimed
+
+    def _listing(self, row, with_image=False):
+        listing = json.loads(row["payload"])
+        listing.update(listing_id=row["listing_id"], owner=row["owner"], status=row["status"],
+                       date_listed=row["date_listed"], price=row["price"])
+        for column in ("brand", "condition"):
+            listing.setdefault(column, row[column])
+        if with_image:
+            listing["image_bytes"] = row["image"]
+        return listing
+
+    def query(self, status="active", owner=None, exclude_owner=None, type=None, brand=None, condition=None,
+              min_price=None, max_price=None, order_by="date_listed", descending=True, limit=20, offset=0,
+              with_images=True):
+        """
+        One page of listings matching the filters.
+
+        Args:
+            limit (int): Page size; None returns every match.
+            with_images (bool): Include each listing's JPEG bytes as "image_bytes".
+
+        Returns:
+            tuple: (listings, total) where total counts every match, for pagination.
+        """
+        if order_by not in ORDER_COLUMNS:
+            raise ValueError(f"Cannot order listings by {order_by}")
+        where, params = ["status = ?"], [status]
+        for column, value in (("type", type), ("brand", brand), ("condition", condition), ("owner", owner)):
+            if value is not None:
+                where.append(f"{column} = ?")
+                params.append(value)
+        if exclude_owner is not None:
+            where.append("owner != ?")
+            params.append(exclude_owner)
+        if min_price is not None:
+            where.append("price >= ?")
+            params.append(min_price)
+        if max_price is not None:
+            where.append("price <= ?")
+            params.append(max_price)
+        clause = " AND ".join(where)
+        columns = "listing_id, owner, status, date_listed, price, brand, condition, payload" + (", image" if with_images else "")
+        sql = (f"SELECT {columns} FROM listings WHERE {clause} "
+               f"ORDER BY {order_by} {'DESC' if descending else 'ASC'}, listing_id")
+        page_params = list(params)
+        if limit is not None:
+            sql += " LIMIT ? OFFSET ?"
+            page_params += [int(limit), int(offset)]
+        with self.lock:
+            total = self.conn.execute(f"SELECT COUNT(*) FROM listings WHERE {clause}", params).fetchone()[0]
+            rows = self.conn.execute(sql, page_params).fetchall()
+        return [self._listing(row, with_images) for row in rows], total
+
+    def facets(self, column, status="active", exclude_owner=None):
+        """Distinct values of an indexed filter column, for filter menus"""
+        if column not in FILTER_COLUMNS:
+            raise ValueError(f"No facet for {column}")
+        sql = f"SELECT DISTINCT {column} FROM listings WHERE status = ? AND {column} IS NOT NULL"
+        params = [status]
+        if exclude_owner is not None:
+            sql += " AND owner != ?"
+            params.append(exclude_owner)
+        with self.lock:
+            return sorted(row[0] for row in self.conn.execute(sql, params))
+
+    def image(self, listing_id):
+        """Stored JPEG bytes of a listing"""
+        with self.lock:
+            row = self.conn.execute("SELECT image FROM listings WHERE listing_id = ?", (listing_id,)).fetchone()
+        return row["image"] if row else None
+
+    def claim(self, listing_id, claimant):
+        """
+        Atomically claim an active listing. Returns the listing with its stored
+        "image_bytes", "features" (float32 array or None) and "feature_version",
+        or None if it does not exist or was claimed first by someone else.
+        """
+        with self.lock:
+            self.conn.execute("BEGIN IMMEDIATE")
+            try:
+                row = self.conn.execute("SELECT * FROM listings WHERE listing_id = ? AND status = 'active'",
+                                        (listing_id,)).fetchone()
+                if row is None:
+                    self.conn.execute("ROLLBACK")
+                    return None
+                self.conn.execute("UPDATE listings SET status = 'claimed', claimed_by = ?, claimed_at = ? "
+                                  "WHERE listing_id = ?", (claimant, datetime.now().isoformat(), listing_id))
+                self.conn.execute("COMMIT")
+            except Exception:
+                self.conn.execute("ROLLBACK")
+                raise
+        listing = self._listing(row, with_image=True)
+        listing["features"] = np.frombuffer(row["features"], dtype=np.float32) if row["features"] else None
+        listing["feature_version"] = row["feature_version"]
+        return listing
+
+    def release(self, listing_id, claimant):
+        """Undo a claim whose transfer into the claimant's wardrobe failed; True if it is active again"""
+        with self.lock:
+            try:
+                return self.conn.execute("UPDATE listings SET status = 'active', claimed_by = NULL, claimed_at = NULL "
+                                         "WHERE listing_id = ? AND status = 'claimed' AND claimed_by = ?",
+                                         (listing_id, claimant)).rowcount > 0
+            except sqlite3.IntegrityError:
+                # The owner listed the item again in the meantime
+                return False
+
+    def remove(self, listing_id):
+        with self.lock:
+            return self.conn.execute("DELETE FROM listings WHERE listing_id = ?", (listing_id,)).rowcount > 0
+
+    def close(self):
+        with self.lock:
+            self.conn.close()
+
+
+_stores = {}
+_stores_lock = threading.Lock()
+
+
+def get_store(path=MARKETPLACE_DB_PATH):
+    """The process-wide store for a database file (one connection shared by all sessions)"""
+    key = str(Path(path).resolve())
+    with _stores_lock:
+        if key not in _stores:
+            _stores[key] = MarketplaceStore(path)
+        return _stores[key]
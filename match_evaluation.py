@@ -0,0 +1,272 @@
+"""
+match_evaluation.py
+
+Benchmark harness for capture matching. Replays a labelled capture set through
+FeatureExtractor and the tracker's decision rule (best multi-view cosine
+similarity above similarity_threshold) and reports precision/recall of the
+match decisions and the per-image extraction cost, with and without garment
+segmentation. With --calibrate it also reports the ROC curve, grid-searches the
+threshold and the CNN-vs-colour weights, and writes matcher_config.json, which
+WardrobeTracker loads at start-up.
+
+Capture set layout (paths relative to the manifest):
+    {
+        "references": [{"item_id": "navy-hoodie", "category": "Hoodie", "images": ["refs/navy_1.jpg"]}],
+        "captures": [{"image": "captures/001.jpg", "expected": "navy-hoodie"},
+                     {"image": "captures/002.jpg", "expected": null}]
+    }
+"expected": null marks a capture of an item that is not in the wardrobe.
+
+Usage:
+    python match_evaluation.py eval_data/captures/manifest.json --threshold 0.80
+    python match_evaluation.py eval_data/captures/manifest.json --calibrate --output matcher_config.json
+"""
+
+import argparse
+import json
+import time
+from datetime import datetime
+from pathlib import Path
+
+import numpy as np
+
+from image_pipeline import load_image
+from match_index import MATCHER_CONFIG_PATH, load_matcher_config
+
+DEFAULT_THRESHOLD = 0.80
+THRESHOLD_GRID = [round(float(t), 2) for t in np.arange(0.60, 0.995, 0.01)]
+CNN_WEIGHT_GRID = [0.5, 0.6, 0.7, 0.8, 0.9]
+
+
+def load_manifest(path):
+    path = Path(path)
+    with open(path) as f:
+        manifest = json.load(f)
+    base = path.parent
+    for reference in manifest.get("references", []):
+        reference["images"] = [str(base / image) for image in reference["images"]]
+    for capture in manifest.get("captures", []):
+        capture["image"] = str(base / capture["image"])
+    return manifest
+
+
+def extract_parts(extractor, paths, use_segmentation):
+    """
+    Unweighted (cnn, color) features for every image, with per-image seconds.
+
+    Returns:
+        tuple: ({path: (cnn, color)}, [seconds per image])
+    """
+    parts, seconds = {}, []
+    for path in paths:
+        image = load_image(path)
+        start = time.perf_counter()
+        parts[path] = extractor.extract_feature_parts(image, use_segmentation=use_segmentation)
+        seconds.append(time.perf_counter() - start)
+    return parts, seconds
+
+
+def _normalized(vector):
+    return vector / (np.linalg.norm(vector) + 1e-7)
+
+
+def score_captures(extractor, manifest, parts, weights=None):
+    """
+    Best-matching reference item and similarity for every capture.
+
+    Returns:
+        list: dicts with image, expected, best_item, similarity
+    """
+    item_ids, ref_vectors = [], []
+    for reference in manifest["references"]:
+        for image in reference["images"]:
+            combined = extractor.combine_features(parts[image], weights)
+            if combined is not None:
+                item_ids.append(reference["item_id"])
+                ref_vectors.append(_normalized(combined))
+    ref_matrix = np.array(ref_vectors)
+
+    scored = []
+    for capture in manifest["captures"]:
+        start = time.perf_counter()
+        combined = extractor.combine_features(parts[capture["image"]], weights)
+        best_item, best_similarity = None, 0.0
+        if combined is not None and len(ref_matrix):
+            similarities = ref_matrix @ _normalized(combined)
+            best = int(np.argmax(similarities))
+            best_item, best_similarity = item_ids[best], float(similarities[best])
+        scored.append({
+            "image": capture["image"],
+            "expected": capture.get("expected"),
+            "best_item": best_item,
+            "similarity": best_similarity,
+            "match_seconds": time.perf_counter() - start,
+        })
+    return scored
+
+
+def evaluate(scored, threshold=DEFAULT_THRESHOLD):
+    """
+    Precision/recall of match decisions at a threshold.
+
+    A capture is matched when its best similarity exceeds the threshold. Matching
+    the expected item is a true positive; matching anything for a new item, or the
+    wrong item, is a false positive; an expected item that is not matched
+    (a "rescan" for the user) is a false negative.
+    """
+    tp = fp = fn = tn = rescans = 0
+    for entry in scored:
+        matched = entry["similarity"] > threshold
+        expected = entry["expected"]
+        if matched and entry["best_item"] == expected:
+            tp += 1
+        elif matched:
+            fp += 1
+            if expected is not None:
+                fn += 1
+        elif expected is not None:
+            fn += 1
+            rescans += 1
+        else:
+            tn += 1
+
+    precision = tp / (tp + fp) if tp + fp else 0.0
+    recall = tp / (tp + fn) if tp + fn else 0.0
+    f1 = 2 * precision * recall / (precision + recall) if precision + recall else 0.0
+    return {
+        "threshold": threshold,
+        "true_positives": tp,
+        "false_positives": fp,
+        "false_negatives": fn,
+        "true_negatives": tn,
+        "rescans": rescans,
+        "precision": round(precision, 4),
+        "recall": round(recall, 4),
+        "f1": round(f1, 4),
+    }
+
+
+def _cost(seconds):
+    if not seconds:
+        return {"images": 0}
+    arr = np.array(seconds) * 1000
+    return {
+        "images": len(seconds),
+        "mean_ms": round(float(arr.mean()), 1),
+        "p95_ms": round(float(np.percentile(arr, 95)), 1),
+    }
+
+
+def roc_curve(scored):
+    """
+    ROC of the similarity score, where a capture is positive when its best match is
+    the expected item. Returns (points, auc) with points as [threshold, fpr, tpr].
+    """
+    labels = np.array([entry["best_item"] is not None and entry["best_item"] == entry["expected"]
+                       for entry in scored])
+    scores = np.array([entry["similarity"] for entry in scored])
+    positives, negatives = labels.sum(), (~labels).sum()
+    if not positives or not negatives:
+        return [], None
+
+    points = [[1.0, 0.0, 0.0]]
+    for threshold in sorted(set(scores.tolist()), reverse=True):
+        predicted = scores >= threshold
+        points.append([round(threshold, 4),
+                       round(float((predicted & ~labels).sum() / negatives), 4),
+                       round(float((predicted & labels).sum() / positives), 4)])
+    fpr = [p[1] for p in points] + [1.0]
+    tpr = [p[2] for p in points] + [1.0]
+    auc = sum((x1 - x0) * (y0 + y1) / 2 for x0, x1, y0, y1 in zip(fpr, fpr[1:], tpr, tpr[1:]))
+    return points, round(auc, 4)
+
+
+def grid_search(extractor, manifest, parts, thresholds=THRESHOLD_GRID, cnn_weights=CNN_WEIGHT_GRID):
+    """
+    Evaluate every (cnn weight, threshold) pair from precomputed feature parts.
+
+    Returns:
+        tuple: (best result, all results), best by F1 then precision.
+    """
+    results = []
+    for cnn_weight in cnn_weights:
+        weights = [cnn_weight, round(1 - cnn_weight, 2)]
+        scored = score_captures(extractor, manifest, parts, weights)
+        for threshold in thresholds:
+            results.append({"feature_weights": weights, **evaluate(scored, threshold)})
+    best = max(results, key=lambda r: (r["f1"], r["precision"]))
+    return best, results
+
+
+def calibrate(manifest_path, use_segmentation=False, extractor=None, output=MATCHER_CONFIG_PATH):
+    """
+    Grid-search threshold and weights, report ROC and latency, and update the matcher
+    config; settings calibration does not produce (feature_storage, hash_max_distance, ...)
+    are kept.
+    """
+    if extractor is None:
+        from feature_extractor import FeatureExtractor
+        extractor = FeatureExtractor()
+
+    manifest = load_manifest(manifest_path)
+    paths = [image for reference in manifest["references"] for image in reference["images"]]
+    paths += [capture["image"] for capture in manifest["captures"]]
+    parts, seconds = extract_parts(extractor, paths, use_segmentation)
+
+    best, _ = grid_search(extractor, manifest, parts)
+    scored = score_captures(extractor, manifest, parts, best["feature_weights"])
+    points, auc = roc_curve(scored)
+    baseline = evaluate(score_captures(extractor, manifest, parts, [0.7, 0.3]), DEFAULT_THRESHOLD)
+
+    config = {
+        "similarity_threshold": best["threshold"],
+        "feature_weights": best["feature_weights"],
+        "use_segmentation": use_segmentation,
+        "metrics": {k: v for k, v in best.items() if k not in ("threshold", "feature_weights")},
+        "baseline_metrics": baseline,
+        "roc_auc": auc,
+        "roc": points,
+        "extraction_cost": _cost(seconds),
+        "match_cost": _cost([entry["match_seconds"] for entry in scored]),
+        "manifest": str(manifest_path),
+        "generated_at": datetime.now().isoformat(),
+    }
+    if output:
+        with open(output, "w") as f:
+            json.dump({**load_matcher_config(output), **config}, f, indent=4)
+    return config
+
+
+def run_benchmark(manifest_path, threshold=DEFAULT_THRESHOLD, modes=("full", "segmented"), extractor=None):
+    """Evaluate each mode ("full" frame or "segmented" garment) on a capture set"""
+    if extractor is None:
+        from feature_extractor import FeatureExtractor
+        extractor = FeatureExtractor()
+
+    manifest = load_manifest(manifest_path)
+    paths = [image for reference in manifest["references"] for image in reference["images"]]
+    paths += [capture["image"] for capture in manifest["captures"]]
+
+    report = {"manifest": str(manifest_path), "captures": len(manifest["captures"]), "modes": {}}
+    for mode in modes:
+        parts, seconds = extract_parts(extractor, paths, use_segmentation=(mode == "segmented"))
+        scored = score_captures(extractor, manifest, parts)
+        report["modes"][mode] = {**evaluate(scored, threshold), "cost": _cost(seconds)}
+    return report
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("manifest")
+    parser.add_argument("--threshold", type=float, default=DEFAULT_THRESHOLD)
+    parser.add_argument("--modes", nargs="+", default=["full", "segmented"], choices=["full", "segmented"])
+    parser.add_argument("--calibrate", action="store_true", help="grid-search threshold and weights")
+    parser.add_argument("--segmentation", action="store_true", help="calibrate with garment segmentation")
+    parser.add_argument("--output", default=str(MATCHER_CONFIG_PATH), help="matcher config written by --calibrate")
+    args = parser.parse_args()
+    if args.calibrate:
+        config = calibrate(args.manifest, args.segmentation, output=args.output)
+        print(json.dumps({k: v for k, v in config.items() if k != "roc"}, indent=4))
+        print(f"Wrote {args.output}")
+    else:
+        print(json.dumps(run_benchmark(args.manifest, args.threshold, args.modes), indent=4))
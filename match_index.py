@@ -0,0 +1,287 @@
+"""
+match_index.py
+
+Category-partitioned match index for captures. Reference views of wardrobe
+items and listings are grouped by clothing category into normalised feature
+matrices, so a capture is compared against one or two partitions with a single
+matrix product instead of every item in the database. A nearest-centroid
+coarse classifier picks the partitions to search, and each category can carry
+its own similarity threshold learned from logged match outcomes.
+"""
+
+import json
+import logging
+from collections import defaultdict
+from pathlib import Path
+
+import numpy as np
+
+from item_attributes import item_attributes
+from feature_schema import item_views
+
+OTHER = "Other"
+OUTFIT = "Full Outfit"
+
+# Words in a free-form (AI) type that map to the tracker's clothing categories
+CATEGORY_KEYWORDS = {
+    "T-Shirt": ["t-shirt", "tshirt", "tee", "shirt", "top", "blouse", "polo", "tank"],
+    "Hoodie": ["hoodie", "sweatshirt", "sweater", "jumper", "cardigan", "pullover"],
+    "Jacket": ["jacket", "coat", "blazer", "parka", "vest", "windbreaker"],
+    "Pants": ["pants", "jeans", "trousers", "chinos", "joggers", "leggings"],
+    "Shorts": ["shorts"],
+    "Dress": ["dress", "gown"],
+    "Skirt": ["skirt"],
+    "Shoes": ["shoes", "sneakers", "boots", "sandals", "loafers", "heels", "trainers"],
+    "Hat": ["hat", "cap", "beanie"],
+    "Accessory": ["accessory", "bag", "belt", "scarf", "tie", "watch", "jewelry"],
+}
+
+MIN_THRESHOLD = 0.60
+MAX_THRESHOLD = 0.95
+MIN_LABELLED_SAMPLES = 8
+
+
+def item_category(item, categories=None):
+    """Clothing category of an item: its stored type if known, else mapped from the AI type"""
+    item_type = item.get("type")
+    known = set(categories) if categories is not None else set(CATEGORY_KEYWORDS) | {OUTFIT}
+    if item_type in known and item_type != OTHER:
+        return item_type
+    text = " ".join(str(t) for t in (item_attributes(item).get("type"), item_type) if t).lower()
+    # Longest keyword first so "t-shirt" is not read as "shirt" of another category
+    matches = [(len(word), category) for category, words in CATEGORY_KEYWORDS.items()
+               for word in words if word in text]
+    return max(matches)[1] if matches else OTHER
+
+
+def _normalized_rows(matrix):
+    return matrix / np.maximum(np.linalg.norm(matrix, axis=1, keepdims=True), 1e-7)
+
+
+class Partition:
+    """Normalised reference views of one category"""
+
+    def __init__(self, category, codec=None, rerank_k=5):
+        self.category = category
+        # Optional compact first pass (feature_store codec) re-ranked exactly on the top rerank_k views
+        self.codec = codec
+        self.rerank_k = rerank_k
+        self.first_pass = None
+        self.entries = []        # (collection, item) per reference view
+        self.vectors = []        # the database's own view lists (converted when used, not copied)
+        self.matrix = None
+        self.centroid = None
+        self.stale = 0           # views skipped because of a different feature version
+
+    def add(self, collection, item, version=None):
+        views, versions = item_views(item)
+        for view, view_version in zip(views, versions):
+            if version is not None and view_version != version:
+                self.stale += 1
+                continue
+            self.entries.append((collection, item))
+            self.vectors.append(view)
+
+    def freeze(self):
+        dims = {len(v) for v in self.vectors}
+        if len(dims) == 1:
+            matrix = np.asarray(self.vectors, dtype=np.float32)
+            if self.codec is not None and self.codec.accepts(matrix[0]):
+                self.first_pass = _normalized_rows(self.codec.project(matrix))
+                self.centroid = self.first_pass.mean(axis=0)
+            else:
+                self.matrix = _normalized_rows(matrix)
+                self.centroid = self.matrix.mean(axis=0)
+            self.centroid /= max(np.linalg.norm(self.centroid), 1e-7)
+
+    def project(self, features):
+        """A capture in the same (normalised) space as the centroid"""
+        if self.first_pass is not None:
+            features = self.codec.project(features[None, :])[0]
+        return features / max(np.linalg.norm(features), 1e-7)
+
+    def best(self, features, similarity_fn):
+        """(collection, item, similarity) of the closest reference view"""
+        if not self.entries:
+            return None, None, 0.0
+        if self.first_pass is not None and len(self.vectors[0]) == len(features):
+            scores = self.first_pass @ self.project(features)
+            top = np.argsort(scores)[::-1][:self.rerank_k]
+            query = features / max(np.linalg.norm(features), 1e-7)
+            exact = [float(vector @ query / max(np.linalg.norm(vector), 1e-7))
+                     for vector in (np.asarray(self.vectors[i], dtype=np.float32) for i in top)]
+            best = int(np.argmax(exact))
+            return (*self.entries[top[best]], exact[best])
+        if self.matrix is not None and self.matrix.shape[1] == len(features):
+            similarities = self.matrix @ (features / max(np.linalg.norm(features), 1e-7))
+            best = int(np.argmax(similarities))
+            return (*self.entries[best], float(similarities[best]))
+        # Mixed feature lengths (e.g. demo data): compare view by view
+        best_entry, best_similarity = (None, None), 0.0
+        for entry, vector in zip(self.entries, self.vectors):
+            similarity = float(similarity_fn(features, np.asarray(vector, dtype=np.float32)))
+            if similarity > best_similarity:
+                best_entry, best_similarity = entry, similarity
+        return (*best_entry, best_similarity)
+
+
+class MatchIndex:
+    """Per-category partitions of a wardrobe database's reference features"""
+
+    def __init__(self, database, similarity_fn, categories=None, thresholds=None, default_threshold=0.80,
+                 version=None, codec=None):
+        """
+        Args:
+            database (dict): Tracker database; "items", "outfits" and "listings" are indexed.
+            similarity_fn (callable): Fallback pairwise similarity, e.g. FeatureExtractor.calculate_similarity.
+            categories (iterable): Known clothing categories (tracker.clothing_categories).
+            thresholds (dict): Learned per-category thresholds; missing ones use default_threshold.
+            version (str): Only index views of this feature version (see feature_schema).
+            codec: Optional feature_store codec for a compact first pass with exact re-rank.
+        """
+        self.similarity_fn = similarity_fn
+        self.categories = set(categories) if categories else None
+        self.thresholds = thresholds or {}
+        self.default_threshold = default_threshold
+        self.codec = codec
+        self.partitions = {}
+
+        for collection in ("items", "listings"):
+            for item in database.get(collection, []):
+                category = item_category(item, self.categories)
+                if category == OUTFIT:
+                    continue
+                self._partition(category).add(collection, item, version)
+        for outfit in database.get("outfits", []):
+            self._partition(OUTFIT).add("outfits", outfit, version)
+        for partition in self.partitions.values():
+            partition.freeze()
+
+    def _partition(self, category):
+        if category not in self.partitions:
+            self.partitions[category] = Partition(category, self.codec)
+        return self.partitions[category]
+
+    @property
+    def stale_views(self):
+        """Reference views left out because they were embedded with another feature version"""
+        return sum(partition.stale for partition in self.partitions.values())
+
+    def threshold_for(self, category):
+        return self.thresholds.get(category, self.default_threshold)
+
+    def route(self, features, top_n=2):
+        """
+        Coarse classification: the top_n item partitions whose centroid is closest to the
+        capture. Partitions without a centroid (mixed feature lengths) are always searched.
+        """
+        candidates = [p for c, p in self.partitions.items() if c != OUTFIT]
+        scored, unscored = [], []
+        for partition in candidates:
+            if partition.centroid is not None and len(partition.vectors[0]) == len(features):
+                scored.append((float(partition.centroid @ partition.project(features)), partition.category))
+            else:
+                unscored.append(partition.category)
+        return [category for _, category in sorted(scored, reverse=True)[:top_n]] + unscored
+
+    def search(self, features, is_outfit=False, categories=None, top_n=2):
+        """
+        Best reference match for a capture.
+
+        Args:
+            categories (list): Partitions to search; None routes with the coarse classifier.
+
+        Returns:
+            dict: category, collection, item, similarity, threshold, matched, and
+            searched (number of reference views compared).
+        """
+        features = np.asarray(features, dtype=np.float32)
+        if is_outfit:
+            categories = [OUTFIT]
+        elif categories is None:
+            categories = self.route(features, top_n)
+
+        result = {"category": None, "collection": None, "item": None, "similarity": 0.0, "searched": 0}
+        for category in categories:
+            partition = self.partitions.get(category)
+            if partition is None:
+                continue
+            result["searched"] += len(partition.entries)
+            collection, item, similarity = partition.best(features, self.similarity_fn)
+            if item is not None and similarity > result["similarity"]:
+                result.update(category=category, collection=collection, item=item, similarity=similarity)
+
+        result["threshold"] = self.threshold_for(result["category"])
+        result["matched"] = result["item"] is not None and result["similarity"] > result["threshold"]
+        return result
+
+
+def learn_thresholds(samples, default_threshold=0.80, min_samples=MIN_LABELLED_SAMPLES):
+    """
+    Per-category thresholds from labelled match samples.
+
+    Args:
+        samples (iterable): dicts with "category", "similarity" and boolean "label"
+            (True: the capture was that item, False: it was not).
+
+    Returns:
+        dict: {category: threshold} for categories with enough samples of both labels,
+        choosing the cut that maximises F1, clamped to [MIN_THRESHOLD, MAX_THRESHOLD].
+    """
+    by_category = defaultdict(list)
+    for sample in samples:
+        if sample.get("category") and sample.get("label") is not None:
+            by_category[sample["category"]].append((float(sample["similarity"]), bool(sample["label"])))
+
+    thresholds = {}
+    for category, points in by_category.items():
+        labels = [label for _, label in points]
+        if len(points) < min_samples or all(labels) or not any(labels):
+            continue
+        values = sorted({similarity for similarity, _ in points})
+        cuts = [(a + b) / 2 for a, b in zip(values, values[1:])] or [default_threshold]
+        # One sweep over the points in similarity order: counts below each cut grow monotonically
+        points.sort()
+        positives = sum(labels)
+        below, positives_below = 0, 0
+        best_cut, best_f1 = default_threshold, -1.0
+        for cut in cuts:
+            while below < len(points) and points[below][0] <= cut:
+                positives_below += points[below][1]
+                below += 1
+            tp = positives - positives_below
+            fp = (len(points) - below) - tp
+            fn = positives_below
+            f1 = 2 * tp / (2 * tp + fp + fn) if tp else 0.0
+            if f1 > best_f1:
+                best_cut, best_f1 = cut, f1
+        thresholds[category] = round(min(MAX_THRESHOLD, max(MIN_THRESHOLD, best_cut)), 4)
+    return thresholds
+
+
+MATCHER_CONFIG_PATH = Path("matcher_config.json")
+# EfficientNet-B0 pooled features; the remaining 192 values are the colour histograms
+CNN_DIM = 1280
+# (cnn, colour) weights FeatureExtractor combines with when no calibration is configured
+DEFAULT_FEATURE_WEIGHTS = [0.7, 0.3]
+
+
+def load_matcher_config(path=MATCHER_CONFIG_PATH):
+    """Calibrated matcher settings written by match_evaluation.py --calibrate, or {}"""
+    path = Path(path)
+    if not path.exists():
+        return {}
+    try:
+        with open(path) as f:
+            return json.load(f)
+    except (json.JSONDecodeError, OSError) as e:
+        logging.error(f"Error loading matcher config: {e}")
+        return {}
+
+
+def reweight_features(vector, old_weights, new_weights, cnn_dim=CNN_DIM):
+    """Rescale a stored combined feature vector from old to new (cnn, colour) weights"""
+    if list(old_weights) == list(new_weights) or len(vector) <= cnn_dim:
+        return vector
+    scales = [n / o if o else 0.0 for o, n in zip(old_weights, new_weights)]
+    return [v * scales[0] for v in vector[:cnn_dim]] + [v * scales[1] for v in vector[cnn_dim:]]
@@ -0,0 +1,249 @@
+"""
+metrics.py
+
+Lightweight in-process instrumentation for the capture and LLM hot paths.
+Spans (a context manager and a decorator) time named stages into a histogram,
+counters count events, and histograms take any other observation. Everything
+lives in one process-wide registry that can be exported as Prometheus text or
+JSON, served over HTTP for scraping (start_metrics_server) and shown in the
+app's debug panel with p50/p95 per stage.
+
+Usage:
+    with span("capture.match_search"):
+        ...
+    @timed("llm.vision")
+    def analyze(...): ...
+    increment("captures", decision="existing")
+"""
+
+import functools
+import inspect
+import json
+import logging
+import os
+import threading
+import time
+from collections import deque
+from contextlib import contextmanager
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import numpy as np
+
+PREFIX = "vestique"
+SPAN_METRIC = "span_seconds"
+# Seconds; covers sub-millisecond hash lookups up to minute-long LLM calls
+DEFAULT_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60)
+# Recent observations kept per series for exact percentiles
+RESERVOIR_SIZE = 2048
+
+
+def _label_key(labels):
+    return tuple(sorted((k, str(v)) for k, v in labels.items() if v is not None))
+
+
+def _format_labels(key, extra=()):
+    pairs = list(key) + list(extra)
+    if not pairs:
+        return ""
+    escaped = (str(v).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n") for _, v in pairs)
+    return "{" + ",".join(f'{k}="{v}"' for (k, _), v in zip(pairs, escaped)) + "}"
+
+
+class Histogram:
+    """Cumulative buckets, sum and count (for Prometheus) plus a reservoir of recent values"""
+
+    def __init__(self, buckets=DEFAULT_BUCKETS):
+        self.buckets = tuple(buckets)
+        self.counts = [0] * len(self.buckets)
+        self.sum = 0.0
+        self.count = 0
+        self.max = 0.0
+        self.recent = deque(maxlen=RESERVOIR_SIZE)
+
+    def observe(self, value):
+        self.sum += value
+        self.count += 1
+        self.max = max(self.max, value)
+        self.recent.append(value)
+        for i, bound in enumerate(self.buckets):
+            if value <= bound:
+                self.counts[i] += 1
+                break
+
+    def summary(self):
+        recent = np.array(self.recent) if self.recent else np.zeros(1)
+        return {
+            "count": self.count,
+            "sum": round(self.sum, 6),
+            "mean": round(self.sum / self.count, 6) if self.count else 0.0,
+            "p50": round(float(np.percentile(recent, 50)), 6),
+            "p95": round(float(np.percentile(recent, 95)), 6),
+            "p99": round(float(np.percentile(recent, 99)), 6),
+            "max": round(self.max, 6),
+        }
+
+
+class MetricsRegistry:
+    """Thread-safe store of counters and histograms keyed by name and labels"""
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.counters = {}       # name -> {label key: value}
+        self.histograms = {}     # name -> {label key: Histogram}
+        self.enabled = True
+
+    def increment(self, name, value=1, **labels):
+        if not self.enabled:
+            return
+        key = _label_key(labels)
+        with self.lock:
+            series = self.counters.setdefault(name, {})
+            series[key] = series.get(key, 0) + value
+
+    def observe(self, name, value, buckets=None, **labels):
+        if not self.enabled:
+            return
+        key = _label_key(labels)
+        with self.lock:
+            series = self.histograms.setdefault(name, {})
+            if key not in series:
+                series[key] = Histogram(buckets or DEFAULT_BUCKETS)
+            series[key].observe(float(value))
+
+    def reset(self):
+        with self.lock:
+            self.counters.clear()
+            self.histograms.clear()
+
+    def snapshot(self):
+        """JSON-ready view: counters and histogram summaries per label set"""
+        with self.lock:
+            return {
+                "counters": {name: [{"labels": dict(key), "value": value} for key, value in series.items()]
+                             for name, series in self.counters.items()},
+                "histograms": {name: [{"labels": dict(key), **histogram.summary()}
+                                      for key, histogram in series.items()]
+                               for name, series in self.histograms.items()},
+            }
+
+    def span_table(self):
+        """Rows of per-span latency (milliseconds), slowest p95 first, for the debug panel"""
+        rows = []
+        for entry in self.snapshot()["histograms"].get(SPAN_METRIC, []):
+            rows.append({
+                "span": entry["labels"].get("span"),
+                "count": entry["count"],
+                "p50_ms": round(entry["p50"] * 1000, 2),
+                "p95_ms": round(entry["p95"] * 1000, 2),
+                "p99_ms": round(entry["p99"] * 1000, 2),
+                "max_ms": round(entry["max"] * 1000, 2),
+                "total_s": round(entry["sum"], 3),
+            })
+        return sorted(rows, key=lambda row: row["p95_ms"], reverse=True)
+
+    def to_prometheus(self):
+        """Prometheus text exposition format (version 0.0.4)"""
+        lines = []
+        with self.lock:
+            for name, series in sorted(self.counters.items()):
+                metric = f"{PREFIX}_{name}_total"
+                lines.append(f"# TYPE {metric} counter")
+                for key, value in series.items():
+                    lines.append(f"{metric}{_format_labels(key)} {value}")
+            for name, series in sorted(self.histograms.items()):
+                metric = f"{PREFIX}_{name}"
+                lines.append(f"# TYPE {metric} histogram")
+                for key, histogram in series.items():
+                    cumulative = 0
+                    for bound, count in zip(histogram.buckets, histogram.counts):
+                        cumulative += count
+                        lines.append(f"{metric}_bucket{_format_labels(key, [('le', bound)])} {cumulative}")
+                    lines.append(f"{metric}_bucket{_format_labels(key, [('le', '+Inf')])} {histogram.count}")
+                    lines.append(f"{metric}_sum{_format_labels(key)} {histogram.sum}")
+                    lines.append(f"{metric}_count{_format_labels(key)} {histogram.count}")
+        return "\n".join(lines) + "\n"
+
+    def to_json(self):
+        return json.dumps(self.snapshot(), indent=2)
+
+
+REGISTRY = MetricsRegistry()
+REGISTRY.enabled = os.getenv("VESTIQUE_METRICS", "1") != "0"
+
+
+def increment(name, value=1, **labels):
+    REGISTRY.increment(name, value, **labels)
+
+
+def observe(name, value, buckets=None, **labels):
+    REGISTRY.observe(name, value, buckets, **labels)
+
+
+@contextmanager
+def span(name, **labels):
+    """Time a block into the span histogram; exceptions are counted in span_errors and re-raised"""
+    start = time.perf_counter()
+    try:
+        yield
+    except Exception:
+        REGISTRY.increment("span_errors", span=name, **labels)
+        raise
+    finally:
+        REGISTRY.observe(SPAN_METRIC, time.perf_counter() - start, span=name, **labels)
+
+
+def timed(name, **labels):
+    """Decorator form of span() for functions and coroutines"""
+    def decorator(fn):
+        if inspect.iscoroutinefunction(fn):
+            @functools.wraps(fn)
+            async def async_wrapper(*args, **kwargs):
+                with span(name, **labels):
+                    return await fn(*args, **kwargs)
+            return async_wrapper
+
+        @functools.wraps(fn)
+        def wrapper(*args, **kwargs):
+            with span(name, **labels):
+                return fn(*args, **kwargs)
+        return wrapper
+    return decorator
+
+
+class _MetricsHandler(BaseHTTPRequestHandler):
+    def do_GET(self):
+        if self.path.startswith("/metrics.json"):
+            body, content_type = REGISTRY.to_json(), "application/json"
+        elif self.path.startswith("/metrics"):
+            body, content_type = REGISTRY.to_prometheus(), "text/plain; version=0.0.4"
+        else:
+            self.send_error(404)
+            return
+        data = body.encode()
+        self.send_response(200)
+        self.send_header("Content-Type", content_type)
+        self.send_header("Content-Length", str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+    def log_message(self, format, *args):
+        pass
+
+
+_server = None
+_server_lock = threading.Lock()
+
+
+def start_metrics_server(port, host="0.0.0.0"):
+    """Serve /metrics (Prometheus) and /metrics.json on a daemon thread, once per process"""
+    global _server
+    with _server_lock:
+        if _server is None:
+            try:
+                _server = ThreadingHTTPServer((host, int(port)), _MetricsHandler)
+            except OSError as e:
+                logging.error(f"Could not start metrics server on port {port}: {e}")
+                return None
+            threading.Thread(target=_server.serve_forever, name="metrics-server", daemon=True).start()
+            logging.info(f"Metrics served on http://{host}:{port}/metrics")
+    return _server
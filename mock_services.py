@@ -0,0 +1,329 @@
+"""
+mock_services.py
+
+Local HTTP stand-in for the SambaNova and Brevo APIs, for load testing and
+exercising the notification scheduler without live services, real email or
+real spend. It speaks the OpenAI-compatible chat completions protocol (text
+and vision payloads, streaming as server-sent events, usage counts) with
+canned replies in the shape each caller parses, and Brevo's send endpoint;
+accepted messages are kept in memory and appended to an outbox file.
+Latency, jitter and an error rate can be injected to measure throughput and
+resilience under realistic API delays.
+
+Usage:
+    python mock_services.py --port 8025 --latency 1.5 --jitter 0.5 --error-rate 0.02
+    SAMBANOVA_BASE_URL=http://localhost:8025/v1 streamlit run app.py
+    BREVO_API_URL=http://localhost:8025/v3/smtp/email python notification_scheduler.py --once
+"""
+
+import argparse
+import json
+import random
+import re
+import threading
+import time
+import uuid
+from datetime import datetime
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from pathlib import Path
+
+from llm_client import IMAGE_TOKENS, estimate_tokens
+
+
+ERROR_STATUSES = (429, 500, 503)
+# Words the SambaFit tokenizer reply picks out of the user's prompt
+WEATHER_WORDS = ("rainy", "snowy", "windy", "cold", "chilly", "cool", "warm", "hot", "sunny", "mild")
+OCCASION_WORDS = ("wedding", "interview", "office", "work", "gym", "party", "date", "dinner", "beach", "hiking")
+PREFERENCE_WORDS = ("black", "white", "navy", "blue", "red", "green", "grey", "beige", "brown", "pink",
+                    "formal", "casual", "comfortable", "minimal", "bright", "dark")
+
+
+def _message_text(message):
+    """Text of a chat message and the number of images in it"""
+    content = message.get("content") or ""
+    if isinstance(content, str):
+        return content, 0
+    texts = [part.get("text", "") for part in content if part.get("type") == "text"]
+    images = sum(1 for part in content if part.get("type") == "image_url")
+    return "\n".join(texts), images
+
+
+def _prompt_section(text, heading):
+    """Body of a "### heading:" section of a prompt, up to the next heading"""
+    match = re.search(rf"### {heading}:\s*(.*?)\s*(?:###|$)", text, re.S)
+    return match.group(1) if match else ""
+
+
+def _tokenize_reply(prompt):
+    """model1_tokenize_prompt's bare JSON object, from the words in the user's prompt"""
+    words = re.findall(r"[a-z]+", prompt.lower())
+    return json.dumps({
+        "weather": next((w for w in WEATHER_WORDS if w in words), "mild"),
+        "occasion": next((w for w in OCCASION_WORDS if w in words), "casual outing"),
+        "additional_preferences": ", ".join(w for w in PREFERENCE_WORDS if w in words),
+    })
+
+
+def _select_reply(database):
+    """model2_select_items' bare JSON array: the first candidate of each clothing type in the prompt's database"""
+    try:
+        candidates = json.loads(database)
+    except json.JSONDecodeError:
+        candidates = []
+    selected, types = [], set()
+    for candidate in candidates if isinstance(candidates, list) else []:
+        if not isinstance(candidate, dict) or not candidate:
+            continue
+        item_id, description = next(iter(candidate.items()))
+        # Summaries from compact_summary lead with the item type
+        kind = str(description).split("|")[0].strip().lower()
+        if kind not in types:
+            types.add(kind)
+            selected.append({item_id: description})
+    return json.dumps(selected)
+
+
+def mock_reply(messages, rng):
+    """A canned completion in the format the app's prompts ask for"""
+    text = "\n".join(_message_text(m)[0] for m in messages)
+    images = sum(_message_text(m)[1] for m in messages)
+    array = re.search(r"JSON array of (\d+) strings", text)
+    if array:
+        return json.dumps([f"Style it with {rng.choice(['white sneakers', 'a denim jacket', 'tailored trousers', 'a knit beanie'])} for an easy look."
+                           for _ in range(int(array.group(1)))])
+    if '"True" or "False"' in text:
+        return rng.choice(["True", "False"])
+    if "Most Worn" in text:
+        return json.dumps([["cotton", "neutral colours", "casual"], ["synthetic", "bright patterns"],
+                           "Favour versatile cotton basics in neutral colours."])
+    # The selection prompt also carries the tokens, so it is recognised first
+    if "### Database:" in text:
+        return _select_reply(_prompt_section(text, "Database"))
+    if '"additional_preferences"' in text:
+        return _tokenize_reply(_prompt_section(text, "Prompt"))
+    if images:
+        return ("This is a regular-fit cotton t-shirt in navy blue with a crew neck and short sleeves. "
+                "The fabric looks smooth and lightly worn; no brand label is visible.")
+    if "JSON" in text:
+        return "```json\n" + json.dumps({
+            "type": "t-shirt", "material": "cotton",
+            "color": {"primary": "navy", "secondary": []},
+            "fit_and_style": {"fit": "regular", "style": "casual"},
+            "condition": "lightly worn", "season": "all-season", "use_case": ["everyday"],
+        }, indent=2) + "\n```"
+    return ("Pair it with dark straight-leg jeans and clean white sneakers, and add a light overshirt "
+            "when it gets cooler. Neutral accessories keep the look balanced.")
+
+
+class MockServiceState:
+    """Messages received by the stand-in server and its fault-injection settings"""
+
+    def __init__(self, outbox_path=None, latency=0.0, jitter=0.0, error_rate=0.0, chunk_delay=0.0, seed=None):
+        """
+        Args:
+            latency (float): Seconds before every response (time to first token when streaming).
+            jitter (float): Extra uniformly random delay of up to this many seconds.
+            error_rate (float): Fraction of requests answered with a 429, 500 or 503.
+            chunk_delay (float): Seconds between streamed chunks.
+        """
+        self.outbox_path = Path(outbox_path) if outbox_path else None
+        self.latency = latency
+        self.jitter = jitter
+        self.error_rate = error_rate
+        self.chunk_delay = chunk_delay
+        self.rng = random.Random(seed)
+        self.messages = []
+        self.completions = 0
+        self.errors = 0
+        self.lock = threading.Lock()
+
+    def fault(self):
+        """Sleep for the configured delay; returns an error status to inject, or None"""
+        with self.lock:
+            delay = self.latency + self.rng.uniform(0, self.jitter)
+            status = self.rng.choice(ERROR_STATUSES) if self.rng.random() < self.error_rate else None
+            if status:
+                self.errors += 1
+        if delay > 0:
+            time.sleep(delay)
+        return status
+
+    def complete(self, payload):
+        """Reply text and usage for a chat completion request"""
+        messages = payload.get("messages") or []
+        with self.lock:
+            self.completions += 1
+            reply = mock_reply(messages, self.rng)
+        prompt_tokens = sum(estimate_tokens(_message_text(m)[0]) + IMAGE_TOKENS * _message_text(m)[1] for m in messages)
+        max_tokens = payload.get("max_tokens")
+        completion_tokens = estimate_tokens(reply)
+        if max_tokens and completion_tokens > max_tokens:
+            reply, completion_tokens = reply[:max_tokens * 4], max_tokens
+        usage = {"prompt_tokens": prompt_tokens, "completion_tokens": completion_tokens,
+                 "total_tokens": prompt_tokens + completion_tokens}
+        return reply, usage
+
+    def record(self, payload):
+        message = {"messageId": f"<{uuid.uuid4()}@mock.vestique>", "received_at": datetime.now().isoformat(), **payload}
+        with self.lock:
+            self.messages.append(message)
+            if self.outbox_path:
+                with open(self.outbox_path, "a") as f:
+                    f.write(json.dumps(message) + "\n")
+        return message
+
+
+class MockRequestHandler(BaseHTTPRequestHandler):
+    state = None  # set by make_server
+
+    def _send_json(self, status, body):
+        data = json.dumps(body).encode()
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+    def _read_json(self):
+        length = int(self.headers.get("Content-Length", 0))
+        try:
+            return json.loads(self.rfile.read(length) or b"{}")
+        except json.JSONDecodeError:
+            return None
+
+    def _send_error(self, status, openai_format):
+        if openai_format:
+            body = {"error": {"message": f"Injected error {status}", "type": "mock_error", "code": status}}
+        else:
+            body = {"code": "mock_error", "message": f"Injected error {status}"}
+        data = json.dumps(body).encode()
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(data)))
+        if status == 429:
+            self.send_header("Retry-After", "1")
+        self.end_headers()
+        self.wfile.write(data)
+
+    def _chat_completion(self, payload):
+        if not payload.get("model") or not payload.get("messages"):
+            self._send_json(400, {"error": {"message": "model and messages are required", "type": "invalid_request_error"}})
+            return
+        reply, usage = self.state.complete(payload)
+        completion_id = f"chatcmpl-{uuid.uuid4().hex[:24]}"
+        created = int(time.time())
+        if not payload.get("stream"):
+            self._send_json(200, {
+                "id": completion_id, "object": "chat.completion", "created": created, "model": payload["model"],
+                "choices": [{"index": 0, "message": {"role": "assistant", "content": reply}, "finish_reason": "stop"}],
+                "usage": usage,
+            })
+            return
+
+        # Server-sent events: a role chunk, content chunks, a final chunk with usage, then [DONE]
+        self.send_response(200)
+        self.send_header("Content-Type", "text/event-stream")
+        self.send_header("Cache-Control", "no-cache")
+        self.end_headers()
+        pieces = re.findall(r"\S+\s*", reply) or [""]
+        deltas = [{"role": "assistant", "content": ""}] + [{"content": piece} for piece in pieces]
+        for i, delta in enumerate(deltas + [{}]):
+            last = i == len(deltas)
+            chunk = {
+                "id": completion_id, "object": "chat.completion.chunk", "created": created, "model": payload["model"],
+                "choices": [{"index": 0, "delta": delta, "finish_reason": "stop" if last else None}],
+            }
+            if last:
+                chunk["usage"] = usage
+            self.wfile.write(f"data: {json.dumps(chunk)}\n\n".encode())
+            self.wfile.flush()
+            if self.state.chunk_delay and not last:
+                time.sleep(self.state.chunk_delay)
+        self.wfile.write(b"data: [DONE]\n\n")
+        self.wfile.flush()
+
+    def do_POST(self):
+        payload = self._read_json()
+        if payload is None:
+            self._send_json(400, {"code": "bad_request", "message": "Invalid JSON"})
+            return
+
+        path = self.path.rstrip("/")
+        if path in ("/v3/smtp/email", "/v1/chat/completions"):
+            status = self.state.fault()
+            if status:
+                self._send_error(status, openai_format=path.startswith("/v1"))
+                return
+
+        if path == "/v1/chat/completions":
+            self._chat_completion(payload)
+            return
+
+        if path == "/v3/smtp/email":
+            if not payload.get("to") and not payload.get("messageVersions"):
+                self._send_json(400, {"code": "missing_parameter", "message": "to is missing"})
+                return
+            message = self.state.record(payload)
+            self._send_json(201, {"messageId": message["messageId"]})
+            return
+
+        self._send_json(404, {"code": "not_found", "message": self.path})
+
+    def do_GET(self):
+        # Inspect what has been "sent" so far
+        if self.path.rstrip("/") == "/outbox":
+            with self.state.lock:
+                self._send_json(200, {"messages": list(self.state.messages)})
+            return
+        if self.path.rstrip("/") == "/stats":
+            with self.state.lock:
+                self._send_json(200, {"emails": len(self.state.messages), "completions": self.state.completions,
+                                      "injected_errors": self.state.errors})
+            return
+        if self.path.rstrip("/") == "/v1/models":
+            self._send_json(200, {"object": "list", "data": [{"id": "mock", "object": "model"}]})
+            return
+        self._send_json(404, {"code": "not_found", "message": self.path})
+
+    def log_message(self, format, *args):
+        pass
+
+
+def make_server(host="127.0.0.1", port=8025, outbox_path=None, **faults):
+    """
+    Create (but do not start) a stand-in server; server.state holds received messages.
+    faults are MockServiceState's latency, jitter, error_rate, chunk_delay and seed.
+    """
+    state = MockServiceState(outbox_path, **faults)
+    handler = type("BoundMockRequestHandler", (MockRequestHandler,), {"state": state})
+    server = ThreadingHTTPServer((host, port), handler)
+    server.state = state
+    return server
+
+
+def start_in_background(host="127.0.0.1", port=0, outbox_path=None, **faults):
+    """Start a stand-in server on a daemon thread; returns (server, base_url)"""
+    server = make_server(host, port, outbox_path, **faults)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server, f"http://{host}:{server.server_address[1]}"
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8025)
+    parser.add_argument("--outbox", default="mock_outbox.jsonl", help="file receiving every accepted message")
+    parser.add_argument("--latency", type=float, default=0.0, help="seconds before every response")
+    parser.add_argument("--jitter", type=float, default=0.0, help="extra random delay of up to this many seconds")
+    parser.add_argument("--error-rate", type=float, default=0.0, help="fraction of requests answered with 429/500/503")
+    parser.add_argument("--chunk-delay", type=float, default=0.0, help="seconds between streamed chunks")
+    parser.add_argument("--seed", type=int, default=None)
+    args = parser.parse_args()
+    server = make_server(args.host, args.port, args.outbox, latency=args.latency, jitter=args.jitter,
+                         error_rate=args.error_rate, chunk_delay=args.chunk_delay, seed=args.seed)
+    print(f"Mock SambaNova listening on http://{args.host}:{args.port}/v1/chat/completions")
+    print(f"Mock Brevo listening on http://{args.host}:{args.port}/v3/smtp/email")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        server.server_close()
@@ -0,0 +1,211 @@
+"""
+notification_scheduler.py
+
+Headless scheduler for unworn-item reminder emails. Each subscription names a
+recipient, the wardrobe database to watch and a cron-like schedule; due
+subscriptions are evaluated from the precomputed wear statistics (no browser
+session needed) and a digest is sent through Brevo.
+
+Usage:
+    python notification_scheduler.py            # run forever in the foreground
+    python notification_scheduler.py --once     # evaluate all due subscriptions and exit
+
+Set BREVO_API_URL to a mock_services.py instance to test without sending mail.
+"""
+
+import argparse
+import json
+import logging
+import os
+import threading
+import time
+from datetime import datetime, timedelta
+from pathlib import Path
+
+from wear_log import WearStats
+from wardrobe_notifier import EmailNotifier
+from bulk_notifier import BulkNotifier
+
+SUBSCRIPTIONS_PATH = Path("notification_subscriptions.json")
+_subscriptions_lock = threading.Lock()
+
+
+def load_subscriptions(path=SUBSCRIPTIONS_PATH):
+    path = Path(path)
+    if not path.exists():
+        return []
+    try:
+        with open(path) as f:
+            return json.load(f)
+    except (json.JSONDecodeError, OSError) as e:
+        logging.error(f"Error loading subscriptions: {e}")
+        return []
+
+
+def save_subscriptions(subscriptions, path=SUBSCRIPTIONS_PATH):
+    with open(path, "w") as f:
+        json.dump(subscriptions, f, indent=4)
+
+
+def add_subscription(email, db_path="clothing_database.json", daily_at="09:00", weekdays=None,
+                     min_idle_days=7, path=SUBSCRIPTIONS_PATH):
+    """Create or update the reminder subscription for an email address"""
+    with _subscriptions_lock:
+        subscriptions = [s for s in load_subscriptions(path) if s.get("email") != email]
+        subscriptions.append({
+            "email": email,
+            # The scheduler may run from another working directory
+            "db_path": str(Path(db_path).resolve()),
+            "schedule": {"daily_at": daily_at, "weekdays": weekdays},
+            "min_idle_days": min_idle_days,
+            "created_at": datetime.now().isoformat(),
+            "last_run": None,
+        })
+        save_subscriptions(subscriptions, path)
+
+
+def next_run(schedule, after):
+    """
+    Next run strictly after `after` for a schedule of the form
+    {"daily_at": "HH:MM", "weekdays": [0-6] or None} or {"every_minutes": N}.
+    """
+    if schedule.get("every_minutes"):
+        return after + timedelta(minutes=schedule["every_minutes"])
+
+    hour, minute = (int(part) for part in schedule.get("daily_at", "09:00").split(":"))
+    weekdays = schedule.get("weekdays")
+    candidate = after.replace(hour=hour, minute=minute, second=0, microsecond=0)
+    if candidate <= after:
+        candidate += timedelta(days=1)
+    while weekdays and candidate.weekday() not in weekdays:
+        candidate += timedelta(days=1)
+    return candidate
+
+
+def find_unworn_items(db_path, min_idle_days=7, now=None):
+    """Unworn wardrobe items (with idle_days) read from a database's precomputed statistics"""
+    now = now or datetime.now()
+    with open(db_path) as f:
+        database = json.load(f)
+    stats = WearStats(database["wear_stats"]) if "wear_stats" in database else WearStats.from_database(database)
+    items_by_id = {item["id"]: item for item in database.get("items", [])}
+
+    unworn = []
+    for entry in stats.unworn(min_idle_days, "items", now):
+        item = items_by_id.get(entry["id"])
+        if item is not None:
+            unworn.append({**item, "idle_days": stats.idle_days("items", entry["id"], now)})
+    return unworn
+
+
+class NotificationScheduler:
+    """Evaluates reminder subscriptions on a worker thread"""
+
+    def __init__(self, notifier=None, subscriptions_path=SUBSCRIPTIONS_PATH, poll_seconds=60, max_workers=8):
+        self.notifier = notifier or EmailNotifier()
+        self.bulk = BulkNotifier(self.notifier, max_workers=max_workers)
+        self.subscriptions_path = Path(subscriptions_path)
+        self.poll_seconds = poll_seconds
+        self._stop = threading.Event()
+        self._thread = None
+
+    def _is_due(self, subscription, now):
+        last = subscription.get("last_run") or subscription.get("created_at")
+        after = datetime.fromisoformat(last) if last else now - timedelta(days=1)
+        return next_run(subscription.get("schedule", {}), after) <= now
+
+    def run_pending(self, now=None):
+        """Process every subscription that is due at `now`, sending all digests as one bulk run"""
+        now = now or datetime.now()
+        run_at = now.isoformat()
+        # Claim the due subscriptions under the lock; generation and sending run without it
+        with _subscriptions_lock:
+            subscriptions = load_subscriptions(self.subscriptions_path)
+            due = [dict(s) for s in subscriptions if self._is_due(s, now)]
+            if not due:
+                return []
+            for subscription in subscriptions:
+                if self._is_due(subscription, now):
+                    subscription["last_run"] = run_at
+            save_subscriptions(subscriptions, self.subscriptions_path)
+
+        results = []
+        jobs = []
+        for subscription in due:
+            try:
+                items = find_unworn_items(subscription["db_path"], subscription.get("min_idle_days", 7), now)
+            except Exception as e:
+                logging.error(f"Reminder for {subscription.get('email')} failed: {e}")
+                results.append({"email": subscription.get("email"), "error": str(e), "sent": False})
+                continue
+            result = {"email": subscription["email"], "unworn": len(items), "sent": False}
+            results.append(result)
+            if items:
+                jobs.append({"email": subscription["email"], "items": items, "result": result})
+        if jobs:
+            accepted = set(self.bulk.run(jobs)["accepted"])
+            for job in jobs:
+                job["result"]["sent"] = job["email"] in accepted
+
+        with _subscriptions_lock:
+            by_email = {result["email"]: result for result in results}
+            subscriptions = load_subscriptions(self.subscriptions_path)
+            for subscription in subscriptions:
+                # Skip subscriptions re-created by add_subscription while the run was sending
+                if subscription.get("last_run") == run_at and subscription.get("email") in by_email:
+                    subscription["last_result"] = by_email[subscription["email"]]
+            save_subscriptions(subscriptions, self.subscriptions_path)
+        for result in results:
+            logging.info(f"Reminder run: {result}")
+        return results
+
+    def _loop(self):
+        while not self._stop.is_set():
+            try:
+                self.run_pending()
+            except Exception as e:
+                logging.error(f"Notification scheduler error: {e}")
+            self._stop.wait(self.poll_seconds)
+
+    def start(self):
+        """Run the scheduler on a daemon thread"""
+        if self._thread is None or not self._thread.is_alive():
+            self._stop.clear()
+            self._thread = threading.Thread(target=self._loop, name="notification-scheduler", daemon=True)
+            self._thread.start()
+        return self._thread
+
+    def stop(self):
+        self._stop.set()
+
+
+_background_scheduler = None
+
+
+def start_background_scheduler(poll_seconds=60):
+    """Start one in-process scheduler per Python process (Streamlit reruns reuse it)"""
+    global _background_scheduler
+    if _background_scheduler is None:
+        _background_scheduler = NotificationScheduler(poll_seconds=poll_seconds)
+        _background_scheduler.start()
+    return _background_scheduler
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--once", action="store_true", help="run due subscriptions once and exit")
+    parser.add_argument("--subscriptions", default=str(SUBSCRIPTIONS_PATH))
+    parser.add_argument("--poll-seconds", type=int, default=int(os.getenv("SCHEDULER_POLL_SECONDS", 60)))
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+    scheduler = NotificationScheduler(subscriptions_path=args.subscriptions, poll_seconds=args.poll_seconds)
+    if args.once:
+        print(json.dumps(scheduler.run_pending(), indent=4))
+    else:
+        scheduler.start()
+        try:
+            while True:
+                time.sleep(3600)
+        except KeyboardInterrupt:
+            scheduler.stop()
@@ -9,6 +9,7 @@ import time
 from datetime import datetime
 from wardrobe_tracker import WardrobeTracker
 from wardrobe_notifier import EmailNotifier
+from notification_scheduler import add_subscription
 
 def notifications_tab(tracker: WardrobeTracker, email_notifier: EmailNotifier):
     """
@@ -65,8 +66,8 @@ def notifications_tab(tracker: WardrobeTracker, email_notifier: EmailNotifier):
                                 with st.expander("📧 Preview Generated Email"):
                                     st.text(email_content)
                                 
-                                # Send email
-                                success = email_notifier.send_notification(recipient_email, unworn_items)
+                                # Send the previewed content instead of generating it again
+                                success = email_notifier.send_notification(recipient_email, unworn_items, email_content)
                                 progress_bar.progress(100)
                                 
                                 if success:
@@ -88,6 +89,15 @@ def notifications_tab(tracker: WardrobeTracker, email_notifier: EmailNotifier):
             st.success("All items in your wardrobe are being used regularly!")
     
     with col2:
+        # Reminders are sent by notification_scheduler without this page being open
+        reminder_time = st.time_input("Daily reminder time", value=datetime.strptime("09:00", "%H:%M").time())
+        if st.button("📅 Schedule Daily Reminders", use_container_width=True):
+            if not recipient_email:
+                st.error("Please enter your email address first")
+            else:
+                add_subscription(recipient_email, tracker.db_path, daily_at=reminder_time.strftime("%H:%M"))
+                st.success(f"Reminders scheduled daily at {reminder_time.strftime('%H:%M')}")
+
         if st.button("Send Test Email", use_container_width=True):
             if not recipient_email:
                 st.error("Please enter your email address first")
@@ -99,8 +109,9 @@ def notifications_tab(tracker: WardrobeTracker, email_notifier: EmailNotifier):
                         "last_worn": datetime.now().isoformat(),
                         "wear_count": 1
                     }]
-                    success = email_notifier.send_notification(recipient_email, test_items)
+                    test_content = email_notifier.generate_personalized_content(test_items)
+                    success = email_notifier.send_notification(recipient_email, test_items, test_content)
                     if success:
                         st.success("Test email sent!")
                         with st.expander("📧 Test Email Preview"):
-                            st.text(email_notifier.generate_personalized_content(test_items))
\ No newline at end of file
+                            st.text(test_content)
\ No newline at end of file
@@ -0,0 +1,209 @@
+"""
+outfit_retrieval.py
+
+Local candidate pre-selection for SambaFit. Items are ranked against the tokens
+extracted by model1_tokenize_prompt (weather, occasion, additional preferences)
+so model2_select_items only receives the top-k items per clothing type as
+compact summaries instead of every item's full ai_analysis.
+"""
+
+import json
+import logging
+import re
+import zlib
+from collections import defaultdict
+
+import numpy as np
+
+from item_attributes import item_attributes, compact_summary
+from color_index import color_names_in, palette_from_color_name
+
+# Lexicons used by the structured filters: token keyword -> attribute keywords
+WEATHER_RULES = {
+    "cold": {
+        "seasons": ["winter", "fall", "autumn", "all-season"],
+        "prefer": ["jacket", "coat", "hoodie", "sweater", "sweatshirt", "pants", "jeans", "boots", "wool", "fleece", "knit", "long"],
+        "avoid": ["shorts", "tank", "sandals", "linen", "sleeveless"],
+    },
+    "warm": {
+        "seasons": ["summer", "spring", "all-season"],
+        "prefer": ["t-shirt", "shirt", "shorts", "dress", "skirt", "linen", "cotton", "sandals", "short sleeve", "lightweight"],
+        "avoid": ["coat", "wool", "fleece", "puffer", "parka", "sweater", "winter"],
+    },
+    "rainy": {
+        "seasons": ["fall", "spring", "all-season"],
+        "prefer": ["jacket", "raincoat", "waterproof", "boots", "hood", "nylon"],
+        "avoid": ["suede", "sandals", "linen"],
+    },
+}
+WEATHER_ALIASES = {
+    "cold": ["cold", "chilly", "freezing", "winter", "wintry", "snow", "snowy", "cool", "frosty"],
+    "warm": ["warm", "hot", "sunny", "summer", "humid", "heat"],
+    "rainy": ["rain", "rainy", "wet", "drizzle", "storm", "stormy", "showers"],
+}
+
+OCCASION_RULES = {
+    "formal": ["formal", "office", "business", "professional", "suit", "blazer", "dress shirt", "tailored", "wedding", "interview", "meeting"],
+    "athletic": ["gym", "athletic", "sport", "workout", "running", "activewear", "training", "sneakers"],
+    "casual": ["casual", "everyday", "weekend", "outing", "relaxed", "streetwear", "travel", "hangout"],
+    "party": ["party", "night out", "evening", "club", "date", "celebration"],
+}
+
+# Preference phrasing that asks for pieces that go with a colour rather than of that colour
+PAIRING_PHRASES = ["go with", "goes with", "match", "matching", "pair with", "complement"]
+
+EMBEDDING_DIM = 256
+
+
+def estimate_tokens(text):
+    """Rough token count (~4 characters per token for Llama-style tokenizers)"""
+    return max(1, len(text) // 4) if text else 0
+
+
+def _words(text):
+    return re.findall(r"[a-z][a-z\-']+", text.lower())
+
+
+def _mentions(text, phrase):
+    """Whether text contains phrase as whole words ("suit" is not in "suitable"); a plural ending is allowed"""
+    return re.search(rf"(?<![a-z]){re.escape(phrase)}(?:e?s)?(?![a-z])", text) is not None
+
+
+def hashed_embedding(texts, dim=EMBEDDING_DIM):
+    """Cheap local embedding: L2-normalised hashed bag of words and bigrams"""
+    vectors = np.zeros((len(texts), dim), dtype=np.float32)
+    for row, text in enumerate(texts):
+        words = _words(text)
+        for token in words + [f"{a} {b}" for a, b in zip(words, words[1:])]:
+            vectors[row, zlib.crc32(token.encode()) % dim] += 1.0
+    norms = np.linalg.norm(vectors, axis=1, keepdims=True)
+    return vectors / np.maximum(norms, 1e-7)
+
+
+def _resolve(token_value, aliases):
+    """Map a free-text token (e.g. 'chilly') to the canonical rule keys it mentions"""
+    text = (token_value or "").lower()
+    return [key for key, words in aliases.items() if any(_mentions(text, w) for w in words)]
+
+
+class OutfitRetriever:
+    """Ranks wardrobe items locally so the 70B prompt only carries likely candidates"""
+
+    def __init__(self, top_k_per_type=3, embed_fn=None, embedding_weight=1.0, color_index=None, color_weight=1.5):
+        self.top_k_per_type = top_k_per_type
+        # embed_fn: optional callable(list[str]) -> list[vector], e.g. HuggingFaceEmbeddings.embed_documents
+        self.embed_fn = embed_fn
+        self.embedding_weight = embedding_weight
+        # color_index: optional ColorIndex over the same items, used when the prompt names colours
+        self.color_index = color_index
+        self.color_weight = color_weight
+
+    def _embed(self, texts):
+        if self.embed_fn is not None:
+            try:
+                vectors = np.asarray(self.embed_fn(texts), dtype=np.float32)
+                norms = np.linalg.norm(vectors, axis=1, keepdims=True)
+                return vectors / np.maximum(norms, 1e-7)
+            except Exception as e:
+                logging.warning(f"Embedding model failed, using hashed embeddings: {e}")
+        return hashed_embedding(texts)
+
+    def _color_scores(self, tokens):
+        """Per-item colour score ({item_id: score}) for colours named in the tokens"""
+        if self.color_index is None or not len(self.color_index):
+            return {}
+        text = " ".join(json.dumps(v) if isinstance(v, (list, dict)) else str(v) for v in tokens.values() if v).lower()
+        names = color_names_in(text)
+        if not names:
+            return {}
+        palette = [entry for name in names for entry in palette_from_color_name(name)]
+        if any(_mentions(text, phrase) for phrase in PAIRING_PHRASES):
+            scores = self.color_index.harmony_scores(palette)
+        else:
+            scores = self.color_index.color_similarity(palette)
+        return dict(zip(self.color_index.ids, scores.tolist()))
+
+    def _structured_score(self, attributes, summary, tokens):
+        """Score one item against weather/occasion/preference tokens; None means filtered out"""
+        text = summary.lower()
+        text_words = set(_words(text))
+        season = str(attributes.get('season') or '').lower()
+        score = 0.0
+
+        for weather in _resolve(tokens.get('weather'), WEATHER_ALIASES):
+            rule = WEATHER_RULES[weather]
+            if any(_mentions(text, word) for word in rule["avoid"]):
+                return None
+            if season and any(_mentions(season, s) for s in rule["seasons"]):
+                score += 1.0
+            score += 0.5 * sum(_mentions(text, word) for word in rule["prefer"])
+
+        occasion = (tokens.get('occasion') or '').lower()
+        for key in _resolve(occasion, OCCASION_RULES):
+            score += 0.75 * sum(_mentions(text, word) for word in OCCASION_RULES[key])
+        score += 0.5 * sum(word in text_words for word in _words(occasion) if len(word) > 3)
+
+        preferences = tokens.get('additional_preferences') or ''
+        if isinstance(preferences, (list, dict)):
+            preferences = json.dumps(preferences)
+        score += 0.75 * sum(word in text_words for word in _words(preferences) if len(word) > 2)
+        return score
+
+    def select_candidates(self, items, tokens):
+        """
+        Rank items for the given tokens and keep the best top_k_per_type per clothing type.
+
+        Args:
+            items (list): Wardrobe items as stored in tracker.database['items'].
+            tokens (dict): Output of model1_tokenize_prompt.
+
+        Returns:
+            tuple: (candidates, stats) where candidates is a list of {item_id: summary}
+            dicts in the shape model2_select_items expects, and stats records the
+            prompt token counts before and after pre-selection.
+        """
+        if not items:
+            return [], {"wardrobe_items": 0, "candidates": 0, "prompt_tokens_before": 0, "prompt_tokens_after": 0}
+
+        records = []
+        for item in items:
+            attributes = item_attributes(item)
+            records.append((item, attributes, compact_summary(attributes) or attributes['type']))
+
+        query = " ".join(str(v) for v in tokens.values() if v)
+        vectors = self._embed([query] + [summary for _, _, summary in records])
+        similarities = vectors[1:] @ vectors[0]
+
+        color_scores = self._color_scores(tokens)
+
+        groups = defaultdict(list)
+        filtered = defaultdict(list)
+        for (item, attributes, summary), similarity in zip(records, similarities):
+            group = str(attributes['category']).lower()
+            structured = self._structured_score(attributes, summary, tokens)
+            if structured is None:
+                filtered[group].append((float(similarity), item, summary))
+                continue
+            score = structured + self.embedding_weight * float(similarity)
+            score += self.color_weight * color_scores.get(item['id'], 0.0)
+            groups[group].append((score, item, summary))
+
+        # If the filters reject everything, fall back to embedding similarity alone
+        if not groups:
+            groups = filtered
+
+        candidates = []
+        for group in sorted(groups):
+            ranked = sorted(groups[group], key=lambda entry: entry[0], reverse=True)
+            for _, item, summary in ranked[:self.top_k_per_type]:
+                candidates.append({item['id']: summary})
+
+        full_database = [{item['id']: item.get('ai_analysis')} for item in items]
+        stats = {
+            "wardrobe_items": len(items),
+            "candidates": len(candidates),
+            "prompt_tokens_before": estimate_tokens(json.dumps(full_database)),
+            "prompt_tokens_after": estimate_tokens(json.dumps(candidates)),
+        }
+        logging.info(f"SambaFit pre-selection: {stats}")
+        return candidates, stats
@@ -10,6 +10,7 @@ Dependencies:
 - datetime
 - decide_preference (from main application)
 - initialize_database (from main application)
+- WardrobeTracker (for the precomputed wear statistics)
 
 Note: This module requires access to the main application's initialize_database function
 and the decide_preference function to work properly.
@@ -19,43 +20,28 @@ import streamlit as st
 import json
 from datetime import datetime
 from decider import decide_preference
-def preferences_tab():
+def preferences_tab(tracker):
     """
     Implements the preferences analysis tab in the Vestique wardrobe assistant.
     Analyzes wardrobe data to determine user preferences and display insights.
 
+    Args:
+        tracker: WardrobeTracker instance whose wear statistics give the most/least worn items
+
     Dependencies:
         - decide_preference function must be imported from the main application
         - initialize_database function must be imported from the main application
-        - Requires access to clothing_database.json
 
     Returns:
         None. Updates Streamlit UI directly.
     """
     try:
-        with open('clothing_database.json', 'r') as file:
-            data = json.load(file)
-            contents = data.get('items', [])
-
-        if not contents:
+        if not tracker.database.get('items'):
             st.info("Your wardrobe is empty! Add some items to get personalized insights.")
             return
 
-        # Find items with min and max wear count
-        min_view = float('inf')
-        max_view = -1
-        smallest_des = None
-        largest_des = None
-
-        for item in contents:
-            wear_count = item.get('wear_count', 0)
-            if 'ai_analysis' in item:
-                if wear_count < min_view:
-                    smallest_des = item['ai_analysis']
-                    min_view = wear_count
-                if wear_count > max_view:
-                    largest_des = item['ai_analysis']
-                    max_view = wear_count
+        # Most and least worn items come straight from the wear statistics
+        largest_des, smallest_des = tracker.get_wear_extremes()
 
         if not smallest_des or not largest_des:
             st.warning("Not enough analyzed items to generate insights.")
@@ -3,7 +3,6 @@ import os
 from typing import Dict, List, Optional
 import streamlit as st
 from pathlib import Path
-import requests
 import json
 from langchain_community.document_loaders import PyPDFLoader
 from langchain_community.embeddings import HuggingFaceEmbeddings
@@ -12,6 +11,8 @@ from transformers import AutoModelForSequenceClassification, AutoTokenizer
 from langchain.text_splitter import RecursiveCharacterTextSplitter
 import torch
 import sys
+from metrics import timed, span, increment
+from llm_client import post_chat_completion
 # Configure logging
 logging.basicConfig(
     level=logging.INFO,
@@ -24,7 +25,6 @@ class StyleAdvisor:
     """Style advisor with RAG capabilities for fashion recommendations"""
     def __init__(self, sambanova_api_key: str):
         self.api_key = sambanova_api_key
-        self.api_url = 'https://api.sambanova.ai/v1/chat/completions'
         self.headers = {
             "Authorization": f"Bearer {self.api_key}",
             "Content-Type": "application/json"
@@ -85,6 +85,7 @@ class StyleAdvisor:
             logging.error(f"Error in vector store initialization: {e}")
             self.vector_store = None
 
+    @timed("style_advice.total")
     def get_style_advice(self, item_description: Dict | str) -> Dict[str, str]:
         """Get style advice using both style guide and color theory sources"""
         try:
@@ -130,6 +131,7 @@ class StyleAdvisor:
             fit = style_info.get('fit', 'Unknown')
             style = style_info.get('style', 'Unknown')
             material = item_description.get('material', 'Unknown')
+            wardrobe_pairings = item_description.get('wardrobe_pairings') or []
             
             logging.info(f"""
             Extracted details:
@@ -161,7 +163,8 @@ class StyleAdvisor:
             for queries in [style_queries, color_queries]:
                 for query_type, query in queries.items():
                     if self.vector_store:
-                        docs = self.vector_store.similarity_search(query, k=2)
+                        with span("style_advice.retrieval"):
+                            docs = self.vector_store.similarity_search(query, k=2)
                         for doc in docs:
                             context = doc.page_content
                             source = doc.metadata.get('source', 'Unknown source')
@@ -197,6 +200,7 @@ class StyleAdvisor:
     - Fit: {fit}
     - Material: {material}
     - Brand: {brand}
+    - Pieces in the user's wardrobe that match its colours: {', '.join(wardrobe_pairings) if wardrobe_pairings else 'None'}
 
     Title: Styling Advice for {name}
 
@@ -205,7 +209,7 @@ class StyleAdvisor:
     - Pattern and texture combinations that work with {material}
 
     2. Complete Outfit Ideas:
-    - Detailed outfit combinations using this {item_type}
+    - Detailed outfit combinations using this {item_type}, built from the matching wardrobe pieces where possible
     - How to style it for different occasions
 
     3. Occasions & Settings:
@@ -222,12 +226,8 @@ class StyleAdvisor:
                 "temperature": 0.3
             }
 
-            response = requests.post(
-                self.api_url,
-                headers=self.headers,
-                json=payload,
-                timeout=30
-            )
+            with span("style_advice.llm"):
+                response = post_chat_completion(payload, "style_advisor.advice", headers=self.headers, timeout=30)
 
             if response.status_code == 200:
                 content = response.json()['choices'][0]['message']['content']
@@ -240,6 +240,7 @@ class StyleAdvisor:
 
         except Exception as e:
             logging.error(f"Error getting style advice: {e}")
+            increment("style_advice_failures")
             return {
                 "styling_tips": "Unable to provide style advice at this time.",
                 "sources": []
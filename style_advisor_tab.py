@@ -117,6 +117,14 @@ def style_advisor_tab(tracker):
                         'use_case': ai_data.get('use_case', [])
                     }
 
+                    # Pieces from other categories that go with this item's colours, found locally
+                    pairings = tracker.color_index().complementary(
+                        selected_item, k=4, exclude_category=selected_item.get('type')
+                    )
+                    item_description['wardrobe_pairings'] = [
+                        pairing.get('name', pairing['type']) for pairing, _ in pairings
+                    ]
+
                     # Create display grid
                     col1, col2 = st.columns([1, 2])
 
@@ -137,6 +145,16 @@ def style_advisor_tab(tracker):
                                 else:
                                     st.markdown(f"- {key}: {value}")
 
+                        if pairings:
+                            st.markdown("**Goes well with:**")
+                            pairing_cols = st.columns(len(pairings))
+                            for col, (pairing, score) in zip(pairing_cols, pairings):
+                                with col:
+                                    pairing_image = tracker.base64_to_image(pairing['image'])
+                                    if pairing_image:
+                                        st.image(pairing_image, use_column_width=True)
+                                    st.caption(f"{pairing.get('name', pairing['type'])} ({score:.0%})")
+
                     with col2:
                         with st.spinner("Getting style advice..."):
                             # Get style advice using the enhanced item description
@@ -0,0 +1,244 @@
+"""
+synthetic_wardrobe.py
+
+Reproducible synthetic wardrobes for load testing. Generates a tracker
+database of any size (items, outfits and listings) with multiple reference
+views per item, base64 JPEG images of a garment silhouette, colour histograms
+computed from those images the way FeatureExtractor does, and CNN-like
+features: non-negative, heavy-tailed vectors clustered by category and item,
+so views of one item are close and items of one category share structure.
+Captures for process_image benchmarks (re-captures of stored items and
+unseen items) are generated from the same model.
+
+Usage:
+    python synthetic_wardrobe.py --items 10000 --output bench/clothing_database.json
+"""
+
+import argparse
+import base64
+import json
+import random
+from datetime import datetime, timedelta
+from io import BytesIO
+from pathlib import Path
+
+import cv2
+import numpy as np
+from PIL import Image, ImageDraw
+
+from email_templates import default_suggestion, render_listing
+from feature_schema import FEATURE_VERSION
+from image_hash import fingerprint
+from item_attributes import item_attributes
+from listing_content import content_record
+from match_index import CNN_DIM, OUTFIT
+
+FEATURE_WEIGHTS = [0.7, 0.3]
+INFO_KEY = "synthetic_features"
+
+CATEGORIES = ["T-Shirt", "Hoodie", "Jacket", "Pants", "Shorts", "Dress", "Skirt", "Shoes", "Hat", "Accessory"]
+COLORS = {
+    "black": (25, 25, 28), "white": (238, 236, 230), "navy": (30, 40, 85), "grey": (128, 128, 130),
+    "red": (180, 35, 40), "olive": (105, 110, 55), "beige": (215, 195, 160), "burgundy": (115, 30, 45),
+    "blue": (50, 95, 170), "green": (45, 120, 70), "brown": (110, 75, 45), "pink": (225, 150, 170),
+}
+MATERIALS = ["cotton", "denim", "wool", "polyester", "linen", "leather", "fleece"]
+FITS = ["slim", "regular", "relaxed", "oversized"]
+STYLES = ["casual", "smart casual", "formal", "sporty", "streetwear"]
+SEASONS = ["summer", "winter", "spring/fall", "all-season"]
+USE_CASES = ["everyday", "work", "weekend", "date night", "gym", "travel", "party"]
+
+# Silhouettes as polygons in a unit box, drawn in the item colour
+SHAPES = {
+    "top": [(0.2, 0.15), (0.8, 0.15), (0.95, 0.35), (0.8, 0.4), (0.78, 0.9), (0.22, 0.9), (0.2, 0.4), (0.05, 0.35)],
+    "bottom": [(0.25, 0.1), (0.75, 0.1), (0.8, 0.92), (0.56, 0.92), (0.5, 0.4), (0.44, 0.92), (0.2, 0.92)],
+    "dress": [(0.35, 0.08), (0.65, 0.08), (0.7, 0.4), (0.88, 0.92), (0.12, 0.92), (0.3, 0.4)],
+    "small": [(0.25, 0.35), (0.75, 0.35), (0.85, 0.65), (0.15, 0.65)],
+}
+CATEGORY_SHAPES = {"T-Shirt": "top", "Hoodie": "top", "Jacket": "top", "Pants": "bottom", "Shorts": "bottom",
+                   "Dress": "dress", "Skirt": "dress", "Shoes": "small", "Hat": "small", "Accessory": "small",
+                   OUTFIT: "dress"}
+
+
+def color_features(img_np):
+    """RGB and HSV histograms (6 x 32 bins, L2-normalised) as in FeatureExtractor"""
+    features = []
+    hsv = cv2.cvtColor(img_np, cv2.COLOR_RGB2HSV)
+    for source in (img_np, hsv):
+        for channel in range(3):
+            hist = cv2.calcHist([source], [channel], None, [32], [0, 256])
+            features.extend(cv2.normalize(hist, hist).flatten())
+    return np.array(features, dtype=np.float32)
+
+
+class WardrobeGenerator:
+    """Seeded generator of items, their views and captures"""
+
+    def __init__(self, seed=0, image_side=256, views=(1, 3), jpeg_quality=85):
+        self.rng = np.random.default_rng(seed)
+        self.random = random.Random(seed)
+        self.image_side = image_side
+        self.views = views
+        self.jpeg_quality = jpeg_quality
+        # Shared structure of EfficientNet pooled features per category (post-SiLU: mostly small, some large)
+        self.centroids = {c: self.rng.gamma(0.6, 0.5, CNN_DIM).astype(np.float32) for c in CATEGORIES + [OUTFIT]}
+        # Fabric texture and sensor noise, so images compress like photos; drawn once and reused
+        self.size = (int(image_side * 0.75), image_side)
+        self.noise = [self.rng.normal(0, 7, (self.size[1], self.size[0], 3)).astype(np.int16) for _ in range(8)]
+
+    def _item_cnn(self, category):
+        own = self.rng.gamma(0.6, 0.5, CNN_DIM).astype(np.float32)
+        return 0.5 * self.centroids[category] + 0.5 * own
+
+    def _view_cnn(self, item_cnn, noise=0.3):
+        jitter = self.rng.lognormal(0.0, noise, CNN_DIM).astype(np.float32)
+        return np.maximum(item_cnn * jitter + self.rng.normal(0, 0.02, CNN_DIM).astype(np.float32), -0.05)
+
+    def _image(self, category, rgb, background, angle=0.0, shift=(0.0, 0.0), light=1.0):
+        size = self.size
+        image = Image.new("RGB", size, background)
+        draw = ImageDraw.Draw(image)
+        points = [((x + shift[0]) * size[0], (y + shift[1]) * size[1]) for x, y in SHAPES[CATEGORY_SHAPES[category]]]
+        draw.polygon(points, fill=tuple(int(min(255, c * light)) for c in rgb))
+        image = image.rotate(angle, fillcolor=background)
+        noise = self.noise[int(self.rng.integers(len(self.noise)))]
+        return Image.fromarray(np.clip(np.asarray(image, dtype=np.int16) + noise, 0, 255).astype(np.uint8))
+
+    def _encode(self, image):
+        buffer = BytesIO()
+        image.save(buffer, format="JPEG", quality=self.jpeg_quality)
+        return base64.b64encode(buffer.getvalue()).decode()
+
+    def _features(self, cnn, image):
+        return np.concatenate([cnn * FEATURE_WEIGHTS[0], color_features(np.asarray(image)) * FEATURE_WEIGHTS[1]])
+
+    def _analysis(self, category, color, secondary):
+        analysis = {
+            "type": category.lower(),
+            "color": {"primary": color, "secondary": secondary},
+            "material": self.random.choice(MATERIALS),
+            "fit_and_style": {"fit": self.random.choice(FITS), "style": self.random.choice(STYLES)},
+            "season": self.random.choice(SEASONS),
+            "use_case": self.random.sample(USE_CASES, 2),
+            "condition": self.random.choice(["new", "like new", "good", "worn"]),
+        }
+        return "```json\n" + json.dumps(analysis, indent=2) + "\n```"
+
+    def _pose(self):
+        return {"angle": float(self.rng.normal(0, 6)), "shift": tuple(self.rng.normal(0, 0.03, 2)),
+                "light": float(self.rng.uniform(0.85, 1.15))}
+
+    def item(self, item_id, category, now=None):
+        """One stored item with 1..n reference views; the generator keeps its latent for captures"""
+        now = now or datetime.now()
+        color = self.random.choice(list(COLORS))
+        secondary = self.random.sample([c for c in COLORS if c != color], self.random.randint(0, 2))
+        background = tuple(int(v) for v in self.rng.integers(170, 250, 3))
+        item_cnn = self._item_cnn(category)
+
+        images, features, hashes, colors = [], [], [], []
+        for _ in range(self.random.randint(*self.views)):
+            image = self._image(category, COLORS[color], background, **self._pose())
+            images.append(self._encode(image))
+            features.append(self._features(self._view_cnn(item_cnn), image).tolist())
+            value, signature = fingerprint(image)
+            hashes.append(value)
+            colors.append(signature)
+        # Stored palettes are [[r, g, b, weight], ...] by weight; the silhouette covers about 40% of the frame
+        palette = sorted([[*COLORS[color], 0.4], [*background, 0.6]], key=lambda entry: entry[3], reverse=True)
+
+        days_ago = float(self.rng.exponential(20))
+        item = {
+            "id": item_id,
+            "type": category,
+            "name": f"{color.title()} {category}",
+            "reference_images": images,
+            "reference_features": features,
+            "feature_versions": [FEATURE_VERSION] * len(features),
+            "view_hashes": hashes,
+            "view_colors": colors,
+            "last_worn": (now - timedelta(days=days_ago)).isoformat(),
+            "image": images[0],
+            "features": features[0],
+            "feature_version": FEATURE_VERSION,
+            "reset_period": 7,
+            "wear_count": int(self.rng.integers(1, 40)),
+            "ai_analysis": self._analysis(category, color, secondary),
+            "color_palette": palette,
+        }
+        item["_latent"] = (item_cnn, COLORS[color], background)
+        return item
+
+    def capture(self, item=None, category=None):
+        """
+        A camera capture as a PIL image: a new view of a stored item (its latent is
+        kept on the generated item) or of an unseen item of the given category. The
+        features a real extractor would produce are attached in image.info[INFO_KEY].
+        """
+        if item is not None:
+            item_cnn, rgb, background = item["_latent"]
+            category = item["type"]
+        else:
+            category = category or self.random.choice(CATEGORIES)
+            item_cnn = self._item_cnn(category)
+            rgb = COLORS[self.random.choice(list(COLORS))]
+            background = tuple(int(v) for v in self.rng.integers(170, 250, 3))
+        image = self._image(category, rgb, background, **self._pose())
+        image.info[INFO_KEY] = self._features(self._view_cnn(item_cnn), image)
+        return image
+
+
+def generate_wardrobe(n_items=1000, n_outfits=None, listed_fraction=0.05, seed=0, image_side=256, views=(1, 3)):
+    """
+    A tracker database with n_items items (n_outfits defaults to a tenth of that),
+    of which listed_fraction are in listings.
+
+    Returns:
+        tuple: (database, generator); generated items keep a "_latent" key (dropped
+        by write_wardrobe) so generator.capture(item) can re-photograph them.
+    """
+    generator = WardrobeGenerator(seed, image_side, views)
+    now = datetime.now()
+    database = {"items": [], "outfits": [], "listings": []}
+    for item_id in range(n_items):
+        item = generator.item(item_id, generator.random.choice(CATEGORIES), now)
+        if generator.random.random() < listed_fraction:
+            item.update(date_listed=now.isoformat(), original_collection="items")
+            item["listing_content"] = content_record(render_listing(item, default_suggestion(item_attributes(item))))
+            database["listings"].append(item)
+        else:
+            database["items"].append(item)
+    for outfit_id in range(n_items // 10 if n_outfits is None else n_outfits):
+        outfit = generator.item(outfit_id, OUTFIT, now)
+        outfit["name"] = f"Outfit {outfit_id}"
+        database["outfits"].append(outfit)
+    return database, generator
+
+
+def without_latents(database):
+    """Copy of a generated database as the tracker stores it"""
+    return {collection: [{k: v for k, v in item.items() if k != "_latent"} for item in items]
+            for collection, items in database.items()}
+
+
+def write_wardrobe(database, path):
+    path = Path(path)
+    path.parent.mkdir(parents=True, exist_ok=True)
+    with open(path, "w") as f:
+        json.dump(without_latents(database), f)
+    return path
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--items", type=int, default=1000)
+    parser.add_argument("--outfits", type=int, default=None)
+    parser.add_argument("--listed-fraction", type=float, default=0.05)
+    parser.add_argument("--views", type=int, nargs=2, default=[1, 3], metavar=("MIN", "MAX"))
+    parser.add_argument("--image-side", type=int, default=256)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--output", default="bench/clothing_database.json")
+    args = parser.parse_args()
+    db, _ = generate_wardrobe(args.items, args.outfits, args.listed_fraction, args.seed, args.image_side, tuple(args.views))
+    path = write_wardrobe(db, args.output)
+    print(f"Wrote {sum(len(v) for v in db.values())} entries to {path} ({path.stat().st_size / 1e6:.1f} MB)")
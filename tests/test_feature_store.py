@@ -0,0 +1,90 @@
+import json
+
+import numpy as np
+import pytest
+
+from feature_store import (MIN_PCA_SAMPLES, EncodingCache, FeatureStorageError, FullPrecisionStore, compact_database,
+                           expand_database, load_codec, make_codec)
+
+DIM = 1472
+
+
+def feature_vectors(rng, n):
+    """CNN-like vectors: most variance in a few hundred decaying directions"""
+    rank = 400
+    basis = np.linalg.qr(np.random.default_rng(1).normal(size=(DIM, rank)))[0].T
+    spectrum = np.exp(-np.arange(rank) / 60.0)
+    return (rng.normal(size=(n, rank)) * spectrum) @ basis + rng.normal(scale=0.002, size=(n, DIM)) + 0.3
+
+
+def add_items(database, vectors):
+    for vector in vectors:
+        database["items"].append({"id": len(database["items"]), "features": vector.tolist(),
+                                  "reference_features": [vector.tolist()]})
+
+
+def save_and_load(database, codec, pca_path, full_store=None, cache=None):
+    stored = json.loads(json.dumps(compact_database(database, codec, full_store, cache)))
+    if full_store is not None:
+        full_store.flush()
+    return expand_database(stored, load_codec(stored["feature_storage"], pca_path), full_store, cache)
+
+
+def test_top1_recall_after_wardrobe_grows(tmp_path):
+    # No side file: whatever the codes lose is lost for good
+    rng = np.random.default_rng(0)
+    pca_path = tmp_path / "feature_pca.npz"
+    database = {"items": [], "outfits": [], "listings": []}
+    exact, codec = [], None
+    for size, mode, n_fit in ((20, "float16", None), (300, "pca", 300), (700, "pca", 700)):
+        vectors = feature_vectors(rng, size - len(exact))
+        exact.extend(vectors)
+        add_items(database, vectors)
+        codec = make_codec("pca", database, pca_path, current=codec)
+        assert codec.mode == mode and getattr(codec, "n_fit", None) == n_fit
+        database = save_and_load(database, codec, pca_path)
+
+    stored = np.array([item["features"] for item in database["items"]], dtype=np.float32)
+    stored /= np.linalg.norm(stored, axis=1, keepdims=True)
+    exact = np.array(exact)
+    queries = exact + rng.normal(scale=0.05 * exact.std(), size=exact.shape)
+    hits = int((np.argmax(queries @ stored.T, axis=1) == np.arange(len(exact))).sum())
+    assert hits >= 0.98 * len(exact)
+
+
+def test_missing_basis_reads_the_side_file_or_fails(tmp_path):
+    rng = np.random.default_rng(0)
+    pca_path = tmp_path / "feature_pca.npz"
+    database = {"items": [], "outfits": [], "listings": []}
+    add_items(database, feature_vectors(rng, MIN_PCA_SAMPLES))
+    codec = make_codec("pca", database, pca_path)
+    full_store = FullPrecisionStore(tmp_path / "features_full.bin")
+    stored = json.dumps(compact_database(database, codec, full_store))
+    full_store.flush()
+    for path in tmp_path.glob("feature_pca*"):
+        path.unlink()
+
+    loaded = expand_database(json.loads(stored), load_codec(json.loads(stored)["feature_storage"], pca_path),
+                             FullPrecisionStore(tmp_path / "features_full.bin"))
+    assert np.allclose(loaded["items"][5]["features"], database["items"][5]["features"])
+    with pytest.raises(FeatureStorageError):
+        expand_database(json.loads(stored), None)
+
+
+def test_side_file_keeps_only_live_vectors(tmp_path):
+    rng = np.random.default_rng(0)
+    database = {"items": [], "outfits": [], "listings": []}
+    add_items(database, feature_vectors(rng, 10))
+    codec = make_codec("float16")
+    full_store, cache = FullPrecisionStore(tmp_path / "features_full.bin"), EncodingCache()
+    database = save_and_load(database, codec, None, full_store, cache)
+
+    database["items"] = database["items"][:4]
+    save_and_load(database, codec, None, full_store, cache)
+    assert full_store.compact(cache.digests()) == 6
+
+    reopened = FullPrecisionStore(tmp_path / "features_full.bin")
+    assert reopened.data_path.stat().st_size == 4 * DIM * 4
+    assert sorted(p.name for p in tmp_path.glob("features_full*.bin")) == [reopened.data_path.name]
+    loaded = save_and_load(database, codec, None, reopened)
+    assert loaded["items"][3]["features"] == database["items"][3]["features"]
@@ -0,0 +1,49 @@
+import base64
+from io import BytesIO
+
+from PIL import Image, ImageDraw
+
+from image_hash import HashIndex, dhash, fingerprint
+
+
+def tee(color):
+    """A tee of one cut on a light background, shaded so its hash has structure"""
+    image = Image.new("RGB", (256, 256), (235, 235, 230))
+    draw = ImageDraw.Draw(image)
+    draw.polygon([(60, 40), (196, 40), (240, 90), (200, 110), (200, 230), (56, 230), (56, 110), (16, 90)], fill=color)
+    draw.rectangle([100, 40, 156, 60], fill=(200, 200, 195))
+    for y in range(120, 230, 24):
+        draw.line([(56, y), (200, y + 10)], fill=tuple(min(255, c + 40) for c in color), width=4)
+    return image
+
+
+def jpeg_base64(image, quality=85):
+    buffer = BytesIO()
+    image.save(buffer, format="JPEG", quality=quality)
+    return base64.b64encode(buffer.getvalue()).decode()
+
+
+def test_hash_hit_needs_matching_colours():
+    black, navy = tee((15, 15, 15)), tee((20, 30, 95))
+    stored = jpeg_base64(black)
+    item = {"id": 0, "image": stored, "reference_images": [stored]}
+    index = HashIndex({"items": [item]})
+    assert dhash(navy) == dhash(black)
+    # Backfilled views hash like a capture of the same photo
+    assert index.computed == 1
+    assert item["view_hashes"] == [dhash(Image.open(BytesIO(base64.b64decode(stored))))]
+
+    reupload = Image.open(BytesIO(base64.b64decode(jpeg_base64(black, quality=60))))
+    value, colors = fingerprint(reupload)
+    assert index.search(value, colors=colors)["item"]["id"] == 0
+    value, colors = fingerprint(navy)
+    assert index.search(value, colors=colors) is None
+
+
+def test_hits_without_a_stored_colour_signature_are_rejected():
+    black = tee((15, 15, 15))
+    value, colors = fingerprint(black)
+    index = HashIndex({"items": [{"id": 0, "view_hashes": [value], "view_colors": [None],
+                                  "reference_images": [jpeg_base64(black)]}]})
+    assert index.search(value, colors=colors) is None
+    assert index.search(value)["item"]["id"] == 0
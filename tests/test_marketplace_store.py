@@ -0,0 +1,30 @@
+import json
+
+from marketplace_store import LEGACY_OWNER, MarketplaceStore
+
+
+def test_legacy_import_skips_repeated_ids(tmp_path):
+    legacy = tmp_path / "market_place_database.json"
+    items = [{"id": 0, "type": "Jacket", "price": 40}, {"id": 1, "type": "Shirt"},
+             {"id": 0, "type": "Jacket", "price": 35}, {"id": 2, "type": "Scarf", "image": "not base64!"}]
+    legacy.write_text(json.dumps({"items": items}))
+
+    store = MarketplaceStore(tmp_path / "marketplace.db", legacy_json=legacy)
+    listings, total = store.query(owner=LEGACY_OWNER, order_by="type", descending=False, with_images=False)
+    assert total == 2
+    assert [(listing["id"], listing["price"]) for listing in listings] == [(0, 40), (1, None)]
+    # Recorded as imported, so it is not retried on the next start
+    assert store.import_legacy(legacy) == 0
+
+
+def test_changed_listing_keeps_its_id(tmp_path):
+    store = MarketplaceStore(tmp_path / "marketplace.db", legacy_json=None)
+    listing = {"id": 3, "type": "Coat", "price": 60, "date_listed": "2026-10-01"}
+    store.sync_owner("alice", [listing])
+    (before,), _ = store.query(owner="alice", with_images=False)
+
+    store.sync_owner("alice", [{**listing, "price": 45}])
+    (after,), total = store.query(owner="alice", with_images=False)
+    assert total == 1 and after["listing_id"] == before["listing_id"] and after["price"] == 45
+    # A page opened before the change still claims the listing
+    assert store.claim(before["listing_id"], claimant="bob")["price"] == 45
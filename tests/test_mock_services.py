@@ -0,0 +1,64 @@
+import json
+
+import pytest
+
+from mock_services import start_in_background
+
+
+@pytest.fixture
+def mock_api(monkeypatch):
+    """Every AI path pointed at a local stand-in"""
+    server, url = start_in_background(seed=0)
+    monkeypatch.setenv("SAMBANOVA_BASE_URL", f"{url}/v1")
+    monkeypatch.setenv("SAMBANOVA_API_KEY", "test")
+    yield server
+    server.shutdown()
+    server.server_close()
+
+
+CANDIDATES = [{"3": "coat | navy | wool | regular formal | winter"},
+              {"7": "coat | black | wool | slim formal | winter"},
+              {"11": "trousers | grey | wool | tailored formal | all-season"}]
+
+
+def test_sambafit_tokenize_and_select(mock_api):
+    from SambaFit import model1_tokenize_prompt, model2_select_items
+
+    tokens = model1_tokenize_prompt("Something navy for a wedding, it's cold out")
+    assert tokens == {"weather": "cold", "occasion": "wedding", "additional_preferences": "navy"}
+    # One item per clothing type, every id from the candidates sent
+    assert model2_select_items(tokens, CANDIDATES) == [CANDIDATES[0], CANDIDATES[2]]
+
+
+def test_marketplace_preference_and_match(mock_api):
+    from decide_match import decide_match
+    from decider import decide_preference
+
+    liked, disliked, recommendation = json.loads(decide_preference("navy cotton tee", "orange satin shirt"))
+    assert isinstance(liked, list) and isinstance(disliked, list) and isinstance(recommendation, str)
+    assert decide_match(liked, disliked, ["cotton", "navy"]) in (True, False)
+
+
+def test_email_styling_suggestions(mock_api):
+    from wardrobe_notifier import EmailNotifier
+
+    suggestions = EmailNotifier().request_styling_suggestions([{"type": "Coat"}, {"type": "Shirt"}])
+    assert len(suggestions) == 2 and all(isinstance(s, str) and s for s in suggestions)
+
+
+def test_classifier_describe_json(mock_api):
+    classifier = pytest.importorskip("classifier")
+
+    content = classifier.prompt_llama("A navy cotton t-shirt with a crew neck")
+    # Parsed the way StyleAdvisor reads ai_analysis
+    assert json.loads(content.split('```json\n')[1].split('\n```')[0])["type"] == "t-shirt"
+
+
+def test_style_advice(mock_api):
+    StyleAdvisor = pytest.importorskip("style_advisor").StyleAdvisor
+
+    advisor = StyleAdvisor.__new__(StyleAdvisor)   # no embedding model or vector store
+    advisor.headers = {"Authorization": "Bearer test", "Content-Type": "application/json"}
+    advisor.vector_store = None
+    advice = advisor.get_style_advice({"type": "coat", "color": {"primary": "navy"}})
+    assert advice["styling_tips"] != "Unable to provide style advice at this time."
@@ -0,0 +1,14 @@
+from outfit_retrieval import OCCASION_RULES, WEATHER_ALIASES, OutfitRetriever, _resolve
+
+
+def test_lexicons_match_words_not_substrings():
+    assert _resolve("gym training", WEATHER_ALIASES) == []
+    assert _resolve("light showers, chilly", WEATHER_ALIASES) == ["cold", "rainy"]
+    assert _resolve("job interview", OCCASION_RULES) == ["formal"]
+
+    retriever = OutfitRetriever()
+    tokens = {"weather": None, "occasion": "formal", "additional_preferences": None}
+    suitable = retriever._structured_score({}, "Relaxed hoodie suitable for weekends", tokens)
+    suit = retriever._structured_score({}, "Navy wool suit jacket", tokens)
+    assert suitable == 0
+    assert suit > 0
@@ -0,0 +1,140 @@
+import base64
+import json
+import threading
+import time
+from io import BytesIO
+from pathlib import Path
+from types import SimpleNamespace
+
+import numpy as np
+import pytest
+from PIL import Image
+
+from feature_reembedding import start_reembedding
+from listing_content import _jobs as listing_jobs, queue_listing_content
+
+wardrobe_service = pytest.importorskip("wardrobe_service")
+
+
+class FakeTracker:
+    """WardrobeTracker without an extractor, marketplace or stored wardrobe; unloads like the real one"""
+    close = wardrobe_service.WardrobeTracker.close
+
+    def __init__(self, feature_extractor, owner, data_dir, **kwargs):
+        Path(data_dir).mkdir(parents=True, exist_ok=True)
+        self.db_path = Path(data_dir) / "clothing_database.json"
+        self.database = {"items": []}
+        self.reembedding = None
+
+    def refresh(self):
+        return 0
+
+    def release_indexes(self):
+        return False
+
+
+@pytest.fixture
+def service(tmp_path, monkeypatch):
+    monkeypatch.setattr(wardrobe_service, "WardrobeTracker", FakeTracker)
+    return wardrobe_service.WardrobeService(tmp_path, extractor_factory=lambda: None, max_trackers=2)
+
+
+def test_tenant_tokens_cannot_be_forged_or_reused_after_expiry():
+    token = wardrobe_service.sign_tenant("alice@example.com", "secret")
+    assert wardrobe_service.verify_tenant_token(token, "secret") == "alice@example.com"
+
+    body, signature = token.rsplit(".", 1)
+    forged_body = wardrobe_service.sign_tenant("bob@example.com", "other").rsplit(".", 1)[0]
+    assert wardrobe_service.verify_tenant_token(f"{forged_body}.{signature}", "secret") is None
+    assert wardrobe_service.verify_tenant_token(token, "other") is None
+    assert wardrobe_service.verify_tenant_token(token, None) is None
+    assert wardrobe_service.verify_tenant_token("alice@example.com", "secret") is None
+    expired = wardrobe_service.sign_tenant("alice@example.com", "secret", ttl_days=-1)
+    assert wardrobe_service.verify_tenant_token(expired, "secret") is None
+
+
+def test_resident_size_counts_loaded_vectors_not_the_file():
+    vector = [0.5] * 1472
+    tracker = SimpleNamespace(database={"items": [{"features": vector, "reference_features": [vector, vector],
+                                                   "image": "x" * 1000, "reference_images": ["x" * 1000]}]})
+    size = wardrobe_service.WardrobeService._resident_size(tracker)
+    assert size >= 3 * 1472 * wardrobe_service.FLOAT_BYTES + 2000
+
+
+def test_least_recently_used_idle_tenant_is_unloaded(service):
+    with service.tenant("a"):
+        for tenant_id in ("b", "c", "b", "d"):
+            with service.tenant(tenant_id):
+                pass
+        # "a" is in use, so idle tenants go first, least recently used first
+        assert list(service.trackers) == ["a", "d"]
+    with service.tenant("e"):
+        pass
+    assert list(service.trackers) == ["d", "e"]
+
+
+def test_a_tenant_is_held_by_one_request_at_a_time(service):
+    entered, release, order = threading.Event(), threading.Event(), []
+
+    def first():
+        with service.tenant("a"):
+            entered.set()
+            release.wait(5)
+            order.append("first")
+
+    def second():
+        with service.tenant("a"):
+            order.append("second")
+
+    threads = [threading.Thread(target=first), threading.Thread(target=second)]
+    threads[0].start()
+    entered.wait(5)
+    threads[1].start()
+    with service.tenant("b"):
+        order.append("other tenant")
+    time.sleep(0.1)
+    release.set()
+    for thread in threads:
+        thread.join(5)
+    assert order == ["other tenant", "first", "second"]
+
+
+def test_unloading_a_tenant_stops_and_forgets_its_jobs(service):
+    with service.tenant("a") as tracker:
+        db_path = tracker.db_path
+    buffer = BytesIO()
+    Image.new("RGB", (8, 8)).save(buffer, format="JPEG")
+    image = base64.b64encode(buffer.getvalue()).decode()
+    db_path.write_text(json.dumps({"items": [{"id": 0, "reference_images": [image, image, image],
+                                              "reference_features": [[0.0]] * 3, "feature_versions": ["old"] * 3}]}))
+    started, release = threading.Event(), threading.Event()
+
+    def extract_feature_parts(image, use_segmentation):
+        started.set()
+        release.wait(5)
+        return [1.0]
+
+    extractor = SimpleNamespace(version="new", use_segmentation=False, extract_feature_parts=extract_feature_parts,
+                                combine_features=np.asarray)
+    job = start_reembedding(db_path, extractor, ["stale"], batch_size=1, pause_seconds=0)
+    content_job = queue_listing_content(db_path, [{"id": 0, "type": "Coat", "date_listed": "2026-10-01"}],
+                                        request_fn=lambda batch: ["Wear it open"] * len(batch))
+    assert started.wait(5)
+
+    for tenant_id in ("b", "c"):
+        with service.tenant(tenant_id):
+            pass
+    assert "a" not in service.trackers
+    assert start_reembedding(db_path, extractor) is None
+    assert str(db_path.resolve()) not in listing_jobs
+    release.set()
+    job._thread.join(5)
+    # Cancelled after the batch in progress
+    assert not job.status["running"] and job.status["done"] == 1
+    # The listing worker finishes its queue, then exits
+    content_job.queue.join()
+    for _ in range(50):
+        if content_job._thread is None:
+            break
+        time.sleep(0.02)
+    assert content_job._thread is None and content_job.status["done"] == 1
@@ -0,0 +1,41 @@
+from datetime import datetime
+
+import pytest
+
+from wear_log import WearStats
+
+
+def make_item(item_id, item_type="T-Shirt", wear_count=1):
+    return {"id": item_id, "type": item_type, "wear_count": wear_count, "last_worn": datetime.now().isoformat()}
+
+
+def test_retracking_an_id_replaces_its_entry():
+    stats = WearStats()
+    stats.record_added("items", make_item(0, "Jacket", wear_count=5))
+    stats.record_added("items", make_item(0, "T-Shirt", wear_count=1))
+
+    assert stats.get("items", 0)["type"] == "T-Shirt"
+    assert stats.data["types"]["Jacket"] == {"items": 0, "wears": 0}
+    assert stats.data["types"]["T-Shirt"] == {"items": 1, "wears": 1}
+    assert stats.most_worn("items")["wear_count"] == 1
+
+
+def test_new_item_does_not_reuse_a_listed_items_id():
+    tracker_module = pytest.importorskip("wardrobe_tracker")
+    tracker = tracker_module.WardrobeTracker.__new__(tracker_module.WardrobeTracker)
+    tracker.database = {
+        "items": [make_item(1)],
+        "outfits": [],
+        "listings": [{**make_item(0, "Jacket", wear_count=5), "original_collection": "items"}],
+    }
+    tracker.stats = WearStats.from_database(tracker.database)
+
+    new_id = tracker._new_item_id("items")
+    assert new_id == 2
+    tracker.stats.record_added("items", make_item(new_id))
+
+    # The listing leaves the wardrobe; only its own stats entry goes with it
+    tracker.stats.record_removed("items", 0)
+    assert tracker.stats.get("items", new_id) is not None
+    assert tracker.stats.data["types"]["Jacket"]["items"] == 0
+    assert tracker.stats.data["types"]["T-Shirt"]["items"] == 2
@@ -0,0 +1,122 @@
+"""
+token_extraction_report.py
+
+Accuracy/latency report for the local SambaFit token extractor against the
+labelled cases in eval_data/token_extraction_cases.json and, optionally,
+against live model1_tokenize_prompt output.
+
+Usage:
+    python token_extraction_report.py [--with-llm] [--threshold 0.6]
+"""
+
+import argparse
+import json
+import statistics
+import time
+from pathlib import Path
+
+from token_extractor import TokenExtractor, WEATHER_LEXICON, OCCASION_LEXICON, _words
+
+CASES_PATH = Path("eval_data") / "token_extraction_cases.json"
+FIELDS = ["weather", "occasion", "additional_preferences"]
+EMPTY_VALUES = {"", "none", "n/a", "na", "not specified", "not mentioned", "unknown", "null"}
+
+
+def _canonical(value, lexicon):
+    """Map a free-text value onto a lexicon key so 'chilly' and 'cold' compare equal"""
+    text = str(value or "").strip().lower()
+    if text in EMPTY_VALUES:
+        return ""
+    words = _words(text)
+    for key, keywords in lexicon.items():
+        if key == text or any(w in keywords for w in words):
+            return key
+    return text
+
+
+def _preferences_match(predicted, expected):
+    predicted = set(_words(str(predicted or ""))) - {"avoid", "no", "not"} if str(predicted or "").strip().lower() not in EMPTY_VALUES else set()
+    expected = set(_words(str(expected or ""))) - {"avoid", "no", "not"} if str(expected or "").strip().lower() not in EMPTY_VALUES else set()
+    if not predicted and not expected:
+        return True
+    return len(predicted & expected) / max(1, len(predicted | expected)) >= 0.5
+
+
+def field_matches(predicted, expected):
+    """Per-field correctness of a token dict against a reference token dict"""
+    return {
+        "weather": _canonical(predicted.get("weather"), WEATHER_LEXICON) == _canonical(expected.get("weather"), WEATHER_LEXICON),
+        "occasion": _canonical(predicted.get("occasion"), OCCASION_LEXICON) == _canonical(expected.get("occasion"), OCCASION_LEXICON),
+        "additional_preferences": _preferences_match(predicted.get("additional_preferences"), expected.get("additional_preferences")),
+    }
+
+
+def _latency_summary(latencies):
+    ordered = sorted(latencies)
+    return {
+        "p50_ms": round(statistics.median(ordered) * 1000, 3),
+        "p95_ms": round(ordered[min(len(ordered) - 1, int(0.95 * len(ordered)))] * 1000, 3),
+        "mean_ms": round(statistics.mean(ordered) * 1000, 3),
+    }
+
+
+def _accuracy(rows):
+    return {field: round(sum(r[field] for r in rows) / len(rows), 3) for field in FIELDS}
+
+
+def run_report(with_llm=False, threshold=0.6, cases_path=CASES_PATH):
+    with open(cases_path) as f:
+        cases = json.load(f)
+
+    extractor = TokenExtractor(confidence_threshold=threshold)
+    local_rows, llm_rows, agreement_rows = [], [], []
+    local_latencies, llm_latencies = [], []
+    confident, confident_rows = 0, []
+
+    llm = None
+    if with_llm:
+        from SambaFit import model1_tokenize_prompt
+        llm = model1_tokenize_prompt
+
+    for case in cases:
+        start = time.perf_counter()
+        tokens, confidence = extractor.extract_local(case["prompt"])
+        local_latencies.append(time.perf_counter() - start)
+        matches = field_matches(tokens, case["expected"])
+        local_rows.append(matches)
+        if confidence >= threshold:
+            confident += 1
+            confident_rows.append(matches)
+
+        if llm is not None:
+            start = time.perf_counter()
+            try:
+                llm_tokens = llm(case["prompt"])
+            except Exception as e:
+                print(f"LLM failed on {case['prompt']!r}: {e}")
+                continue
+            llm_latencies.append(time.perf_counter() - start)
+            llm_rows.append(field_matches(llm_tokens, case["expected"]))
+            agreement_rows.append(field_matches(tokens, llm_tokens))
+
+    report = {
+        "cases": len(cases),
+        "local": {"accuracy": _accuracy(local_rows), "latency": _latency_summary(local_latencies)},
+        "fast_path": {
+            "threshold": threshold,
+            "handled_locally": round(confident / len(cases), 3),
+            "accuracy_when_local": _accuracy(confident_rows) if confident_rows else None,
+        },
+    }
+    if llm_rows:
+        report["llm"] = {"accuracy": _accuracy(llm_rows), "latency": _latency_summary(llm_latencies)}
+        report["local_vs_llm_agreement"] = _accuracy(agreement_rows)
+    return report
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--with-llm", action="store_true", help="also call model1_tokenize_prompt for every case")
+    parser.add_argument("--threshold", type=float, default=0.6, help="local confidence needed to skip the LLM")
+    args = parser.parse_args()
+    print(json.dumps(run_report(with_llm=args.with_llm, threshold=args.threshold), indent=4))
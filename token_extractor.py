@@ -0,0 +1,217 @@
+"""
+token_extractor.py
+
+Fast local path for SambaFit token extraction. Short chat messages are parsed
+with keyword lexicons plus a small naive Bayes occasion classifier; only when
+the local confidence is low do we fall back to model1_tokenize_prompt.
+"""
+
+import logging
+import math
+import re
+import time
+from collections import Counter, defaultdict
+
+WEATHER_LEXICON = {
+    "cold": ["cold", "chilly", "freezing", "frosty", "snow", "snowy", "winter", "cool", "brisk", "icy"],
+    "warm": ["warm", "hot", "sunny", "summer", "humid", "heat", "heatwave", "scorching", "mild"],
+    "rainy": ["rain", "rainy", "raining", "wet", "drizzle", "drizzling", "drizzly", "storm", "stormy", "showers"],
+    "windy": ["windy", "wind", "breezy", "gusty"],
+}
+
+OCCASION_LEXICON = {
+    # Ordered from most to least specific: the first key with a keyword hit wins
+    "interview": ["interview"],
+    "wedding": ["wedding", "bride", "groom", "reception", "ceremony"],
+    "funeral": ["funeral", "memorial"],
+    "formal event": ["formal", "gala", "banquet", "black-tie", "ball"],
+    "gym": ["gym", "workout", "training", "exercise", "lifting", "jog", "jogging", "yoga"],
+    "hiking": ["hike", "hiking", "trail", "camping", "outdoors"],
+    "beach": ["beach", "pool", "swim", "swimming", "lake"],
+    "work": ["work", "office", "meeting", "business", "conference", "presentation", "job"],
+    "date": ["date", "romantic"],
+    "party": ["party", "club", "clubbing", "birthday", "celebration", "festival", "concert"],
+    "dinner": ["dinner", "restaurant", "brunch", "lunch"],
+    "travel": ["travel", "trip", "flight", "airport", "vacation", "holiday"],
+    "casual outing": ["casual", "hangout", "hanging", "errands", "shopping", "stroll", "weekend", "friends", "coffee"],
+}
+
+PREFERENCE_VOCAB = {
+    "color": ["black", "white", "grey", "gray", "navy", "blue", "red", "green", "yellow", "pink", "purple",
+              "brown", "beige", "tan", "khaki", "olive", "orange", "cream", "burgundy", "maroon", "dark",
+              "light", "neutral", "bright", "pastel", "colorful", "monochrome"],
+    "style": ["formal", "smart", "minimalist", "minimal", "sporty", "elegant", "classy", "chic", "vintage",
+              "streetwear", "preppy", "edgy", "relaxed", "comfortable", "comfy", "cozy", "stylish", "trendy",
+              "professional", "layered", "simple", "bold"],
+    "fit": ["slim", "loose", "oversized", "fitted", "tailored", "baggy"],
+    "material": ["denim", "leather", "wool", "cotton", "linen", "silk", "knit", "fleece"],
+    "pattern": ["striped", "stripes", "plaid", "floral", "patterned", "solid", "checked"],
+}
+
+STOPWORDS = set("""
+a an the i me my we our you your it its is are am be was were to for of in on at with and or but so
+this that these those what which should could would can will do does need want wanna like please
+today tonight tomorrow morning afternoon evening day week going go gonna some something anything
+outfit outfits wear wearing dress dressed clothes clothing put together pick choose make create give
+suggest recommend help look looks good nice great just really very bit little kind sort also get
+it's i'm im there here out up about have has had weather occasion
+""".split())
+
+NEGATIONS = {"no", "not", "without", "avoid", "dont", "don't", "never"}
+
+# Short seed sentences per occasion; the lexicon words are added as extra training documents
+OCCASION_SEEDS = {
+    "wedding": ["attending my cousin's wedding", "wedding guest outfit", "going to a friend's wedding"],
+    "gym": ["heading to the gym", "leg day at the gym", "going for a workout"],
+    "work": ["long day at the office", "team meeting at work", "client meeting downtown"],
+    "interview": ["job interview tomorrow", "interview for a new position"],
+    "date": ["first date tonight", "romantic dinner date"],
+    "party": ["house party with friends", "birthday party tonight"],
+    "dinner": ["dinner at a nice restaurant", "brunch with family"],
+    "casual outing": ["running errands around town", "coffee with friends", "lazy weekend stroll"],
+    "beach": ["day at the beach", "pool party in the sun"],
+    "hiking": ["hiking in the mountains", "going camping this weekend"],
+    "travel": ["long flight tomorrow", "weekend trip to the city"],
+    "funeral": ["attending a funeral", "memorial service"],
+    "formal event": ["black tie gala", "formal banquet dinner"],
+}
+
+
+def _words(text):
+    return re.findall(r"[a-z][a-z\-']*", text.lower())
+
+
+class OccasionClassifier:
+    """Multinomial naive Bayes over words, trained on the occasion lexicon and seed phrases"""
+
+    def __init__(self, alpha=0.5):
+        self.alpha = alpha
+        self.class_counts = Counter()
+        self.word_counts = defaultdict(Counter)
+        self.vocabulary = set()
+        for label, words in OCCASION_LEXICON.items():
+            for word in words:
+                self._add(label, [word])
+        for label, sentences in OCCASION_SEEDS.items():
+            for sentence in sentences:
+                self._add(label, [w for w in _words(sentence) if w not in STOPWORDS])
+
+    def _add(self, label, words):
+        self.class_counts[label] += 1
+        self.word_counts[label].update(words)
+        self.vocabulary.update(words)
+
+    def predict(self, words):
+        """Return (label, probability, evidence_words) for the most likely occasion"""
+        known = [w for w in words if w in self.vocabulary]
+        if not known:
+            return None, 0.0, []
+
+        total_docs = sum(self.class_counts.values())
+        vocab_size = len(self.vocabulary)
+        log_scores = {}
+        for label, count in self.class_counts.items():
+            label_total = sum(self.word_counts[label].values())
+            score = math.log(count / total_docs)
+            for word in known:
+                score += math.log((self.word_counts[label][word] + self.alpha) / (label_total + self.alpha * vocab_size))
+            log_scores[label] = score
+
+        best = max(log_scores, key=log_scores.get)
+        peak = log_scores[best]
+        norm = sum(math.exp(s - peak) for s in log_scores.values())
+        evidence = [w for w in known if self.word_counts[best][w] > 0]
+        return best, 1.0 / norm, evidence
+
+
+class TokenExtractor:
+    """Extract weather/occasion/additional_preferences locally, using the LLM only as a fallback"""
+
+    def __init__(self, llm_fallback=None, confidence_threshold=0.6, classifier_threshold=0.55):
+        # llm_fallback: callable(prompt) -> dict, normally SambaFit.model1_tokenize_prompt
+        self.llm_fallback = llm_fallback
+        self.confidence_threshold = confidence_threshold
+        self.classifier_threshold = classifier_threshold
+        self.classifier = OccasionClassifier()
+
+    @staticmethod
+    def _lexicon_match(words, lexicon):
+        """First canonical key whose keywords appear in words, plus the words it explains"""
+        for key, keywords in lexicon.items():
+            hits = [w for w in words if w in keywords]
+            if hits:
+                return key, hits
+        return None, []
+
+    def extract_local(self, prompt):
+        """
+        Parse the prompt without any network call.
+
+        Returns:
+            tuple: (tokens, confidence) where tokens uses the same keys as
+            model1_tokenize_prompt and confidence is the share of content words
+            the lexicons and classifier could account for (0-1); a prompt
+            with no content words yields empty tokens and confidence 0.
+        """
+        words = _words(prompt)
+        content = [w for w in words if w not in STOPWORDS]
+        explained = set()
+
+        weather, hits = self._lexicon_match(content, WEATHER_LEXICON)
+        explained.update(hits)
+
+        occasion, hits = self._lexicon_match(content, OCCASION_LEXICON)
+        explained.update(hits)
+        if occasion is None:
+            label, probability, evidence = self.classifier.predict(content)
+            if label and probability >= self.classifier_threshold:
+                occasion = label
+                explained.update(evidence)
+
+        preferences = []
+        vocabulary = {word for words_ in PREFERENCE_VOCAB.values() for word in words_}
+        for index, word in enumerate(words):
+            if word in NEGATIONS and index + 1 < len(words) and words[index + 1] not in STOPWORDS:
+                preferences.append(f"avoid {words[index + 1]}")
+                explained.update({word, words[index + 1]})
+            elif word in vocabulary and word not in explained:
+                # Keep adjective + noun pairs such as "dark jeans" together
+                phrase = word
+                if index + 1 < len(words) and words[index + 1] not in STOPWORDS and words[index + 1] not in vocabulary \
+                        and words[index + 1] not in explained:
+                    phrase = f"{word} {words[index + 1]}"
+                    explained.add(words[index + 1])
+                if not any(p.endswith(word) for p in preferences):
+                    preferences.append(phrase)
+                explained.add(word)
+
+        explained.update(w for w in content if w in NEGATIONS)
+        confidence = sum(w in explained for w in content) / len(content) if content else 0.0
+        tokens = {
+            "weather": weather or "",
+            "occasion": occasion or "",
+            "additional_preferences": ", ".join(preferences),
+        }
+        return tokens, confidence
+
+    def extract(self, prompt):
+        """
+        Tokens for the prompt, calling the LLM only when local confidence is low.
+
+        Returns:
+            tuple: (tokens, source, confidence) where source is "local" or "llm".
+            Nothing is kept on the extractor, so one instance can serve every session.
+        """
+        start = time.perf_counter()
+        tokens, confidence = self.extract_local(prompt)
+        source = "local"
+        if confidence < self.confidence_threshold and self.llm_fallback is not None:
+            try:
+                tokens = self.llm_fallback(prompt)
+                source = "llm"
+            except Exception as e:
+                logging.warning(f"LLM token extraction failed, using local tokens: {e}")
+        latency = time.perf_counter() - start
+        logging.info(f"Token extraction via {source} (confidence {confidence:.2f}, "
+                     f"{latency * 1000:.1f} ms): {tokens}")
+        return tokens, source, confidence
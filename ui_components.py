@@ -300,8 +300,10 @@ class WardrobeUI:
                 unsafe_allow_html=True
             )
             
-            last_worn = datetime.fromisoformat(item["last_worn"])
-            days_since = (datetime.now() - last_worn).days
+            # idle_days comes precomputed from the tracker's wear statistics
+            days_since = item.get("idle_days")
+            if days_since is None:
+                days_since = (datetime.now() - datetime.fromisoformat(item["last_worn"])).days
             days_remaining = max(0, item.get('reset_period', 7) - days_since)
             
             # Updated to use consistent brown gradient theme
@@ -315,7 +317,7 @@ class WardrobeUI:
             )
             
             st.markdown(
-                f'<div class="meta-info">Last worn: {last_worn.strftime("%Y-%m-%d")}</div>',
+                f'<div class="meta-info">Last worn: {item["last_worn"][:10]}</div>',
                 unsafe_allow_html=True
             )
             
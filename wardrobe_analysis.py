@@ -1,9 +1,9 @@
 import streamlit as st
 import cv2
 import matplotlib.pyplot as plt
-from sklearn.cluster import KMeans
 import seaborn as sns
 import numpy as np
+from dominant_colors import extract_palette
 
 class WardrobeAnalysis:
     @staticmethod
@@ -35,16 +35,15 @@ class WardrobeAnalysis:
         ax1.set_title("Color Distribution")
         ax1.legend()
         
-        # Dominant colors
-        pixels = img_np.reshape(-1, 3)
-        kmeans = KMeans(n_clusters=5, n_init=10)
-        kmeans.fit(pixels)
-        colors = kmeans.cluster_centers_.astype(int)
+        # Dominant colors (downsampled + subsampled MiniBatchKMeans, cached per image)
+        palette = extract_palette(image)
         
-        # Plot dominant colors
-        for idx, color in enumerate(colors):
-            ax2.add_patch(plt.Rectangle((idx, 0), 1, 1, color=color/255))
-        ax2.set_xlim(0, len(colors))
+        # Plot dominant colors, width proportional to their share of the image
+        offset = 0
+        for r, g, b, weight in palette:
+            ax2.add_patch(plt.Rectangle((offset, 0), weight * len(palette), 1, color=(r / 255, g / 255, b / 255)))
+            offset += weight * len(palette)
+        ax2.set_xlim(0, len(palette))
         ax2.set_ylim(0, 1)
         ax2.set_title("Dominant Colors")
         st.pyplot(fig)
@@ -33,6 +33,8 @@ class WardrobeDescriber:
             
             # Add or update the description in the item
             item['ai_analysis'] = description
+            # The analysis can change the category (partition) of an item without a known type
+            self.wardrobe_tracker.invalidate_indexes()
             
             # Save the updated database
             self.wardrobe_tracker.save_database()
@@ -6,6 +6,14 @@ import os
 from dotenv import load_dotenv
 import json
 import time
+import logging
+from item_attributes import item_attributes
+from email_templates import fill_styling_slots, render_reminder_email, render_listing
+from metrics import timed, increment
+from llm_client import post_chat_completion
+
+# Items per styling request; bounds the response so long digests are not cut off mid-JSON
+STYLING_BATCH_SIZE = 20
 
 class EmailNotifier:
     def __init__(self):
@@ -15,127 +23,159 @@ class EmailNotifier:
         self.sender_email = os.getenv('GMAIL_ADDRESS')
         self.brevo_api_key = os.getenv('BREVO_API_KEY')
         self.sambanova_api_key = 'ba4070a0-299d-4e64-8952-0886808164b3'
-        self.url = "https://api.sendinblue.com/v3/smtp/email"
-        self.sambanova_url = "https://api.sambanova.ai/v1/chat/completions"
+        # BREVO_API_URL (and SAMBANOVA_BASE_URL, see llm_client.py) let tests and the scheduler point at a local stand-in (see mock_services.py)
+        self.url = os.getenv('BREVO_API_URL', "https://api.sendinblue.com/v3/smtp/email")
+
+    @staticmethod
+    def get_items_info(items):
+        """Summarise items for email content, using precomputed idle_days when present"""
+        items_info = []
+        for item in items:
+            days_since = item.get('idle_days')
+            if days_since is None:
+                days_since = (datetime.now() - datetime.fromisoformat(item['last_worn'])).days
+            items_info.append({
+                'name': item.get('name', item['type']),
+                'type': item['type'],
+                'days_since': days_since,
+                'wear_count': item.get('wear_count', 0),
+                'attributes': item_attributes(item)
+            })
+        return items_info
+
+    def request_styling_suggestions(self, attributes_list):
+        """Short styling suggestion per item, in order, requested in batches of STYLING_BATCH_SIZE"""
+        suggestions = []
+        for start in range(0, len(attributes_list), STYLING_BATCH_SIZE):
+            batch = attributes_list[start:start + STYLING_BATCH_SIZE]
+            try:
+                results = self._request_styling_batch(batch)
+            except Exception as e:
+                logging.error(f"Styling suggestions failed for {len(batch)} items: {e}")
+                results = None
+            if not isinstance(results, list) or len(results) != len(batch):
+                # A failed batch leaves its slots empty so they fall back to defaults on their own
+                increment("styling_batch_failures")
+                results = [None] * len(batch)
+            suggestions.extend(results)
+        return suggestions
+
+    @timed("llm.styling_suggestions")
+    def _request_styling_batch(self, attributes_list):
+        """One SambaNova call returning a short styling suggestion for each item, in order"""
+        headers = {
+            "Authorization": f"Bearer {self.sambanova_api_key}",
+            "Content-Type": "application/json"
+        }
+        items = [
+            {k: a.get(k) for k in ("type", "primary_color", "material", "style", "fit") if a.get(k)}
+            for a in attributes_list
+        ]
+        prompt = f"""For each clothing item below, write ONE short, creative styling suggestion (max 20 words).
+
+Items:
+{json.dumps(items)}
+
+Return ONLY a JSON array of {len(items)} strings, in the same order as the items.
+"""
+        payload = {
+            "model": "Meta-Llama-3.1-70B-Instruct",
+            "messages": [
+                {"role": "system", "content": "You are a friendly wardrobe assistant. Respond with JSON only."},
+                {"role": "user", "content": prompt}
+            ],
+            "temperature": 0.7,
+            "top_p": 0.9,
+            "max_tokens": 40 * len(items) + 20
+        }
 
+        response = post_chat_completion(payload, "email.styling_suggestions", headers=headers, timeout=30)
+        if response.status_code != 200:
+            raise Exception(f"SambaNova API error {response.status_code}")
+        content = response.json()['choices'][0]['message']['content']
+        start, end = content.find('['), content.rfind(']')
+        if start < 0 or end < start:
+            raise ValueError("no JSON array in styling response")
+        return json.loads(content[start:end + 1])
+
+    def get_fallback_content(self, items_info):
+        """Reminder email rendered entirely offline (cached or default styling suggestions)"""
+        attributes = [info.get('attributes') or {'type': info['type']} for info in items_info]
+        return render_reminder_email(items_info, fill_styling_slots(attributes))
+
+    def request_personalized_content(self, items_info, report=None):
+        """Render the reminder email locally; only uncached styling slots go to SambaNova, in batches"""
+        attributes = [info.get('attributes') or {'type': info['type']} for info in items_info]
+        suggestions = fill_styling_slots(attributes, self.request_styling_suggestions, report=report)
+        return render_reminder_email(items_info, suggestions)
+
+    @timed("email.generate_content")
     def generate_personalized_content(self, items):
         """Generate personalized email content using SambaNova API"""
+        items_info = []
         try:
             progress_text = "Generating email content..."
             my_bar = st.progress(0, text=progress_text)
             
             # Prepare item information
-            items_info = []
-            for item in items:
-                last_worn = datetime.fromisoformat(item['last_worn'])
-                days_since = (datetime.now() - last_worn).days
-                items_info.append({
-                    'name': item.get('name', item['type']),
-                    'type': item['type'],
-                    'days_since': days_since,
-                    'wear_count': item.get('wear_count', 0)
-                })
-            my_bar.progress(25, text="Processing items...")
-
-            # SambaNova API request
-            headers = {
-                "Authorization": f"Bearer {self.sambanova_api_key}",
-                "Content-Type": "application/json"
-            }
-            
-            prompt = f"""Write a personalized email about unworn clothing items. Be friendly and casual.
-
-Items to mention:
-{json.dumps(items_info, indent=2)}
-
-Requirements:
-1. Start with a warm greeting
-2. For each item, mention how long it's been unworn
-3. Suggest some creative ways to wear each item
-4. Use emojis to keep it fun
-5. End with an encouraging note
-6. Keep it concise but friendly
-"""
+            items_info = self.get_items_info(items)
+            my_bar.progress(50, text="Calling SambaNova API...")
 
-            payload = {
-                "model": "Meta-Llama-3.1-70B-Instruct",
-                "messages": [
-                    {"role": "system", "content": "You are a friendly wardrobe assistant helping people make the most of their clothes."},
-                    {"role": "user", "content": prompt}
-                ],
-                "temperature": 0.7,
-                "top_p": 0.9
-            }
+            report = {}
+            content = self.request_personalized_content(items_info, report)
+            if report.get("defaulted"):
+                st.warning(f"SambaNova API unavailable for {report['defaulted']} of {report['requested']} "
+                           "styling suggestions - using standard suggestions for those")
 
-            my_bar.progress(50, text="Calling SambaNova API...")
-            
-            try:
-                response = requests.post(
-                    self.sambanova_url,
-                    headers=headers,
-                    json=payload,
-                    timeout=30  # Add timeout
-                )
-                my_bar.progress(75, text="Processing response...")
-
-                if response.status_code == 200:
-                    content = response.json()['choices'][0]['message']['content']
-                    my_bar.progress(100, text="Content generated!")
-                    time.sleep(0.5)  # Give user time to see completion
-                    my_bar.empty()
-                    return content
-                else:
-                    st.error(f"SambaNova API error {response.status_code}")
-                    my_bar.empty()
-                    return self.get_fallback_content(items_info)
-                
-            except requests.exceptions.Timeout:
-                st.error("SambaNova API timeout - using fallback content")
-                my_bar.empty()
-                return self.get_fallback_content(items_info)
-            except Exception as e:
-                st.error(f"SambaNova API error: {str(e)}")
-                my_bar.empty()
-                return self.get_fallback_content(items_info)
+            my_bar.progress(100, text="Content generated!")
+            time.sleep(0.5)  # Give user time to see completion
+            my_bar.empty()
+            return content
             
         except Exception as e:
             st.error(f"Error generating content: {str(e)}")
             return self.get_fallback_content(items_info)
 
-    def send_notification(self, user_email, items):
-        """Send email notification with pre-generated content"""
+    @timed("email.send")
+    def send_email(self, user_email, email_content, subject="💃 Time to Refresh Your Wardrobe!"):
+        """Send already generated content through Brevo without any UI; returns True on success"""
+        headers = {
+            "accept": "application/json",
+            "api-key": self.brevo_api_key,
+            "content-type": "application/json"
+        }
+        
+        payload = {
+            "sender": {
+                "name": "Vestique",
+                "email": self.sender_email
+            },
+            "to": [{"email": user_email}],
+            "subject": subject,
+            "textContent": email_content
+        }
+        
+        response = requests.post(
+            self.url, 
+            headers=headers, 
+            json=payload, 
+            timeout=10
+        )
+        
+        increment("emails", status="sent" if response.status_code == 201 else "failed")
+        return response.status_code == 201
+
+    def send_notification(self, user_email, items, email_content=None):
+        """Send email notification, reusing pre-generated (e.g. previewed) content when given"""
         if not user_email:
             st.error("Please enter your email address")
             return False
             
         try:
-            # Generate content first
-            email_content = self.generate_personalized_content(items)
-            
-            headers = {
-                "accept": "application/json",
-                "api-key": self.brevo_api_key,
-                "content-type": "application/json"
-            }
-            
-            payload = {
-                "sender": {
-                    "name": "Vestique",
-                    "email": self.sender_email
-                },
-                "to": [{"email": user_email}],
-                "subject": "💃 Time to Refresh Your Wardrobe!",
-                "textContent": email_content
-            }
-            
-            response = requests.post(
-                self.url, 
-                headers=headers, 
-                json=payload, 
-                timeout=10
-            )
-            
-            return response.status_code == 201
+            # Generate content first unless the caller already has it
+            if email_content is None:
+                email_content = self.generate_personalized_content(items)
+            return self.send_email(user_email, email_content)
             
         except Exception as e:
             st.error(f"Error sending email: {str(e)}")
@@ -143,25 +183,14 @@ Requirements:
     def check_unworn_items(self, wardrobe_tracker):
         """Check for items that haven't been worn in a while"""
         try:
+            # Idle days are precomputed by the tracker's wear statistics, no per-item scan needed
             unworn_items = []
             current_time = datetime.now()
-            
-            # Debug print
-            st.write(f"Checking {len(wardrobe_tracker.database['items'])} items...")
-            
-            for item in wardrobe_tracker.database["items"]:
-                try:
-                    last_worn = datetime.fromisoformat(item["last_worn"])
-                    days_since = (current_time - last_worn).days
-                    
-                    st.write(f"Item {item.get('name', item['type'])}: {days_since} days since last worn")
-                    
-                    if days_since >= 7:  # Items unworn for 7+ days
-                        unworn_items.append(item)
-                        
-                except Exception as e:
-                    st.error(f"Error processing item {item.get('name', 'unnamed')}: {str(e)}")
-                    continue
+            items_by_id = {item['id']: item for item in wardrobe_tracker.database["items"]}
+            for entry in wardrobe_tracker.stats.unworn(7, "items", current_time):  # Items unworn for 7+ days
+                item = items_by_id.get(entry["id"])
+                if item is not None:
+                    unworn_items.append({**item, 'idle_days': wardrobe_tracker.stats.idle_days("items", entry["id"], current_time)})
             
             st.write(f"Found {len(unworn_items)} unworn items")
             return unworn_items
@@ -169,83 +198,29 @@ Requirements:
         except Exception as e:
             st.error(f"Error in check_unworn_items: {str(e)}")
             return []
-                    
-        return unworn_items
-    def generate_listing_content(self, item):
-        """Generate marketplace listing content using SambaNova API"""
+    @timed("listing.generate_content")
+    def generate_listing_content(self, item, refresh=False):
+        """Render marketplace listing content locally with a (cached, or with refresh new) LLM styling suggestion"""
         try:
             progress_text = "Generating listing content..."
             my_bar = st.progress(0, text=progress_text)
-            
-            # Prepare item information
-            item_info = {
-                'name': item.get('name', item['type']),
-                'type': item['type'],
-                'condition': item.get('condition', 'Not specified'),
-                'material': item.get('material', 'Not specified'),
-                'color': item.get('color', {}).get('primary', 'Not specified'),
-                'brand': item.get('brand', 'Not specified'),
-                'wear_count': item.get('wear_count', 0)
-            }
-            
-            my_bar.progress(25, text="Processing item details...")
 
-            headers = {
-                "Authorization": f"Bearer {self.sambanova_api_key}",
-                "Content-Type": "application/json"
-            }
-            
-            prompt = f"""Create an engaging marketplace listing for this clothing item. 
-
-    Item Details:
-    {json.dumps(item_info, indent=2)}
-
-    Requirements:
-    1. Write a catchy title
-    2. Create an engaging description
-    3. Highlight key features and condition
-    4. Suggest styling options
-    5. Keep it professional but friendly
-    6. Include emojis where appropriate
-    """
-
-            payload = {
-                "model": "Meta-Llama-3.1-70B-Instruct",
-                "messages": [
-                    {"role": "system", "content": "You are a professional fashion marketplace listing creator."},
-                    {"role": "user", "content": prompt}
-                ],
-                "temperature": 0.7,
-                "top_p": 0.9
-            }
-
-            my_bar.progress(50, text="Generating listing...")
-            
-            try:
-                response = requests.post(
-                    self.sambanova_url,
-                    headers=headers,
-                    json=payload,
-                    timeout=30
-                )
-                my_bar.progress(75, text="Processing response...")
-
-                if response.status_code == 200:
-                    content = response.json()['choices'][0]['message']['content']
-                    my_bar.progress(100, text="Listing generated!")
-                    time.sleep(0.5)
-                    my_bar.empty()
-                    return content
-                else:
-                    st.error(f"SambaNova API error {response.status_code}")
-                    my_bar.empty()
-                    return None
-                    
-            except Exception as e:
-                st.error(f"Error generating listing: {str(e)}")
+            attributes = item_attributes(item)
+            my_bar.progress(50, text="Generating styling idea...")
+            report = {}
+            suggestion = fill_styling_slots([attributes], self.request_styling_suggestions, refresh=refresh,
+                                            report=report)[0]
+            if report.get("defaulted"):
+                # Default copy is not stored over the listing's current content
                 my_bar.empty()
+                st.warning("SambaNova API unavailable - the listing was not refreshed.")
                 return None
-                
+
+            content = render_listing(item, suggestion)
+            my_bar.progress(100, text="Listing generated!")
+            my_bar.empty()
+            return content
+
         except Exception as e:
             st.error(f"Error in generate_listing_content: {str(e)}")
-            return None
\ No newline at end of file
+            return None
@@ -0,0 +1,254 @@
+"""
+wardrobe_service.py
+
+Many wardrobes in one process. Each tenant (user id) gets its own data
+directory under a root, holding its clothing_database.json and every file the
+tracker keeps next to it (wear log, full-precision features, PCA codec,
+re-embedding results, listing copy), so tenants never share wardrobe files.
+The feature extractor (one model in memory) and the marketplace store are
+shared by all tenants.
+
+Trackers are loaded on first use and kept in an LRU cache bounded by count and
+by the estimated memory of their databases. Their match and hash indexes are
+only built on a tenant's first capture and are dropped again for all but the
+most recently used tenants. Trackers are not thread-safe, so tenant()
+serialises access per tenant; different tenants run concurrently. Each request
+first applies the tracker's background results (re-embedded vectors, listing
+copy), and unloading a tracker stops its background jobs and forgets them.
+
+The service trusts the tenant id it is given. The app takes it from Streamlit's
+login or from a link token signed with VESTIQUE_TENANT_SECRET (sign_tenant),
+never from a bare user name in the URL.
+
+Usage:
+    service = get_service("wardrobes")
+    with service.tenant("alice@example.com") as tracker:
+        tracker.display_wardrobe_grid()
+
+    VESTIQUE_TENANT_SECRET=... python wardrobe_service.py alice@example.com   # print a link token
+"""
+
+import argparse
+import base64
+import hashlib
+import hmac
+import logging
+import os
+import re
+import threading
+import time
+from collections import Counter, OrderedDict
+from contextlib import contextmanager
+from pathlib import Path
+
+from metrics import increment, span
+from wardrobe_tracker import WardrobeTracker
+
+DEFAULT_ROOT = Path("wardrobes")
+MAX_TRACKERS = 64
+MAX_RESIDENT_MB = 2048
+# Tenants whose match/hash indexes stay built between requests
+MAX_INDEXES = 16
+# Resident size of a database: a float in a list is a 24-byte object plus an 8-byte pointer,
+# images are base64 strings, and each item's dict and metadata take roughly ITEM_BYTES
+FLOAT_BYTES = 32
+ITEM_BYTES = 4096
+TOKEN_TTL_DAYS = 30
+
+
+def tenant_dir_name(tenant_id):
+    """Filesystem-safe directory name for a tenant id (readable slug plus a hash, so ids never collide)"""
+    slug = re.sub(r"[^A-Za-z0-9._-]+", "_", tenant_id).strip("._")[:48] or "tenant"
+    return f"{slug}-{hashlib.sha1(tenant_id.encode()).hexdigest()[:10]}"
+
+
+def _token_signature(body, secret):
+    return hmac.new(secret.encode(), body.encode(), hashlib.sha256).hexdigest()
+
+
+def sign_tenant(tenant_id, secret, ttl_days=TOKEN_TTL_DAYS):
+    """Token naming a tenant for ttl_days, for wardrobe links (?token=...)"""
+    expires = int(time.time() + ttl_days * 86400)
+    body = base64.urlsafe_b64encode(f"{tenant_id}|{expires}".encode()).decode().rstrip("=")
+    return f"{body}.{_token_signature(body, secret)}"
+
+
+def verify_tenant_token(token, secret):
+    """Tenant id of a token from sign_tenant; None if it is forged, malformed or expired (or no secret is set)"""
+    if not secret or not token or "." not in token:
+        return None
+    body, signature = token.rsplit(".", 1)
+    if not hmac.compare_digest(signature, _token_signature(body, secret)):
+        return None
+    try:
+        tenant_id, expires = base64.urlsafe_b64decode(body + "=" * (-len(body) % 4)).decode().rsplit("|", 1)
+        expires = int(expires)
+    except (ValueError, UnicodeDecodeError):
+        return None
+    return tenant_id if expires > time.time() else None
+
+
+def default_extractor():
+    from feature_extractor import FeatureExtractor
+    return FeatureExtractor()
+
+
+class WardrobeService:
+    """Per-tenant trackers under one root directory, loaded lazily and evicted least recently used first"""
+
+    def __init__(self, root=DEFAULT_ROOT, extractor_factory=default_extractor, max_trackers=MAX_TRACKERS,
+                 max_resident_mb=MAX_RESIDENT_MB, max_indexes=MAX_INDEXES, **tracker_kwargs):
+        """
+        Args:
+            extractor_factory (callable): Builds the feature extractor shared by every tenant, on first load.
+            max_trackers (int): Most trackers kept in memory.
+            max_resident_mb (float): Most estimated memory (MB) of the databases of the trackers kept loaded.
+            max_indexes (int): Most tenants whose match and hash indexes are kept built.
+            **tracker_kwargs: Passed to every WardrobeTracker (e.g. styling_fn).
+        """
+        self.root = Path(root)
+        self.root.mkdir(parents=True, exist_ok=True)
+        self.extractor_factory = extractor_factory
+        self.max_trackers = max_trackers
+        self.max_resident_bytes = max_resident_mb * 1e6
+        self.max_indexes = max_indexes
+        self.tracker_kwargs = tracker_kwargs
+        self._feature_extractor = None
+        self.lock = threading.Lock()
+        self.trackers = OrderedDict()    # tenant id -> tracker, least recently used first
+        self.sizes = {}                  # tenant id -> estimated resident database bytes
+        self.active = Counter()          # tenant id -> open tenant() contexts; never evicted while > 0
+        self.tenant_locks = {}           # tenant id -> RLock serialising its tracker
+
+    @property
+    def feature_extractor(self):
+        with self.lock:
+            if self._feature_extractor is None:
+                self._feature_extractor = self.extractor_factory()
+            return self._feature_extractor
+
+    def tenant_path(self, tenant_id):
+        return self.root / tenant_dir_name(tenant_id)
+
+    def tenants(self):
+        """Ids of tenants with a stored wardrobe"""
+        tenants = []
+        for marker in self.root.glob("*/tenant_id"):
+            try:
+                tenants.append(marker.read_text().strip())
+            except OSError as e:
+                logging.error(f"Error reading {marker}: {e}")
+        return tenants
+
+    @contextmanager
+    def tenant(self, tenant_id):
+        """The tenant's tracker, loaded if needed and held exclusively (and never evicted) for the block"""
+        tenant_id = str(tenant_id)
+        with self.lock:
+            self.active[tenant_id] += 1
+            lock = self.tenant_locks.setdefault(tenant_id, threading.RLock())
+        try:
+            with lock:
+                yield self._tracker(tenant_id)
+        finally:
+            with self.lock:
+                self.active[tenant_id] -= 1
+                if not self.active[tenant_id]:
+                    del self.active[tenant_id]
+                    if tenant_id not in self.trackers:
+                        # Failed to load; nobody else holds this lock
+                        self.tenant_locks.pop(tenant_id, None)
+                if tenant_id in self.trackers:
+                    self.sizes[tenant_id] = self._resident_size(self.trackers[tenant_id])
+                self._evict()
+
+    def _tracker(self, tenant_id):
+        """Cached or newly loaded tracker; the caller holds the tenant's lock"""
+        with self.lock:
+            tracker = self.trackers.get(tenant_id)
+            if tracker is not None:
+                self.trackers.move_to_end(tenant_id)
+        if tracker is not None:
+            increment("tenant_cache", result="hit")
+            # Loaded trackers pick up background results here instead of on their next load
+            tracker.refresh()
+            return tracker
+
+        increment("tenant_cache", result="miss")
+        path = self.tenant_path(tenant_id)
+        with span("tenant.load"):
+            tracker = WardrobeTracker(self.feature_extractor, owner=tenant_id, data_dir=path, **self.tracker_kwargs)
+        marker = path / "tenant_id"
+        if not marker.exists():
+            marker.write_text(tenant_id)
+        with self.lock:
+            self.trackers[tenant_id] = tracker
+            self.sizes[tenant_id] = self._resident_size(tracker)
+            self._evict()
+        return tracker
+
+    @staticmethod
+    def _resident_size(tracker):
+        """
+        Estimated memory of a tracker's database. The file on disk is no guide: compact
+        feature storage writes vectors ~98% smaller than the float lists they load into.
+        """
+        size = 0
+        for collection in ("items", "outfits", "listings"):
+            for item in tracker.database.get(collection, []):
+                vectors = list(item.get("reference_features") or []) + [item.get("features") or []]
+                size += ITEM_BYTES + FLOAT_BYTES * sum(len(v) for v in vectors)
+                size += len(item.get("image") or "") + sum(len(image) for image in item.get("reference_images") or [])
+        return size
+
+    def _evict(self):
+        """Unload idle trackers over the count or size budget and drop indexes of idle older tenants"""
+        total = sum(self.sizes.values())
+        for tenant_id in list(self.trackers):
+            if len(self.trackers) <= self.max_trackers and total <= self.max_resident_bytes:
+                break
+            if self.active[tenant_id]:
+                continue
+            tracker = self.trackers.pop(tenant_id)
+            total -= self.sizes.pop(tenant_id, 0)
+            self.tenant_locks.pop(tenant_id, None)
+            tracker.close()
+            increment("tenant_evictions")
+            logging.info(f"Unloaded wardrobe of tenant {tenant_id}")
+
+        for tenant_id in list(self.trackers)[:max(0, len(self.trackers) - self.max_indexes)]:
+            if not self.active[tenant_id] and self.trackers[tenant_id].release_indexes():
+                increment("tenant_index_evictions")
+
+    def stats(self):
+        """Resident trackers and their memory budget use, for monitoring"""
+        with self.lock:
+            return {
+                "resident": len(self.trackers),
+                "resident_mb": round(sum(self.sizes.values()) / 1e6, 1),
+                "active": len(self.active),
+            }
+
+
+_services = {}
+_services_lock = threading.Lock()
+
+
+def get_service(root=DEFAULT_ROOT, extractor_factory=default_extractor, **kwargs):
+    """The process-wide service for a root directory (created on first call with these settings)"""
+    key = str(Path(root).resolve())
+    with _services_lock:
+        if key not in _services:
+            _services[key] = WardrobeService(root, extractor_factory, **kwargs)
+        return _services[key]
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Print a signed wardrobe link token for a tenant")
+    parser.add_argument("tenant_id")
+    parser.add_argument("--days", type=float, default=TOKEN_TTL_DAYS)
+    args = parser.parse_args()
+    secret = os.getenv("VESTIQUE_TENANT_SECRET")
+    if not secret:
+        raise SystemExit("Set VESTIQUE_TENANT_SECRET")
+    print(sign_tenant(args.tenant_id, secret, args.days))
@@ -23,13 +23,81 @@ from wardrobe_analysis import WardrobeAnalysis
 import asyncio  # Add this
 from classifier import classify_outfit  # Add this
 from event_loop import background_loop
+from wear_log import WearLog, WearStats
+from listing_index import ListingIndex, LISTING_THRESHOLD_DAYS
+from dominant_colors import extract_palette
+from color_index import ColorIndex
+from image_pipeline import load_image, encode_jpeg, MAX_SIDE
+from feature_schema import item_views, extractor_version
+from feature_reembedding import merge_reembedded_features, find_stale_views, start_reembedding, stop_reembedding
+from feature_store import (EncodingCache, FeatureStorageError, FullPrecisionStore, compact_database, expand_database,
+                           load_codec, make_codec, remove_unused_bases)
+from match_index import (MatchIndex, learn_thresholds, item_category, OUTFIT, load_matcher_config, reweight_features,
+                         DEFAULT_FEATURE_WEIGHTS)
+from image_hash import HashIndex, fingerprint, item_hashes, DEFAULT_MAX_DISTANCE, MAX_COLOR_DISTANCE
+from listing_content import merge_listing_content, queue_listing_content, content_record, forget_listing_content
+from marketplace_store import get_store
+from metrics import span, timed, increment, observe
+import uuid
+
+# Listing and wear state of a claimed listing that does not carry over to the claimant's item
+CLAIM_DROPPED_FIELDS = ("listing_id", "owner", "status", "date_listed", "original_collection", "listing_content",
+                        "price", "claimed_by", "claimed_at", "image_bytes", "features", "feature_version",
+                        "feature_versions", "wear_count", "last_worn", "reset_period", "id")
 class WardrobeTracker:
-    def __init__(self, feature_extractor):
+    def __init__(self, feature_extractor, styling_fn=None, owner="local", data_dir=None):
+        """
+        Args:
+            styling_fn (callable): Batched styling suggestions for listing copy
+                (see email_templates.fill_styling_slots); None uses EmailNotifier's LLM call.
+            owner (str): Whose wardrobe this is; its listings are published to the
+                shared marketplace store under this id.
+            data_dir (str | Path): Directory holding the database and its sidecar files
+                (see wardrobe_service); None uses the working directory.
+        """
         self.feature_extractor = feature_extractor
-        self.db_path = Path("clothing_database.json")
+        self.styling_fn = styling_fn
+        self.owner = owner
+        if data_dir is not None:
+            Path(data_dir).mkdir(parents=True, exist_ok=True)
+        self.db_path = Path(data_dir or ".") / "clothing_database.json"
         self.similarity_threshold = 0.80
         self.reset_period = 7  # Days before an outfit can be worn again
+        # Calibrated threshold and CNN/colour weights from match_evaluation.py --calibrate
+        self.matcher_config = load_matcher_config()
+        self.similarity_threshold = self.matcher_config.get("similarity_threshold", self.similarity_threshold)
+        # Vector storage in the database file: "list", "float16" or "pca" (see feature_store)
+        self.feature_storage = self.matcher_config.get("feature_storage", "list")
+        self.full_store = (FullPrecisionStore(self.db_path.with_name("features_full.bin"))
+                           if self.matcher_config.get("feature_full_precision", True) else None)
+        self.pca_path = self.db_path.with_name("feature_pca.npz")
+        self._codec = None
+        self._encodings = EncodingCache()
         self.database = self.load_database()
+        self.wear_log = WearLog(self.db_path.with_name("wear_events.jsonl"))
+        self.stats = self.load_stats()
+        self.listing_index = self.load_listing_index()
+        self.apply_feature_weights(self.matcher_config.get("feature_weights"))
+        if self.matcher_config.get("use_segmentation"):
+            self.feature_extractor.use_segmentation = True
+        # Per-category thresholds learned from labelled matches (see learn_match_thresholds)
+        self.match_thresholds = self.database.get("match_thresholds", {})
+        # Search only the partitions picked by the coarse classifier
+        self.coarse_routing = True
+        self._match_index = None
+        self._stale_index = None   # (version, MatchIndex) of views awaiting re-embedding after a settings change
+        # Captures within this many dHash bits of a stored view match it without CNN extraction (None: off)
+        self.hash_max_distance = self.matcher_config.get("hash_max_distance", DEFAULT_MAX_DISTANCE)
+        self._hash_index = None
+        self._color_indexes = {}   # collection -> (items key, ColorIndex)
+        self._labels = None        # labelled matches by match id, loaded from the wear log on first use
+        self.marketplace = get_store()
+        # Vectors re-embedded and listing copy generated in the background since the last load
+        self.refresh()
+        self.reembedding = self.start_reembedding()
+        # Listings without stored copy (listed before it existed, or of an old template) get it in the background
+        self.listing_content = queue_listing_content(self.db_path, self.database.get("listings", []), self.styling_fn)
+        self.sync_listings()
         
         # Define clothing categories with emojis
         self.clothing_categories = {
@@ -56,28 +124,14 @@ class WardrobeTracker:
             collection = "outfits" if is_outfit else "items"
             for item in self.database[collection]:
                 if item['id'] == existing_id:
-                    if 'reference_images' not in item:
-                        item['reference_images'] = []
-                        item['reference_features'] = []
-                        item['reference_images'].append(item['image'])
-                        item['reference_features'].append(item['features'])
-                    
-                    item['reference_images'].append(self.image_to_base64(image))
-                    item['reference_features'].append(features.tolist())
-                    self.save_database()
+                    self._add_view(collection, item, image, features)
                     return True
             return False
         else:
             # Create new item with initial view and wear count
             collection = "outfits" if is_outfit else "items"
             
-            # Generate a new unique ID
-            new_id = 0
-            existing_ids = set()
-            for item in self.database[collection]:
-                existing_ids.add(item.get('id', 0))
-            while new_id in existing_ids:
-                new_id += 1
+            new_id = self._new_item_id(collection)
             
             new_item = {
                 "id": new_id,
@@ -85,6 +139,7 @@ class WardrobeTracker:
                 "name": name or item_type,
                 "reference_images": [self.image_to_base64(image)],
                 "reference_features": [features.tolist()],
+                **self.view_fingerprint(image),
                 "last_worn": datetime.now().isoformat(),
                 "image": self.image_to_base64(image),
                 "features": features.tolist(),
@@ -101,9 +156,69 @@ class WardrobeTracker:
                 if 'style_sources' in additional_data:
                     new_item['style_sources'] = additional_data['style_sources']
             
-            self.database[collection].append(new_item)
-            self.save_database()
+            self._store_new_item(collection, new_item)
             return True
+
+    @timed("marketplace.transfer")
+    def add_claimed_listing(self, claimed):
+        """
+        Add a listing claimed from the marketplace (see MarketplaceStore.claim) as a new item.
+
+        The stored JPEG bytes become the item's image as they are and the listing's
+        features are reused when they carry this extractor's version, so a claim
+        neither re-encodes the image nor runs the CNN. Returns the new item's id,
+        or None if features were needed and could not be extracted or the wardrobe
+        could not be saved (the caller then releases the listing).
+        """
+        is_outfit = claimed.get("type") == OUTFIT
+        collection = "outfits" if is_outfit else "items"
+        image_b64 = base64.b64encode(claimed["image_bytes"]).decode()
+        features = claimed.get("features")
+        if features is not None and claimed.get("feature_version") == self.feature_extractor.version:
+            increment("claim_features", source="reused")
+        else:
+            # Stale or missing features: decode once to re-extract; the image is still kept as stored
+            increment("claim_features", source="extracted")
+            features = self.feature_extractor.extract_features(Image.open(BytesIO(claimed["image_bytes"])),
+                                                               is_full_outfit=is_outfit)
+            if features is None:
+                return None
+        features = np.asarray(features, dtype=np.float32).tolist()
+
+        new_id = self._new_item_id(collection)
+
+        # AI analysis, palette, styling and any other item metadata travel with the listing;
+        # listing and wear state belong to the previous owner
+        new_item = {k: v for k, v in claimed.items() if k not in CLAIM_DROPPED_FIELDS}
+        new_item.update({
+            "id": new_id,
+            "name": claimed.get("name", claimed.get("type")),
+            "reference_images": [image_b64],
+            "reference_features": [features],
+            "feature_versions": [self.feature_extractor.version],
+            "view_hashes": list(claimed.get("view_hashes") or [])[:1],
+            "view_colors": list(claimed.get("view_colors") or [])[:1],
+            "last_worn": datetime.now().isoformat(),
+            "image": image_b64,
+            "features": features,
+            "feature_version": self.feature_extractor.version,
+            "reset_period": self.reset_period,
+            "wear_count": 1,
+        })
+        # Listings published before hashes or colours were stored get them from the bytes
+        item_hashes(new_item)
+        if not self._store_new_item(collection, new_item, from_capture=False):
+            # Not persisted: drop it again so the item is not both in memory here and back on the marketplace
+            self.database[collection] = [x for x in self.database[collection] if x["id"] != new_id]
+            self.stats.record_removed(collection, new_id)
+            self.wear_log.append("removed", collection, new_id)
+            self.invalidate_indexes()
+            return None
+        self.wear_log.append("claimed_from", collection, new_id, listing_id=claimed.get("listing_id"),
+                             previous_owner=claimed.get("owner"))
+        return new_id
+
+    @timed("db.load")
     def load_database(self):
         default_db = {
             "items": [],
@@ -115,6 +230,9 @@ class WardrobeTracker:
             if self.db_path.exists():
                 with open(self.db_path) as f:
                     db = json.load(f)
+                    if db.get("feature_storage"):
+                        self._codec = load_codec(db["feature_storage"], self.pca_path)
+                        expand_database(db, self._codec, self.full_store, self._encodings)
                     
                     # Ensure all keys exist in the database
                     if "outfits" not in db:
@@ -127,14 +245,97 @@ class WardrobeTracker:
                     return db
             else:
                 return default_db
+        except FeatureStorageError as e:
+            # An empty wardrobe here would be saved over the real one
+            st.error(f"Error loading database: {str(e)}")
+            raise
         except Exception as e:
             st.error(f"Error loading database: {str(e)}")
             return default_db
 
+    def load_stats(self):
+        """Load the persisted wear statistics, building them once from the items if missing"""
+        if "wear_stats" in self.database:
+            stats = WearStats(self.database["wear_stats"])
+        else:
+            stats = WearStats.from_database(self.database)
+            self.database["wear_stats"] = stats.data
+        return stats
+
+    def load_listing_index(self, threshold_days=LISTING_THRESHOLD_DAYS):
+        """Load the persisted listing-eligibility heap, rebuilding it from the stats if needed"""
+        index = ListingIndex(self.stats, self.database.get("listing_index"), threshold_days)
+        self.database["listing_index"] = index.data
+        return index
+
+    def _new_item_id(self, collection):
+        """
+        Smallest id not used in the collection or by a listing that came from it, so a
+        listed item keeps its id (and its "collection:id" stats entry) until it is gone
+        """
+        existing_ids = {item.get('id', 0) for item in self.database[collection]}
+        existing_ids.update(listing.get('id', 0) for listing in self.database.get("listings", [])
+                            if listing.get("original_collection", "items") == collection)
+        new_id = 0
+        while new_id in existing_ids:
+            new_id += 1
+        return new_id
+
+    def _store_new_item(self, collection, new_item, from_capture=True):
+        """Append a new item, record its first wear and persist; False if it could not be saved"""
+        last = st.session_state.pop('last_match', None) if from_capture else None
+        if last and last.get("decision") == "new":
+            # The capture was not the closest existing item
+            self._label_match(last["match_id"], last["category"], last["similarity"], False,
+                              last["collection"] or collection, last["item_id"], relearn=False)
+        self.get_color_palette(new_item)
+        # Features were just extracted, so they carry the current extractor version
+        new_item.setdefault("feature_version", self.feature_extractor.version)
+        new_item.setdefault("feature_versions", [new_item["feature_version"]] * len(new_item.get("reference_features", [])))
+        self.database[collection].append(new_item)
+        self.invalidate_indexes()
+        self.stats.record_added(collection, new_item)
+        self.wear_log.append("added", collection, new_item["id"], wear_count=new_item.get("wear_count", 1))
+        self.listing_index.schedule(collection, new_item["id"])
+        return self.save_database()
+
+    def get_color_palette(self, item):
+        """Dominant colours of an item ([[r, g, b, weight], ...]), computed once and stored on the item"""
+        if "color_palette" not in item and item.get("image"):
+            try:
+                item["color_palette"] = extract_palette(self.base64_to_image(item["image"]))
+            except Exception as e:
+                st.warning(f"Could not extract colours for {item.get('name', 'item')}: {str(e)}")
+                return []
+        return item.get("color_palette", [])
+
+    @staticmethod
+    def _color_index_key(items):
+        # Holds references, so comparing keys is mostly identity checks; any added, removed,
+        # re-typed or re-analysed item or replaced palette makes the keys differ
+        return [(item.get("id"), item.get("type"), item.get("color_palette"), item.get("ai_analysis"))
+                for item in items]
+
+    def color_index(self, collection="items"):
+        """Colour index over a collection (cached until its items or palettes change), backfilling missing palettes"""
+        items = self.database[collection]
+        cached = self._color_indexes.get(collection)
+        key = self._color_index_key(items)
+        if cached is not None and cached[0] == key:
+            return cached[1]
+        missing = [item for item in items if "color_palette" not in item]
+        with span("color_index.build", collection=collection):
+            index = ColorIndex(items, palette_fn=self.get_color_palette)
+        if any("color_palette" in item for item in missing):
+            self.save_database()
+            key = self._color_index_key(items)
+        self._color_indexes[collection] = (key, index)
+        return index
 
     def visualize_analysis(self, image, features, matching_item=None):
         """Visualize the analysis process in debug mode"""
         WardrobeAnalysis.visualize_analysis(image, features, matching_item, self.base64_to_image)
+    @timed("capture.add_item")
     def add_new_item(self, image, item_type, is_outfit=False, name=None, existing_id=None):
         """Add new item or add view to existing item with wear count and AI analysis"""
         try:
@@ -147,28 +348,14 @@ class WardrobeTracker:
                 collection = "outfits" if is_outfit else "items"
                 for item in self.database[collection]:
                     if item['id'] == existing_id:
-                        if 'reference_images' not in item:
-                            item['reference_images'] = []
-                            item['reference_features'] = []
-                            item['reference_images'].append(item['image'])
-                            item['reference_features'].append(item['features'])
-                        
-                        item['reference_images'].append(self.image_to_base64(image))
-                        item['reference_features'].append(features.tolist())
-                        self.save_database()
+                        self._add_view(collection, item, image, features)
                         return True
                 return False
             else:
                 # Create new item with initial view, wear count, and AI analysis
                 collection = "outfits" if is_outfit else "items"
                 
-                # Generate a new unique ID for the item
-                new_id = 0
-                existing_ids = set()
-                for item in self.database[collection]:
-                    existing_ids.add(item.get('id', 0))
-                while new_id in existing_ids:
-                    new_id += 1
+                new_id = self._new_item_id(collection)
                 
                 # Convert image to RGB for analysis
                 rgb_image = image.convert("RGB")
@@ -179,7 +366,8 @@ class WardrobeTracker:
 
                     # Run the async function in the background event loop
                     future = asyncio.run_coroutine_threadsafe(classify_outfit(rgb_image), background_loop)
-                    description = future.result()  # This will block until the result is available
+                    with span("capture.ai_analysis"):
+                        description = future.result()  # This will block until the result is available
                     
                     # Get style recommendations for the item if it exists in session state
                     style_advice = None
@@ -193,6 +381,7 @@ class WardrobeTracker:
                         "name": name or item_type,
                         "reference_images": [self.image_to_base64(image)],
                         "reference_features": [features.tolist()],
+                        **self.view_fingerprint(image),
                         "last_worn": datetime.now().isoformat(),
                         "image": self.image_to_base64(image),
                         "features": features.tolist(),
@@ -203,8 +392,7 @@ class WardrobeTracker:
                         "style_sources": style_advice["sources"] if style_advice else None
                     }
                     
-                    self.database[collection].append(new_item)
-                    self.save_database()
+                    self._store_new_item(collection, new_item)
                     st.success("✅ Added to wardrobe with AI analysis!")
                     return True
                     
@@ -217,6 +405,7 @@ class WardrobeTracker:
                         "name": name or item_type,
                         "reference_images": [self.image_to_base64(image)],
                         "reference_features": [features.tolist()],
+                        **self.view_fingerprint(image),
                         "last_worn": datetime.now().isoformat(),
                         "image": self.image_to_base64(image),
                         "features": features.tolist(),
@@ -224,8 +413,7 @@ class WardrobeTracker:
                         "wear_count": 1
                     }
                     
-                    self.database[collection].append(new_item)
-                    self.save_database()
+                    self._store_new_item(collection, new_item)
                     st.warning("⚠️ Added to wardrobe, but AI analysis failed")
                     return True
         except Exception as e:
@@ -274,18 +462,47 @@ class WardrobeTracker:
                 ax.legend()
                 st.pyplot(fig)
 
+    def codec(self):
+        """Feature codec to save with (None for plain lists); a PCA basis is refitted as the wardrobe grows"""
+        if self.feature_storage == "list":
+            return None
+        codec = make_codec(self.feature_storage, self.database, self.pca_path, current=self._codec)
+        if codec is not self._codec:
+            self._codec = codec
+            self.invalidate_indexes()
+        return codec
+
+    @timed("db.save")
     def save_database(self):
+        """Write the database; False (after reporting the error) if it could not be saved"""
         try:
-            with open(self.db_path, "w") as f:
-                json.dump(self.database, f, indent=4)
+            codec = self.codec()
+            if codec is None:
+                with open(self.db_path, "w") as f:
+                    json.dump(self.database, f, indent=4)
+            else:
+                compact = compact_database(self.database, codec, self.full_store, self._encodings)
+                if self.full_store is not None:
+                    self.full_store.flush()
+                with open(self.db_path, "w") as f:
+                    json.dump(compact, f)
+                remove_unused_bases(self.pca_path, codec.codec_id)
+                if self.full_store is not None:
+                    self.full_store.compact(self._encodings.digests())
+            return True
         except Exception as e:
             st.error(f"Error saving database: {str(e)}")
+            return False
+
+    @staticmethod
+    def view_fingerprint(image):
+        """Perceptual hash and colour signature fields of a new item's first view"""
+        value, signature = fingerprint(image)
+        return {"view_hashes": [value], "view_colors": [signature]}
 
     def image_to_base64(self, image):
-        """Convert PIL Image to base64 string"""
-        buffered = BytesIO()
-        image.save(buffered, format="JPEG", quality=85)  # Reduced quality for storage
-        return base64.b64encode(buffered.getvalue()).decode()
+        """Convert PIL Image to base64 string (bounded size, reduced quality for storage)"""
+        return base64.b64encode(encode_jpeg(image, quality=85, max_side=MAX_SIDE)).decode()
 
     def base64_to_image(self, base64_string):
         """Convert base64 string back to PIL Image"""
@@ -321,6 +538,11 @@ class WardrobeTracker:
         
         self.database["outfits"] = []
         self.database["outfits"].extend(demo_outfits)
+        self.stats = WearStats.from_database(self.database)
+        self.database["wear_stats"] = self.stats.data
+        self.database.pop("listing_index", None)
+        self.listing_index = self.load_listing_index()
+        self.invalidate_indexes()
         self.save_database()
         st.success("Demo data loaded successfully!")
 
@@ -331,8 +553,10 @@ class WardrobeTracker:
         WardrobeUI.inject_vertical_camera_css()
         # Combine items and outfits, include 'collection' key to identify source
         all_items = (
-            [{"collection": "items", **item} for item in self.database["items"]] +
-            [{"collection": "outfits", **outfit} for outfit in self.database["outfits"]]
+            [{"collection": "items", "idle_days": self.stats.idle_days("items", item["id"]), **item}
+             for item in self.database["items"]] +
+            [{"collection": "outfits", "idle_days": self.stats.idle_days("outfits", outfit["id"]), **outfit}
+             for outfit in self.database["outfits"]]
         )
         
         def handle_add_view(item_id, collection):
@@ -340,7 +564,7 @@ class WardrobeTracker:
             st.session_state['adding_view_collection'] = collection  # 'items' or 'outfits'
         
         def handle_capture(camera):
-            image = Image.open(camera)
+            image = load_image(camera)
             existing_id = st.session_state['adding_view_to']
             collection = st.session_state['adding_view_collection']
             is_outfit = (collection == 'outfits')
@@ -455,7 +679,7 @@ class WardrobeTracker:
                     key=f"camera_view_{item['id']}"
                 )
                 if camera:
-                    image = Image.open(camera)
+                    image = load_image(camera)
                     success = self.add_new_item(
                         image,
                         item['type'],
@@ -468,44 +692,263 @@ class WardrobeTracker:
                         st.rerun()
 
 
-    def process_image(self, image, is_outfit=False):
-        """Process image with automatic wear count increment for matches"""
-        features = self.feature_extractor.extract_features(image, is_full_outfit=is_outfit)
+    def apply_feature_weights(self, weights):
+        """
+        Use calibrated CNN/colour weights (the default ones when none are configured),
+        rescaling stored features combined with other weights
+        """
+        # Without calibration, stored vectors go back to the default weights rather than keeping
+        # a removed calibration: the extractor may be shared with other wardrobes
+        weights = weights or DEFAULT_FEATURE_WEIGHTS
+        self.feature_extractor.feature_weights = list(weights)
+        stored_weights = self.database.get("feature_weights", DEFAULT_FEATURE_WEIGHTS)
+        if list(stored_weights) == list(weights):
+            return
+        for collection in ("items", "outfits", "listings"):
+            for item in self.database.get(collection, []):
+                if item.get("features"):
+                    item["features"] = reweight_features(item["features"], stored_weights, weights)
+                if item.get("reference_features"):
+                    item["reference_features"] = [
+                        reweight_features(f, stored_weights, weights) for f in item["reference_features"]
+                    ]
+        self.database["feature_weights"] = list(weights)
+        self.invalidate_indexes()
+        self.save_database()
+
+    def refresh(self):
+        """
+        Apply vectors re-embedded and listing copy generated in the background since
+        the last call; trackers kept loaded (see wardrobe_service) call this per request.
+        Returns the number of views and listings updated.
+        """
+        features = merge_reembedded_features(self.database, self.db_path)
+        content = merge_listing_content(self.database, self.db_path)
+        if features:
+            self.invalidate_indexes()
+        if features or content:
+            self.save_database()
+        if content:
+            self.sync_listings()
+        return features + content
+
+    def start_reembedding(self):
+        """Upgrade vectors of older feature versions in the background; returns the job or None"""
+        if not self.db_path.exists():
+            return None
+        stale = find_stale_views(self.database, self.feature_extractor.version)
+        return start_reembedding(self.db_path, self.feature_extractor, [view["image_digest"] for view in stale])
+
+    def _build_match_index(self, version, codec=None):
+        return MatchIndex(
+            self.database,
+            self.feature_extractor.calculate_similarity,
+            categories=self.clothing_categories,
+            thresholds=self.match_thresholds,
+            default_threshold=self.similarity_threshold,
+            version=version,
+            codec=codec,
+        )
+
+    @property
+    def match_index(self):
+        """Category-partitioned reference features, rebuilt after the database changes"""
+        if self._match_index is None:
+            # Compact first pass only pays off when PCA reduces the dimension
+            self._match_index = self._build_match_index(
+                self.feature_extractor.version, self._codec if getattr(self._codec, "mode", None) == "pca" else None)
+        return self._match_index
+
+    def search_stale_views(self, image, is_outfit=False, categories=None):
+        """
+        Match a capture against views embedded with the other segmentation setting, by
+        extracting it with that setting. After the setting is switched these views stay
+        out of match_index until re-embedded, and re-captures of them would be saved as
+        new items. Returns None when there are no such views.
+        """
+        use_segmentation = not self.feature_extractor.use_segmentation
+        version = extractor_version(use_segmentation)
+        if self._stale_index is None or self._stale_index[0] != version:
+            self._stale_index = (version, self._build_match_index(version))
+        index = self._stale_index[1]
+        if not any(partition.entries for partition in index.partitions.values()):
+            return None
+        try:
+            features = self.feature_extractor.combine_features(
+                self.feature_extractor.extract_feature_parts(image, use_segmentation=use_segmentation))
+        except Exception as e:
+            st.error(f"Error extracting features for stale views: {str(e)}")
+            return None
         if features is None:
-            return "error", None, 0
+            return None
+        increment("stale_view_searches")
+        return index.search(features, is_outfit=is_outfit, categories=categories)
 
-        if st.session_state.get('debug_mode', False):
-            self.visualize_analysis(image, features)
+    @property
+    def hash_index(self):
+        """Perceptual hashes of all reference views (None when disabled), rebuilt after the database changes"""
+        if self.hash_max_distance is None:
+            return None
+        if self._hash_index is None:
+            index = HashIndex(self.database, self.hash_max_distance,
+                              self.matcher_config.get("hash_max_color_distance", MAX_COLOR_DISTANCE))
+            if index.computed:
+                # Hashes backfilled for views stored before hashing existed
+                self.save_database()
+            self._hash_index = index
+        return self._hash_index
 
-        # Combine items from wardrobe and listings
-        items_to_check = self.database["outfits"] if is_outfit else self.database["items"]
-        listings_to_check = self.database.get("listings", [])
-        all_items_to_check = items_to_check + listings_to_check
+    def _label_match(self, match_id, category, similarity, label, collection="items", item_id=None, relearn=True):
+        """Log whether a capture really was the compared item and refresh that category's threshold"""
+        if category is None:
+            return
+        labels = self._match_labels()
+        event = self.wear_log.append("match_label", collection, item_id, match_id=match_id, category=category,
+                                     similarity=round(float(similarity), 4), label=label)
+        labels[match_id or uuid.uuid4().hex] = event
+        if relearn:
+            self.learn_match_thresholds([category])
 
-        matching_item = None
-        best_similarity = 0
-        matching_collection = None
+    def _match_labels(self):
+        """Labelled matches keyed by match id, read from the wear log once and then kept in memory"""
+        if self._labels is None:
+            self._labels = {}
+            for event in self.wear_log.iter_events("match_label"):
+                # A later label for the same match (e.g. a rejection) replaces the earlier one
+                self._labels[event.get("match_id") or uuid.uuid4().hex] = event
+        return self._labels
 
-        for item in all_items_to_check:
-            try:
-                # Use reference_features for matching
-                reference_features = [np.array(f) for f in item.get('reference_features', [])]
-                if reference_features:
-                    similarity = self.feature_extractor.calculate_similarity_multi_view(
-                        features,
-                        reference_features
-                    )
-                else:
-                    stored_features = np.array(item["features"])
-                    similarity = self.feature_extractor.calculate_similarity(features, stored_features)
-
-                if similarity > self.similarity_threshold and similarity > best_similarity:
-                    matching_item = item
-                    best_similarity = similarity
-                    matching_collection = 'listings' if item in listings_to_check else ('outfits' if is_outfit else 'items')
-            except Exception as e:
-                st.warning(f"Error comparing items: {str(e)}")
-                continue
+    def _label_new_view(self, collection, item, features):
+        """A view added by hand is a capture the matcher should have recognised"""
+        views, versions = item_views(item)
+        references = [np.array(f) for f, v in zip(views, versions) if v == self.feature_extractor.version]
+        if not references:
+            return
+        similarity = self.feature_extractor.calculate_similarity_multi_view(features, references)
+        self._label_match(None, item_category(item, self.clothing_categories), similarity, True, collection, item['id'])
+
+    def _add_view(self, collection, item, image, features):
+        """Append a reference view (image, features and their feature version) to an item"""
+        self._label_new_view(collection, item, features)
+        if 'reference_images' not in item:
+            _, versions = item_views(item)
+            item['reference_images'] = [item['image']]
+            item['reference_features'] = [item['features']]
+            item['feature_versions'] = versions
+        item.setdefault('feature_versions', item_views(item)[1])
+        hashes, colors, _ = item_hashes(item)
+        value, signature = fingerprint(image)
+        item['view_hashes'], item['view_colors'] = hashes + [value], colors + [signature]
+        item['reference_images'].append(self.image_to_base64(image))
+        item['reference_features'].append(features.tolist())
+        item['feature_versions'].append(self.feature_extractor.version)
+        self.invalidate_indexes()
+        self.save_database()
+
+    def invalidate_indexes(self):
+        """Reference views, their features or the items holding them changed: rebuild match and hash indexes on next use"""
+        self._match_index = None
+        self._stale_index = None
+        self._hash_index = None
+
+    def release_indexes(self):
+        """Drop the in-memory match, hash and colour indexes (rebuilt on next use); True if any were built"""
+        released = self._match_index is not None or self._hash_index is not None or bool(self._color_indexes)
+        self._match_index = None
+        self._stale_index = None
+        self._hash_index = None
+        self._color_indexes = {}
+        return released
+
+    def close(self):
+        """Stop this wardrobe's background jobs and drop its indexes, when it is unloaded (see wardrobe_service)"""
+        stop_reembedding(self.db_path)
+        forget_listing_content(self.db_path)
+        self.reembedding = None
+        return self.release_indexes()
+
+    def learn_match_thresholds(self, categories=None):
+        """Re-learn per-category thresholds (all, or only the given categories) from labelled matches"""
+        samples = self._match_labels().values()
+        if categories is None:
+            thresholds = learn_thresholds(samples, self.similarity_threshold)
+        else:
+            thresholds = {c: t for c, t in self.match_thresholds.items() if c not in categories}
+            thresholds.update(learn_thresholds([s for s in samples if s.get("category") in categories],
+                                               self.similarity_threshold))
+        if thresholds != self.match_thresholds:
+            self.match_thresholds = thresholds
+            self.database["match_thresholds"] = thresholds
+            if self._match_index is not None:
+                self._match_index.thresholds = thresholds
+            self.save_database()
+        return self.match_thresholds
+
+    def reject_match(self):
+        """Undo the last automatic match ("not this item") and record it as a false match"""
+        last = st.session_state.get('last_match')
+        if not last or last.get("decision") != "existing":
+            return False
+        if last.get("hash_distance") is None:
+            # Hash matches carry no cosine similarity to learn thresholds from
+            self._label_match(last["match_id"], last["category"], last["similarity"], False,
+                              last["collection"], last["item_id"])
+        self.update_item(last["item_id"], last["collection"], last["previous_last_worn"], last["previous_wear_count"])
+        last["decision"] = "new"
+        return True
+
+    @timed("capture.process_image")
+    def process_image(self, image, is_outfit=False):
+        """Process image with automatic wear count increment for matches"""
+        # A near-identical stored view in the same colours (e.g. the same frame re-submitted) skips feature extraction
+        with span("capture.hash_lookup"):
+            value, colors = fingerprint(image)
+            result = self.hash_index.search(value, is_outfit, colors) if self.hash_index else None
+        if result is not None:
+            result["category"] = item_category(result["item"], self.clothing_categories)
+        else:
+            features = self.feature_extractor.extract_features(image, is_full_outfit=is_outfit)
+            if features is None:
+                return "error", None, 0
+
+            if st.session_state.get('debug_mode', False):
+                self.visualize_analysis(image, features)
+
+            # Compare only against the categories the coarse classifier picks (items and listings share them)
+            categories = None if self.coarse_routing else [c for c in self.match_index.partitions if c != OUTFIT]
+            with span("capture.match_search"):
+                result = self.match_index.search(features, is_outfit=is_outfit, categories=categories)
+            observe("match_similarity", result["similarity"], buckets=[i / 20 for i in range(1, 21)])
+            if not result["matched"] and self.match_index.stale_views:
+                # Views left out until re-embedded may hold this garment
+                with span("capture.stale_view_search"):
+                    stale_result = self.search_stale_views(image, is_outfit, categories)
+                if stale_result is not None and stale_result["matched"]:
+                    result = stale_result
+        matching_item = result["item"] if result["matched"] else None
+        matching_collection = result["collection"]
+        best_similarity = result["similarity"]
+
+        match_id = uuid.uuid4().hex[:12]
+        st.session_state['last_match'] = {
+            "match_id": match_id,
+            "decision": "existing" if matching_item else "new",
+            "category": result["category"],
+            "similarity": best_similarity,
+            "collection": matching_collection,
+            "item_id": result["item"]["id"] if result["item"] else None,
+            "hash_distance": result.get("hash_distance"),
+        }
+        self.wear_log.append("match", matching_collection or ("outfits" if is_outfit else "items"),
+                             st.session_state['last_match']["item_id"], match_id=match_id,
+                             category=result["category"], similarity=round(best_similarity, 4),
+                             threshold=result["threshold"], searched=result["searched"],
+                             hash_distance=result.get("hash_distance"),
+                             decision=st.session_state['last_match']["decision"])
+        increment("captures", decision=st.session_state['last_match']["decision"],
+                  via="hash" if result.get("hash_distance") is not None else "features")
+        if st.session_state.get('debug_mode', False):
+            st.write("Match search:", {k: v for k, v in result.items() if k != "item"})
 
         if matching_item:
             if matching_collection == 'listings':
@@ -515,6 +958,16 @@ class WardrobeTracker:
                 # Update the collection to 'items' or 'outfits' as appropriate
                 matching_collection = 'outfits' if is_outfit else 'items'
 
+            st.session_state['last_match'].update(
+                collection=matching_collection,
+                previous_last_worn=matching_item.get("last_worn"),
+                previous_wear_count=matching_item.get("wear_count", 0),
+            )
+            # Provisionally a true match; reject_match() relabels it
+            if result.get("hash_distance") is None:
+                self._label_match(match_id, result["category"], best_similarity, True,
+                                  matching_collection, matching_item['id'], relearn=False)
+
             # Increment wear count
             new_count = self.increment_wear_count(matching_item['id'], matching_collection)
             st.success(f"Updated wear count to {new_count}")
@@ -532,20 +985,62 @@ class WardrobeTracker:
                     item["last_worn"] = new_last_worn
                     item["wear_count"] = int(new_wear_count)
                     item["reset_period"] = 7
+                    self.stats.record_edit(collection, item_id, new_last_worn, new_wear_count)
+                    self.wear_log.append("edited", collection, item_id,
+                                         last_worn=new_last_worn, wear_count=int(new_wear_count))
+                    self.listing_index.schedule(collection, item_id)
                     self.save_database()
                     return True
             return False
         except Exception as e:
             st.error(f"Error updating item: {str(e)}")
             return False
+
+    def find_item(self, collection, item_id):
+        """Return the item with the given id from a collection, or None"""
+        for item in self.database.get(collection, []):
+            if item['id'] == item_id:
+                return item
+        return None
+
+    def get_wear_extremes(self, collection="items"):
+        """AI analyses of the most and least worn analysed items, read from the wear statistics"""
+        most = self.stats.most_worn(collection, require_analysis=True)
+        least = self.stats.least_worn(collection, require_analysis=True)
+        most_item = self.find_item(collection, most["id"]) if most else None
+        least_item = self.find_item(collection, least["id"]) if least else None
+        return (
+            most_item.get('ai_analysis') if most_item else None,
+            least_item.get('ai_analysis') if least_item else None
+        )
+
+    def delete_item(self, item_id, collection):
+        """Delete an item from the wardrobe"""
+        try:
+            self.database[collection] = [
+                x for x in self.database[collection]
+                if x['id'] != item_id
+            ]
+            self.stats.record_removed(collection, item_id)
+            self.wear_log.append("removed", collection, item_id)
+            self.invalidate_indexes()
+            self.save_database()
+            return True
+        except Exception as e:
+            st.error(f"Error deleting item: {str(e)}")
+            return False
     def increment_wear_count(self, item_id, collection):
         """Handle wear count increments when matching items"""
         try:
             for item in self.database[collection]:
                 if item['id'] == item_id:
+                    now = datetime.now()
                     current_count = item.get("wear_count", 0)
                     item["wear_count"] = current_count + 1
-                    item["last_worn"] = datetime.now().isoformat()
+                    item["last_worn"] = now.isoformat()
+                    self.stats.record_wear(collection, item_id, now)
+                    self.wear_log.append("worn", collection, item_id, timestamp=now, wear_count=item["wear_count"])
+                    self.listing_index.schedule(collection, item_id)
                     self.save_database()
                     return item["wear_count"]
             return None
@@ -555,45 +1050,67 @@ class WardrobeTracker:
     
     def move_to_listings(self, item_id, collection):
         """Move an item to the listings collection."""
+        return bool(self.move_many_to_listings([(collection, item_id)]))
+
+    def move_many_to_listings(self, item_refs):
+        """Move several (collection, item_id) items to listings with a single save."""
         try:
-            # First find the item
-            item_to_move = None
-            for item in self.database[collection]:
-                if item["id"] == item_id:
-                    item_to_move = item
-                    break
-            
-            if not item_to_move:
-                return False
-                
             # Check if listings key exists, create if not
             if "listings" not in self.database:
                 self.database["listings"] = []
-                
-            # Check if item is already in listings
-            if any(listing["id"] == item_id for listing in self.database["listings"]):
-                return False
-                
-            # Remove the item from the current collection
-            self.database[collection] = [
-                x for x in self.database[collection] if x["id"] != item_id
-            ]
 
-            # Create listing entry
-            listing_item = {
-                **item_to_move,
-                "date_listed": datetime.now().isoformat(),
-                "original_collection": collection
-            }
-            
-            # Add to listings
-            self.database["listings"].append(listing_item)
-            self.save_database()
-            return True
-            
+            listed_ids = {listing["id"] for listing in self.database["listings"]}
+            moved = []
+            now = datetime.now().isoformat()
+
+            by_collection = {}
+            for collection, item_id in item_refs:
+                by_collection.setdefault(collection, set()).add(item_id)
+
+            for collection, item_ids in by_collection.items():
+                # Skip items that are already listed
+                to_move = item_ids - listed_ids
+                if not to_move:
+                    continue
+
+                remaining = []
+                for item in self.database[collection]:
+                    if item["id"] not in to_move:
+                        remaining.append(item)
+                        continue
+                    # Create listing entry
+                    self.database["listings"].append({
+                        **item,
+                        "date_listed": now,
+                        "original_collection": collection
+                    })
+                    listed_ids.add(item["id"])
+                    self.stats.record_listed(collection, item["id"])
+                    self.wear_log.append("listed", collection, item["id"])
+                    moved.append((collection, item["id"]))
+                # Remove the moved items from the current collection
+                self.database[collection] = remaining
+
+            if moved:
+                self.invalidate_indexes()
+                self.save_database()
+                self.sync_listings()
+                # Listing copy is generated once, off the request path, and stored with the listing
+                moved_ids = {item_id for _, item_id in moved}
+                queue_listing_content(self.db_path, [l for l in self.database["listings"] if l["id"] in moved_ids],
+                                      self.styling_fn)
+            return moved
+
         except Exception as e:
             st.error(f"Error moving item to listings: {str(e)}")
-            return False
+            return []
+
+    def sweep_listings(self, now=None):
+        """List every wardrobe item that crossed the idle threshold since the last sweep."""
+        due = self.listing_index.pop_due(now)
+        if not due:
+            return []
+        return self.move_many_to_listings(due)
 
     def generate_listing_description(self, item):
         """Generate a listing description for an item."""
@@ -614,18 +1131,54 @@ class WardrobeTracker:
                 return False
                 
             # Remove the item from listings
+            for listing in self.database["listings"]:
+                if listing["id"] == item_id:
+                    original_collection = listing.get("original_collection", "items")
+                    self.stats.record_removed(original_collection, item_id)
+                    self.wear_log.append("removed", original_collection, item_id)
             self.database["listings"] = [
                 x for x in self.database["listings"] 
                 if x["id"] != item_id
             ]
             
+            self.invalidate_indexes()
             self.save_database()
+            self.sync_listings()
             return True
             
         except Exception as e:
             st.error(f"Error removing item from listings: {str(e)}")
             return False
 
+    def set_listing_content(self, item_id, text):
+        """Store regenerated copy for a listing as its next revision."""
+        for listing in self.database.get("listings", []):
+            if listing["id"] == item_id:
+                revision = (listing.get("listing_content") or {}).get("revision", 0) + 1
+                listing["listing_content"] = content_record(text, revision)
+                self.save_database()
+                self.sync_listings()
+                return True
+        return False
+
+    def sync_listings(self):
+        """Publish this wardrobe's listings to the marketplace store and drop those claimed by others."""
+        try:
+            claimed = set(self.marketplace.sync_owner(self.owner, self.database.get("listings", [])))
+        except Exception as e:
+            st.error(f"Error syncing marketplace listings: {str(e)}")
+            return
+        if not claimed:
+            return
+        for listing in self.database["listings"]:
+            if listing["id"] in claimed:
+                original_collection = listing.get("original_collection", "items")
+                self.stats.record_removed(original_collection, listing["id"])
+                self.wear_log.append("claimed", original_collection, listing["id"])
+        self.database["listings"] = [x for x in self.database["listings"] if x["id"] not in claimed]
+        self.invalidate_indexes()
+        self.save_database()
+
     def get_listings(self):
         """Get all current listings."""
         try:
@@ -650,8 +1203,14 @@ class WardrobeTracker:
                         if x["id"] != item_id
                     ]
                     # Add back to the wardrobe
+                    item.pop("listing_content", None)
                     self.database[original_collection].append(item)
+                    self.stats.record_listed(original_collection, item_id, listed=False)
+                    self.wear_log.append("unlisted", original_collection, item_id)
+                    self.listing_index.schedule(original_collection, item_id)
+                    self.invalidate_indexes()
                     self.save_database()
+                    self.sync_listings()
                     return True
             return False
         except Exception as e:
@@ -0,0 +1,268 @@
+"""
+wear_log.py
+
+Append-only wear-event log plus incrementally maintained wardrobe statistics.
+The tracker records every add/wear/edit/list event here, so the Preferences,
+Marketplace and Notifications views and the wardrobe grid can read idle days,
+wear frequency and per-type utilisation without re-parsing every item's
+last_worn timestamp on each render.
+"""
+
+import json
+from collections import defaultdict
+from datetime import datetime, timedelta
+from pathlib import Path
+
+import streamlit as st
+
+SECONDS_PER_DAY = 86400
+
+
+def _to_timestamp(value):
+    """ISO string / datetime / epoch -> epoch seconds"""
+    if value is None:
+        return None
+    if isinstance(value, (int, float)):
+        return float(value)
+    if isinstance(value, datetime):
+        return value.timestamp()
+    return datetime.fromisoformat(value).timestamp()
+
+
+def stats_key(collection, item_id):
+    """Items and outfits have separate id spaces, so stats are keyed by both"""
+    return f"{collection}:{item_id}"
+
+
+class WearLog:
+    """Append-only JSON-lines log of wardrobe events"""
+
+    def __init__(self, path):
+        self.path = Path(path)
+
+    def append(self, event, collection, item_id, timestamp=None, **fields):
+        record = {
+            "ts": (timestamp or datetime.now()).isoformat(),
+            "event": event,
+            "collection": collection,
+            "item_id": item_id,
+            **fields,
+        }
+        try:
+            with open(self.path, "a") as f:
+                f.write(json.dumps(record) + "\n")
+        except Exception as e:
+            st.error(f"Error writing wear log: {str(e)}")
+        return record
+
+    def iter_events(self, event=None):
+        """Yield logged events in order, optionally only those of one type"""
+        if not self.path.exists():
+            return
+        with open(self.path) as f:
+            for line in f:
+                line = line.strip()
+                if not line:
+                    continue
+                try:
+                    record = json.loads(line)
+                except json.JSONDecodeError:
+                    continue
+                if event is None or record.get("event") == event:
+                    yield record
+
+
+class WearStats:
+    """
+    Aggregates kept in sync with the wear log.
+
+    self.data is a plain dict stored in the database under "wear_stats" so it
+    is persisted by WardrobeTracker.save_database; timestamps are epoch
+    seconds so reads never need to parse ISO strings.
+    """
+
+    def __init__(self, data=None):
+        self.data = data if data is not None else {}
+        self.data.setdefault("items", {})
+        self.data.setdefault("types", {})
+        self.data.setdefault("daily", {})
+        self._rebuild_buckets()
+
+    @classmethod
+    def from_database(cls, database):
+        """Build statistics from the per-item last_worn/wear_count fields (one-time migration)"""
+        stats = cls()
+        for collection in ("items", "outfits", "listings"):
+            for item in database.get(collection, []):
+                home = item.get("original_collection", "items") if collection == "listings" else collection
+                stats._track(home, item, listed=(collection == "listings"))
+        return stats
+
+    def _rebuild_buckets(self):
+        # wear_count -> keys, used for min/max worn queries
+        self._buckets = defaultdict(set)
+        for key, entry in self.data["items"].items():
+            self._buckets[entry["wear_count"]].add(key)
+
+    def _move_bucket(self, key, old_count, new_count):
+        if old_count is not None:
+            self._buckets[old_count].discard(key)
+            if not self._buckets[old_count]:
+                del self._buckets[old_count]
+        self._buckets[new_count].add(key)
+
+    def _type_entry(self, item_type):
+        return self.data["types"].setdefault(item_type, {"items": 0, "wears": 0})
+
+    def _track(self, collection, item, listed=False):
+        key = stats_key(collection, item["id"])
+        # An id can only be reused once its previous item is gone; never double-count a stale entry
+        self.record_removed(collection, item["id"])
+        last_worn = _to_timestamp(item.get("last_worn")) if item.get("last_worn") else None
+        wear_count = int(item.get("wear_count", 0))
+        self.data["items"][key] = {
+            "collection": collection,
+            "id": item["id"],
+            "type": item.get("type", "Unknown"),
+            "wear_count": wear_count,
+            "first_worn": last_worn,
+            "last_worn": last_worn,
+            "has_analysis": bool(item.get("ai_analysis")),
+            "listed": listed,
+        }
+        self._move_bucket(key, None, wear_count)
+        type_entry = self._type_entry(item.get("type", "Unknown"))
+        type_entry["items"] += 1
+        type_entry["wears"] += wear_count
+        return key
+
+    def _bump_daily(self, timestamp):
+        day = datetime.fromtimestamp(timestamp).date().isoformat()
+        self.data["daily"][day] = self.data["daily"].get(day, 0) + 1
+
+    # --- event handlers -------------------------------------------------
+
+    def record_added(self, collection, item):
+        key = self._track(collection, item)
+        if self.data["items"][key]["last_worn"]:
+            self._bump_daily(self.data["items"][key]["last_worn"])
+
+    def record_wear(self, collection, item_id, timestamp=None):
+        entry = self.data["items"].get(stats_key(collection, item_id))
+        if entry is None:
+            return
+        timestamp = _to_timestamp(timestamp) or datetime.now().timestamp()
+        self._move_bucket(stats_key(collection, item_id), entry["wear_count"], entry["wear_count"] + 1)
+        entry["wear_count"] += 1
+        entry["last_worn"] = timestamp
+        entry["first_worn"] = entry["first_worn"] or timestamp
+        entry["listed"] = False
+        self._type_entry(entry["type"])["wears"] += 1
+        self._bump_daily(timestamp)
+
+    def record_edit(self, collection, item_id, last_worn, wear_count):
+        entry = self.data["items"].get(stats_key(collection, item_id))
+        if entry is None:
+            return
+        wear_count = int(wear_count)
+        self._move_bucket(stats_key(collection, item_id), entry["wear_count"], wear_count)
+        self._type_entry(entry["type"])["wears"] += wear_count - entry["wear_count"]
+        entry["wear_count"] = wear_count
+        entry["last_worn"] = _to_timestamp(last_worn)
+        if entry["first_worn"] is None or entry["last_worn"] < entry["first_worn"]:
+            entry["first_worn"] = entry["last_worn"]
+
+    def record_analysis(self, collection, item_id, has_analysis=True):
+        entry = self.data["items"].get(stats_key(collection, item_id))
+        if entry is not None:
+            entry["has_analysis"] = has_analysis
+
+    def record_listed(self, collection, item_id, listed=True):
+        entry = self.data["items"].get(stats_key(collection, item_id))
+        if entry is not None:
+            entry["listed"] = listed
+
+    def record_removed(self, collection, item_id):
+        key = stats_key(collection, item_id)
+        entry = self.data["items"].pop(key, None)
+        if entry is None:
+            return
+        self._buckets[entry["wear_count"]].discard(key)
+        if not self._buckets[entry["wear_count"]]:
+            del self._buckets[entry["wear_count"]]
+        type_entry = self._type_entry(entry["type"])
+        type_entry["items"] -= 1
+        type_entry["wears"] -= entry["wear_count"]
+
+    # --- queries ----------------------------------------------------------
+
+    def get(self, collection, item_id):
+        return self.data["items"].get(stats_key(collection, item_id))
+
+    def idle_days(self, collection, item_id, now=None):
+        """Whole days since the item was last worn (None if unknown)"""
+        entry = self.get(collection, item_id)
+        if entry is None or entry["last_worn"] is None:
+            return None
+        now = now or datetime.now()
+        return (now.date() - datetime.fromtimestamp(entry["last_worn"]).date()).days
+
+    def wear_frequency(self, collection, item_id, now=None):
+        """Average wears per week since the item was first recorded"""
+        entry = self.get(collection, item_id)
+        if entry is None or entry["first_worn"] is None:
+            return 0.0
+        now = (now or datetime.now()).timestamp()
+        weeks = max(1.0, (now - entry["first_worn"]) / (7 * SECONDS_PER_DAY))
+        return entry["wear_count"] / weeks
+
+    def cost_per_wear(self, item, collection="items"):
+        """Purchase price divided by wears, if the item has a price"""
+        price = item.get("price")
+        entry = self.get(collection, item["id"])
+        if price is None or entry is None:
+            return None
+        return float(price) / max(1, entry["wear_count"])
+
+    def utilization_by_type(self):
+        """Per-type item count, total wears and average wears per item"""
+        return {
+            item_type: {**entry, "wears_per_item": entry["wears"] / entry["items"] if entry["items"] else 0.0}
+            for item_type, entry in self.data["types"].items()
+            if entry["items"] > 0
+        }
+
+    def _extreme(self, collection, counts, require_analysis):
+        for count in counts:
+            for key in self._buckets[count]:
+                entry = self.data["items"][key]
+                if entry["collection"] != collection or entry["listed"]:
+                    continue
+                if require_analysis and not entry["has_analysis"]:
+                    continue
+                return entry
+        return None
+
+    def most_worn(self, collection="items", require_analysis=False):
+        return self._extreme(collection, sorted(self._buckets, reverse=True), require_analysis)
+
+    def least_worn(self, collection="items", require_analysis=False):
+        return self._extreme(collection, sorted(self._buckets), require_analysis)
+
+    def unworn(self, min_days, collection="items", now=None):
+        """Stats entries for wardrobe items idle for at least min_days"""
+        cutoff = (now or datetime.now()).date() - timedelta(days=min_days)
+        cutoff_ts = datetime.combine(cutoff + timedelta(days=1), datetime.min.time()).timestamp()
+        return [
+            entry for entry in self.data["items"].values()
+            if entry["collection"] == collection and not entry["listed"]
+            and entry["last_worn"] is not None and entry["last_worn"] < cutoff_ts
+        ]
+
+    def wear_trend(self, days=30, now=None):
+        """Wear events per day for the last `days` days, oldest first"""
+        today = (now or datetime.now()).date()
+        return [
+            (day.isoformat(), self.data["daily"].get(day.isoformat(), 0))
+            for day in (today - timedelta(days=offset) for offset in range(days - 1, -1, -1))
+        ]